@@ -0,0 +1,121 @@
+"""
+File: event_cache.py
+Author: Jeff Martin
+Email: jeffreymartin@outlook.com
+This file contains functionality for caching the EventTables of parsed scores on disk.
+Copyright (c) 2022 by Jeff Martin.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import hashlib
+import os
+from events import parse_events, read_events_from_file, write_events_to_file
+from musicxml import read_score
+
+CACHE_VERSION = 2                     # Increment when the EventTable format or extraction changes
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024  # The default maximum size of a cache directory, in bytes
+
+
+def clear_cache(cache_dir):
+    """
+    Removes all cached EventTables from a cache directory
+    :param cache_dir: The cache directory
+    :return: None
+    """
+    for file in _get_cache_files(cache_dir):
+        os.remove(file)
+
+
+def get_cache_key(path, tempo_overrides=None, fast_reader=True):
+    """
+    Computes the cache key of a score. The key is a hash of the file contents, so a renamed or moved score
+    still uses its cached events, and an edited score does not.
+    :param path: The path of the score
+    :param tempo_overrides: A dictionary of measure numbers and tempos used for extraction
+    :param fast_reader: Whether or not the streaming MusicXML reader is used for extraction
+    :return: The cache key, as a hexadecimal string
+    """
+    hasher = hashlib.sha256()
+    hasher.update(f"{CACHE_VERSION}\n{fast_reader}\n".encode())
+    if tempo_overrides is not None:
+        for measure in sorted(tempo_overrides):
+            hasher.update(f"{measure}:{tempo_overrides[measure]}\n".encode())
+    with open(path, "rb") as score:
+        for block in iter(lambda: score.read(1 << 20), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def load_events(path, tempo_overrides=None, cache_dir=None, max_size=DEFAULT_MAX_SIZE, fast_reader=True):
+    """
+    Loads the EventTable of a score. If a cache directory is provided and it contains the events of this score,
+    the score is not parsed. Otherwise the score is parsed and its events are added to the cache. When the cache
+    grows beyond max_size, the least recently used entries are removed.
+    :param path: The path of the score
+    :param tempo_overrides: A dictionary of measure numbers and tempos (as Decimals). See extract_events().
+    :param cache_dir: The cache directory (None means do not cache). The directory is created if necessary.
+    :param max_size: The maximum size of the cache directory, in bytes
+    :param fast_reader: Whether or not to read MusicXML files with the streaming reader instead of music21
+    :return: An EventTable
+    """
+    parse = read_score if fast_reader else parse_events
+    if cache_dir is None:
+        return parse(path, tempo_overrides)
+
+    cache_file = os.path.join(cache_dir, get_cache_key(path, tempo_overrides, fast_reader) + ".npz")
+    if os.path.isfile(cache_file):
+        try:
+            events = read_events_from_file(cache_file)
+            os.utime(cache_file)  # Mark as recently used
+            return events
+        except (OSError, KeyError, ValueError):
+            os.remove(cache_file)
+
+    events = parse(path, tempo_overrides)
+    os.makedirs(cache_dir, exist_ok=True)
+    temp_file = cache_file + ".tmp"
+    with open(temp_file, "wb") as out:
+        write_events_to_file(events, out)
+    os.replace(temp_file, cache_file)
+    _evict(cache_dir, max_size)
+    return events
+
+
+def _evict(cache_dir, max_size):
+    """
+    Removes the least recently used cached EventTables until the cache directory is no larger than max_size
+    :param cache_dir: The cache directory
+    :param max_size: The maximum size of the cache directory, in bytes
+    :return: None
+    """
+    files = [(file, os.stat(file)) for file in _get_cache_files(cache_dir)]
+    files.sort(key=lambda x: x[1].st_mtime)
+    total = sum([stat.st_size for file, stat in files])
+    i = 0
+    while total > max_size and i < len(files) - 1:
+        os.remove(files[i][0])
+        total -= files[i][1].st_size
+        i += 1
+
+
+def _get_cache_files(cache_dir):
+    """
+    Gets the cached EventTable files in a cache directory
+    :param cache_dir: The cache directory
+    :return: A list of file paths
+    """
+    if not os.path.isdir(cache_dir):
+        return []
+    return [os.path.join(cache_dir, file) for file in os.listdir(cache_dir) if file.endswith(".npz")]
@@ -0,0 +1,726 @@
+"""
+File: events.py
+Author: Jeff Martin
+Email: jeffreymartin@outlook.com
+This file contains the EventTable class, which stores the notes, chords, and rests of a score in columnar form.
+Copyright (c) 2022 by Jeff Martin.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import bisect
+import math
+import music21
+import numpy
+from decimal import Decimal
+from fractions import Fraction
+
+REST = -1  # The MIDI value stored for rests
+_COLUMNS = ["duration", "measure", "midi", "name", "octave", "onset", "part", "tempo", "time_signature",
+            "transposition", "voice"]
+
+
+class EventTable:
+    def __init__(self, ticks_per_quarter=1, num_parts=0):
+        """
+        Creates an EventTable. Each row of the table is a single pitch of a note or chord, or a rest. The rows
+        are stored in the order in which the score was traversed: measure by measure, and part by part within
+        each measure.
+        :param ticks_per_quarter: The number of ticks per quarter note
+        :param num_parts: The number of parts in the score
+        """
+        self._duration = numpy.zeros(0, dtype=numpy.int64)      # The duration of each event, in ticks
+        self._measure = numpy.zeros(0, dtype=numpy.int32)       # The measure index of each event
+        self._measure_numbers = numpy.zeros(0, dtype=numpy.int32)  # The measure number of each measure index
+        self._measure_starts = numpy.zeros(0, dtype=numpy.int64)   # The start tick of each measure index
+        self._midi = numpy.zeros(0, dtype=numpy.int16)          # The MIDI number of each event (REST for rests)
+        self._name = numpy.zeros(0, dtype=numpy.int16)          # The pitch name index of each event
+        self._names = []                                        # The pitch names (without octave)
+        self._num_parts = num_parts                             # The number of parts
+        self._octave = numpy.zeros(0, dtype=numpy.int16)        # The written octave of each event
+        self._summary = None                                    # A summary of the score
+        self._onset = numpy.zeros(0, dtype=numpy.int64)         # The onset of each event, in ticks
+        self._part = numpy.zeros(0, dtype=numpy.int16)          # The part index of each event
+        self._tempo = numpy.zeros(0, dtype=numpy.int16)         # The tempo index of each event
+        self._tempos = [Decimal(60)]                            # The tempos (in quarter notes per minute)
+        self._ticks_per_quarter = ticks_per_quarter             # The number of ticks per quarter note
+        self._time_base = None                                  # The timebase of the tempos (made on request)
+        self._time_signature = numpy.zeros(0, dtype=numpy.int16)   # The time signature index of each event (or -1)
+        self._time_signatures = []                              # The time signatures, as ratio strings
+        self._transposition = numpy.zeros(0, dtype=numpy.int8)  # The clef transposition of each event
+        self._voice = numpy.zeros(0, dtype=numpy.int16)         # The voice of each event (0 if not in a Voice)
+
+    def __len__(self):
+        return self._onset.shape[0]
+
+    @property
+    def duration(self):
+        """
+        The duration of each event, in ticks
+        :return: A NumPy array
+        """
+        return self._duration
+
+    @property
+    def measure(self):
+        """
+        The measure index of each event
+        :return: A NumPy array
+        """
+        return self._measure
+
+    @property
+    def measure_numbers(self):
+        """
+        The measure number of each measure index
+        :return: A NumPy array
+        """
+        return self._measure_numbers
+
+    @property
+    def measure_starts(self):
+        """
+        The start tick of each measure index
+        :return: A NumPy array
+        """
+        return self._measure_starts
+
+    @property
+    def midi(self):
+        """
+        The MIDI number of each event, without clef transposition. Rests have the value REST.
+        :return: A NumPy array
+        """
+        return self._midi
+
+    @property
+    def name(self):
+        """
+        The index of the pitch name (without octave) of each event in the names list
+        :return: A NumPy array
+        """
+        return self._name
+
+    @property
+    def names(self):
+        """
+        The pitch names (without octave) referenced by the name column
+        :return: A list of strings
+        """
+        return self._names
+
+    @property
+    def num_parts(self):
+        """
+        The number of parts
+        :return: The number of parts
+        """
+        return self._num_parts
+
+    @property
+    def octave(self):
+        """
+        The written octave of each event, without clef transposition
+        :return: A NumPy array
+        """
+        return self._octave
+
+    @property
+    def onset(self):
+        """
+        The onset of each event, in ticks from the start of the score
+        :return: A NumPy array
+        """
+        return self._onset
+
+    @property
+    def part(self):
+        """
+        The part index of each event
+        :return: A NumPy array
+        """
+        return self._part
+
+    @property
+    def summary(self):
+        """
+        A ScoreSummary of the score from which the events were extracted
+        :return: A ScoreSummary
+        """
+        return self._summary
+
+    @property
+    def tempo(self):
+        """
+        The index of the tempo of each event in the tempos list
+        :return: A NumPy array
+        """
+        return self._tempo
+
+    @property
+    def tempos(self):
+        """
+        The tempos referenced by the tempo column, in quarter notes per minute
+        :return: A list of Decimals
+        """
+        return self._tempos
+
+    @property
+    def ticks_per_quarter(self):
+        """
+        The number of ticks per quarter note
+        :return: The number of ticks per quarter note
+        """
+        return self._ticks_per_quarter
+
+    @property
+    def time_signature(self):
+        """
+        The index of the time signature of each event in the time_signatures list, or -1 if no time
+        signature has been encountered yet
+        :return: A NumPy array
+        """
+        return self._time_signature
+
+    @property
+    def time_signatures(self):
+        """
+        The time signatures referenced by the time_signature column, as ratio strings
+        :return: A list of strings
+        """
+        return self._time_signatures
+
+    @property
+    def transposition(self):
+        """
+        The clef transposition of each event, in semitones
+        :return: A NumPy array
+        """
+        return self._transposition
+
+    @property
+    def voice(self):
+        """
+        The voice of each event. Events that are not inside a Voice have voice 0, and events inside a Voice
+        are numbered by the position of the Voice in its measure, starting at 1.
+        :return: A NumPy array
+        """
+        return self._voice
+
+    def get_measure_rows(self, index):
+        """
+        Gets the rows of the events in a measure
+        :param index: The measure index
+        :return: A slice object for indexing the columns
+        """
+        return slice(int(numpy.searchsorted(self._measure, index, "left")),
+                     int(numpy.searchsorted(self._measure, index, "right")))
+
+    def get_pitch_bounds(self):
+        """
+        Gets the lowest and highest pitches of the table in p-space
+        :return: The lower and upper bounds as a tuple. If there are no pitches, each of the bounds will be None.
+        """
+        pitched = self._midi != REST
+        if not pitched.any():
+            return None, None
+        pitches = self.get_pitches()[pitched]
+        return int(pitches.min()), int(pitches.max())
+
+    def get_pitch_names(self):
+        """
+        Gets the pitch name of each event, including the octave and clef transposition. Rests have the name None.
+        :return: A list of pitch names
+        """
+        octaves = self._octave + self._transposition // 12
+        return [None if self._midi[i] == REST else self._names[self._name[i]] + str(octaves[i])
+                for i in range(len(self))]
+
+    def get_pitches(self):
+        """
+        Gets the pitch of each event in p-space, including the clef transposition. The values for rests are
+        meaningless, and should be masked out using the midi column.
+        :return: A NumPy array
+        """
+        return self._midi.astype(numpy.int32) - 60 + self._transposition
+
+    def get_time_base(self, slices_per_quarter=1):
+        """
+        Gets a TimeBase for measuring durations at the tempos of the table. Its ticks divide the ticks of the
+        table, and also the slices if a number of slices per quarter note is provided.
+        :param slices_per_quarter: The number of slices per quarter note
+        :return: The TimeBase
+        """
+        ticks_per_quarter = math.lcm(self._ticks_per_quarter, slices_per_quarter)
+        if self._time_base is None or self._time_base.ticks_per_quarter != ticks_per_quarter:
+            self._time_base = TimeBase(ticks_per_quarter, self._tempos)
+        return self._time_base
+
+
+class ScoreSummary:
+    def __init__(self, ticks_per_quarter=1, num_parts=0, num_measures=0):
+        """
+        Creates a ScoreSummary. A ScoreSummary holds the information about a score that is needed to set up an
+        analysis. It is collected while extracting the events, so the score does not need to be traversed again.
+        :param ticks_per_quarter: The number of ticks per quarter note
+        :param num_parts: The number of parts in the score
+        :param num_measures: The number of measures in the score
+        """
+        self._denominators = []              # The distinct denominators of the event durations
+        self._lower_bound = None             # The lowest pitch in p-space
+        self._num_measures = num_measures    # The number of measures
+        self._num_parts = num_parts          # The number of parts
+        self._slices_per_quarter = 1         # The number of slices per quarter note
+        self._tempo_map = [(0, Decimal(60))]  # The tick and tempo of each tempo change
+        self._ticks_per_quarter = ticks_per_quarter  # The number of ticks per quarter note
+        self._time_signatures = []           # The tick and ratio string of each time signature
+        self._transpositions = [[] for i in range(num_parts)]  # The tick and clef transposition of each clef, by part
+        self._upper_bound = None             # The highest pitch in p-space
+
+    @property
+    def denominators(self):
+        """
+        The distinct denominators of the event durations (in quarter notes), in sorted order
+        :return: A list of denominators
+        """
+        return self._denominators
+
+    @property
+    def lower_bound(self):
+        """
+        The lowest pitch of the score in p-space, including clef transposition
+        :return: The lowest pitch (None if the score has no pitches)
+        """
+        return self._lower_bound
+
+    @property
+    def num_measures(self):
+        """
+        The number of measures
+        :return: The number of measures
+        """
+        return self._num_measures
+
+    @property
+    def num_parts(self):
+        """
+        The number of parts
+        :return: The number of parts
+        """
+        return self._num_parts
+
+    @property
+    def slices_per_quarter(self):
+        """
+        The number of slices per quarter note needed to slice every event on a uniform grid (the LCM of the
+        duration denominators)
+        :return: The number of slices per quarter note
+        """
+        return self._slices_per_quarter
+
+    @property
+    def tempo_map(self):
+        """
+        The tempo changes of the score, as (tick, tempo) tuples in order. The first entry is always at tick 0.
+        :return: A list of tuples
+        """
+        return self._tempo_map
+
+    @property
+    def ticks_per_quarter(self):
+        """
+        The number of ticks per quarter note
+        :return: The number of ticks per quarter note
+        """
+        return self._ticks_per_quarter
+
+    @property
+    def time_signatures(self):
+        """
+        The time signatures of the score, as (tick, ratio string) tuples in order
+        :return: A list of tuples
+        """
+        return self._time_signatures
+
+    @property
+    def transpositions(self):
+        """
+        The clefs of each part, as lists of (tick, transposition) tuples in order
+        :return: A list of lists of tuples
+        """
+        return self._transpositions
+
+    @property
+    def upper_bound(self):
+        """
+        The highest pitch of the score in p-space, including clef transposition
+        :return: The highest pitch (None if the score has no pitches)
+        """
+        return self._upper_bound
+
+    def get_tempo(self, tick):
+        """
+        Gets the tempo in effect at a tick
+        :param tick: The tick
+        :return: The tempo
+        """
+        i = bisect.bisect_right(self._tempo_map, tick, key=lambda x: x[0]) - 1
+        return self._tempo_map[max(i, 0)][1]
+
+
+class TimeBase:
+    def __init__(self, ticks_per_quarter=1, tempos=(), units_per_second=1):
+        """
+        Creates an exact integer timebase. Durations in quarter notes are counted in ticks, and durations in
+        seconds are counted in time units, which are chosen so that a tick lasts a whole number of units at
+        each of the tempos. Durations can then be added as integers, and converted to exact values for output.
+        :param ticks_per_quarter: The number of ticks per quarter note
+        :param tempos: The tempos (in quarter notes per minute) at which durations will be measured
+        :param units_per_second: A number of units per second that must divide the number of units per second
+        of the timebase (for representing durations in seconds that are not measured at a tempo)
+        """
+        tick_seconds = {tempo: 60 / (Fraction(tempo) * ticks_per_quarter) for tempo in tempos}
+        self._ticks_per_quarter = ticks_per_quarter
+        self._units_per_second = math.lcm(units_per_second, *[s.denominator for s in tick_seconds.values()])
+        self._units_per_tick = {tempo: int(s * self._units_per_second) for tempo, s in tick_seconds.items()}
+
+    @property
+    def ticks_per_quarter(self):
+        """
+        The number of ticks per quarter note
+        :return: The number of ticks per quarter note
+        """
+        return self._ticks_per_quarter
+
+    @property
+    def units_per_second(self):
+        """
+        The number of time units per second
+        :return: The number of time units per second
+        """
+        return self._units_per_second
+
+    def get_quarters(self, ticks):
+        """
+        Converts a duration in ticks to quarter notes
+        :param ticks: The duration in ticks
+        :return: The duration in quarter notes, as a Fraction
+        """
+        return Fraction(ticks, self._ticks_per_quarter)
+
+    def get_seconds(self, units):
+        """
+        Converts a duration in time units to seconds
+        :param units: The duration in time units
+        :return: The duration in seconds, as a Decimal
+        """
+        seconds = Fraction(units, self._units_per_second)
+        return Decimal(seconds.numerator) / Decimal(seconds.denominator)
+
+    def get_ticks(self, quarters):
+        """
+        Converts a duration in quarter notes to ticks
+        :param quarters: The duration in quarter notes
+        :return: The duration in ticks
+        :raise ValueError: If the duration is not a whole number of ticks
+        """
+        ticks = Fraction(quarters) * self._ticks_per_quarter
+        if ticks.denominator != 1:
+            raise ValueError(f"The duration {quarters} is not a whole number of ticks.")
+        return ticks.numerator
+
+    def get_units(self, ticks, tempo):
+        """
+        Gets the number of time units in a duration at a tempo
+        :param ticks: The duration in ticks
+        :param tempo: The tempo, which must be one of the tempos of the timebase
+        :return: The duration in time units
+        :raise ValueError: If the tempo is not one of the tempos of the timebase
+        """
+        if tempo not in self._units_per_tick:
+            raise ValueError(f"The tempo {tempo} is not in the timebase.")
+        return ticks * self._units_per_tick[tempo]
+
+    def get_units_from_seconds(self, seconds):
+        """
+        Converts a duration in seconds to time units
+        :param seconds: The duration in seconds
+        :return: The duration in time units
+        :raise ValueError: If the duration is not a whole number of time units
+        """
+        units = Fraction(seconds) * self._units_per_second
+        if units.denominator != 1:
+            raise ValueError(f"The duration {seconds} is not a whole number of time units.")
+        return units.numerator
+
+
+def extract_events(parts, tempo_overrides=None):
+    """
+    Extracts an EventTable from a list of music21 parts. The parts are traversed once, measure by measure,
+    and the tempo, time signature, and clef transposition in effect are recorded for each event. A ScoreSummary
+    is collected during the same pass, and is available as the summary of the EventTable.
+    :param parts: A list of parts
+    :param tempo_overrides: A dictionary of measure numbers and tempos (as Decimals). If a MetronomeMark is
+    found in one of these measures, the corresponding tempo is used instead of the marked tempo.
+    :return: An EventTable
+    """
+    measures = [[_read_measure(item) for item in part if type(item) == music21.stream.Measure] for part in parts]
+    return make_event_table(measures, tempo_overrides)
+
+
+def make_event_table(measures, tempo_overrides=None):
+    """
+    Makes an EventTable from the measures of a score. Each measure is a tuple of its number, its offset in
+    quarter notes (as a Fraction), and a list of its contents in score order. The contents are tuples:
+    ("clef", offset, transposition), ("time_signature", offset, ratio string), ("tempo", offset, tempo) and
+    ("note", offset, quarter length, pitches, voice), where pitches is a list of (MIDI number, name, octave)
+    tuples (empty for rests). Offsets are relative to the start of the measure.
+    :param measures: A list of lists of measures, one list for each part
+    :param tempo_overrides: A dictionary of measure numbers and tempos (as Decimals). If a tempo mark is
+    found in one of these measures, the corresponding tempo is used instead of the marked tempo.
+    :return: An EventTable
+    """
+    if tempo_overrides is None:
+        tempo_overrides = {}
+    num_parts = len(measures)
+    num_measures = max([len(part_measures) for part_measures in measures], default=0)
+    table = EventTable(1, num_parts)
+    name_indices = {}
+    rows = []
+    tempo = 0
+    time_signature = -1
+    transpose = [0 for i in range(num_parts)]
+    measure_numbers = []
+    measure_offsets = []
+    clef_marks = []   # The measure index, offset, part, and transposition of each clef
+    tempo_marks = []  # The measure index, offset, and tempo index of each tempo mark
+    ts_marks = []     # The measure index, offset, and time signature index of each time signature
+
+    for i in range(num_measures):
+        for a in range(num_parts):
+            if i >= len(measures[a]):
+                continue
+            number, offset, contents = measures[a][i]
+            if len(measure_numbers) == i:
+                measure_numbers.append(number)
+                measure_offsets.append(offset)
+            for item in contents:
+                if item[0] == "note":
+                    ql = item[2]
+                    if len(item[3]) == 0:
+                        rows.append((i, item[1], ql, REST, 0, 0, a, item[4], tempo, time_signature, transpose[a]))
+                    for midi, name, octave in item[3]:
+                        if name not in name_indices:
+                            name_indices[name] = len(name_indices)
+                        rows.append((i, item[1], ql, midi, octave, name_indices[name], a, item[4], tempo,
+                                     time_signature, transpose[a]))
+                elif item[0] == "clef":
+                    transpose[a] = item[2]
+                    clef_marks.append((i, item[1], a, item[2]))
+                elif item[0] == "time_signature":
+                    table._time_signatures.append(item[2])
+                    time_signature = len(table._time_signatures) - 1
+                    ts_marks.append((i, item[1], time_signature))
+                elif item[0] == "tempo":
+                    if number in tempo_overrides:
+                        table._tempos.append(tempo_overrides[number])
+                    else:
+                        table._tempos.append(item[2])
+                    tempo = len(table._tempos) - 1
+                    tempo_marks.append((i, item[1], tempo))
+
+    # All offsets and durations must be whole numbers of ticks
+    denominators = {1}
+    for offset in measure_offsets:
+        denominators.add(offset.denominator)
+    for row in rows:
+        denominators.add(row[1].denominator)
+        denominators.add(row[2].denominator)
+    for mark in clef_marks + tempo_marks + ts_marks:
+        denominators.add(mark[1].denominator)
+    tpq = math.lcm(*denominators)
+
+    table._ticks_per_quarter = tpq
+    table._names = [None for i in range(len(name_indices))]
+    for name, index in name_indices.items():
+        table._names[index] = name
+    table._measure_numbers = numpy.array(measure_numbers, dtype=numpy.int32)
+    table._measure_starts = numpy.array([int(offset * tpq) for offset in measure_offsets], dtype=numpy.int64)
+    table._measure = numpy.array([row[0] for row in rows], dtype=numpy.int32)
+    table._onset = numpy.array([int((measure_offsets[row[0]] + row[1]) * tpq) for row in rows], dtype=numpy.int64)
+    table._duration = numpy.array([int(row[2] * tpq) for row in rows], dtype=numpy.int64)
+    table._midi = numpy.array([row[3] for row in rows], dtype=numpy.int16)
+    table._octave = numpy.array([row[4] for row in rows], dtype=numpy.int16)
+    table._name = numpy.array([row[5] for row in rows], dtype=numpy.int16)
+    table._part = numpy.array([row[6] for row in rows], dtype=numpy.int16)
+    table._voice = numpy.array([row[7] for row in rows], dtype=numpy.int16)
+    table._tempo = numpy.array([row[8] for row in rows], dtype=numpy.int16)
+    table._time_signature = numpy.array([row[9] for row in rows], dtype=numpy.int16)
+    table._transposition = numpy.array([row[10] for row in rows], dtype=numpy.int8)
+
+    # Summarize the score
+    summary = ScoreSummary(tpq, num_parts, len(measure_numbers))
+    summary._denominators = sorted({row[2].denominator for row in rows})
+    summary._lower_bound, summary._upper_bound = table.get_pitch_bounds()
+    summary._slices_per_quarter = math.lcm(*summary._denominators)
+    summary._tempo_map = _make_map([(0, table._tempos[0])] + [
+        (int((measure_offsets[mark[0]] + mark[1]) * tpq), table._tempos[mark[2]]) for mark in tempo_marks])
+    summary._time_signatures = _make_map([
+        (int((measure_offsets[mark[0]] + mark[1]) * tpq), table._time_signatures[mark[2]]) for mark in ts_marks])
+    for a in range(num_parts):
+        summary._transpositions[a] = _make_map([
+            (int((measure_offsets[mark[0]] + mark[1]) * tpq), mark[3]) for mark in clef_marks if mark[2] == a])
+    table._summary = summary
+    return table
+
+
+def parse_events(path, tempo_overrides=None):
+    """
+    Parses a score with music21 and extracts its EventTable
+    :param path: The path of the score
+    :param tempo_overrides: A dictionary of measure numbers and tempos (as Decimals). See extract_events().
+    :return: An EventTable
+    """
+    stream = music21.converter.parse(path)
+    parts = []
+    for item in stream:
+        if type(item) == music21.stream.Part:
+            parts.append(item)
+    return extract_events(parts, tempo_overrides)
+
+
+def read_events_from_file(path):
+    """
+    Reads an EventTable (and its ScoreSummary) from a .npz file written by write_events_to_file()
+    :param path: The file path
+    :return: An EventTable
+    """
+    with numpy.load(path, allow_pickle=False) as data:
+        meta = data["meta"]
+        table = EventTable(int(meta[0]), int(meta[1]))
+        for column in _COLUMNS:
+            setattr(table, "_" + column, data[column])
+        table._measure_numbers = data["measure_numbers"]
+        table._measure_starts = data["measure_starts"]
+        table._names = [str(name) for name in data["names"]]
+        table._tempos = [Decimal(str(tempo)) for tempo in data["tempos"]]
+        table._time_signatures = [str(ts) for ts in data["time_signatures"]]
+        summary = ScoreSummary(int(meta[0]), int(meta[1]), int(meta[2]))
+        summary._denominators = [int(d) for d in data["denominators"]]
+        summary._slices_per_quarter = int(meta[3])
+        if meta[4] <= meta[5]:
+            summary._lower_bound = int(meta[4])
+            summary._upper_bound = int(meta[5])
+        summary._tempo_map = [(int(tick), Decimal(str(tempo))) for tick, tempo in
+                              zip(data["tempo_map_ticks"], data["tempo_map_values"])]
+        summary._time_signatures = [(int(tick), str(ts)) for tick, ts in
+                                    zip(data["ts_map_ticks"], data["ts_map_values"])]
+        for part, tick, value in data["clef_map"]:
+            summary._transpositions[part].append((int(tick), int(value)))
+        table._summary = summary
+    return table
+
+
+def write_events_to_file(events, path):
+    """
+    Writes an EventTable (and its ScoreSummary) to a compressed .npz file
+    :param events: An EventTable
+    :param path: The file path (or a file object)
+    :return: None
+    """
+    summary = events.summary
+    lower = summary.lower_bound if summary.lower_bound is not None else 1
+    upper = summary.upper_bound if summary.upper_bound is not None else 0
+    data = {column: getattr(events, column) for column in _COLUMNS}
+    data["meta"] = numpy.array([events.ticks_per_quarter, events.num_parts, summary.num_measures,
+                                summary.slices_per_quarter, lower, upper], dtype=numpy.int64)
+    data["measure_numbers"] = events.measure_numbers
+    data["measure_starts"] = events.measure_starts
+    data["names"] = numpy.array(events.names, dtype=str)
+    data["tempos"] = numpy.array([str(tempo) for tempo in events.tempos], dtype=str)
+    data["time_signatures"] = numpy.array(events.time_signatures, dtype=str)
+    data["denominators"] = numpy.array(summary.denominators, dtype=numpy.int64)
+    data["tempo_map_ticks"] = numpy.array([tempo[0] for tempo in summary.tempo_map], dtype=numpy.int64)
+    data["tempo_map_values"] = numpy.array([str(tempo[1]) for tempo in summary.tempo_map], dtype=str)
+    data["ts_map_ticks"] = numpy.array([ts[0] for ts in summary.time_signatures], dtype=numpy.int64)
+    data["ts_map_values"] = numpy.array([ts[1] for ts in summary.time_signatures], dtype=str)
+    data["clef_map"] = numpy.array([(a, clef[0], clef[1]) for a in range(summary.num_parts)
+                                    for clef in summary.transpositions[a]], dtype=numpy.int64).reshape((-1, 3))
+    numpy.savez_compressed(path, **data)
+
+
+def _make_map(entries):
+    """
+    Makes a map of changes from a list of (tick, value) entries. The entries are sorted by tick, the last
+    entry at each tick is kept, and entries that do not change the value are removed.
+    :param entries: A list of (tick, value) tuples, in the order in which they were encountered
+    :return: A list of (tick, value) tuples
+    """
+    changes = []
+    for entry in sorted(entries, key=lambda x: x[0]):
+        if len(changes) > 0 and changes[-1][0] == entry[0]:
+            changes.pop()
+        if len(changes) == 0 or changes[-1][1] != entry[1]:
+            changes.append(entry)
+    return changes
+
+
+def _read_measure(measure):
+    """
+    Reads the contents of a music21 measure for make_event_table()
+    :param measure: A music21 measure
+    :return: The measure number, offset, and contents
+    """
+    contents = []
+    voice = 0
+    for item in measure:
+        # MusicXML doesn't handle transposition properly for 8va and 8vb clefs, so we need manual transposition.
+        if isinstance(item, music21.clef.Clef):
+            if type(item) == music21.clef.Bass8vaClef or type(item) == music21.clef.Treble8vaClef:
+                contents.append(("clef", Fraction(item.offset), 12))
+            elif type(item) == music21.clef.Bass8vbClef or type(item) == music21.clef.Treble8vbClef:
+                contents.append(("clef", Fraction(item.offset), -12))
+            else:
+                contents.append(("clef", Fraction(item.offset), 0))
+        elif type(item) == music21.meter.TimeSignature:
+            contents.append(("time_signature", Fraction(item.offset), item.ratioString))
+        elif type(item) == music21.tempo.MetronomeMark:
+            # A tempo given only by a <sound> element has no number, just a sounding number
+            number = item.number if item.number is not None else item.numberSounding
+            if number is not None:
+                contents.append(("tempo", Fraction(item.offset), Decimal(number)))
+        elif type(item) == music21.stream.Voice:
+            voice += 1
+            for item2 in item:
+                if type(item2) == music21.note.Note or type(item2) == music21.note.Rest or \
+                        type(item2) == music21.chord.Chord:
+                    contents.append(_read_note(item2, Fraction(item.offset) + Fraction(item2.offset), voice))
+        elif type(item) == music21.note.Note or type(item) == music21.note.Rest or \
+                type(item) == music21.chord.Chord:
+            contents.append(_read_note(item, Fraction(item.offset), 0))
+    return measure.number, Fraction(measure.offset), contents
+
+
+def _read_note(item, offset, voice):
+    """
+    Reads a music21 note, chord, or rest for make_event_table()
+    :param item: The note, chord, or rest
+    :param offset: The offset of the item relative to the start of its measure
+    :param voice: The voice
+    :return: A note tuple
+    """
+    pitches = []
+    if type(item) != music21.note.Rest:
+        pitches = [(p.midi, p.name, p.octave) for p in item.pitches]
+    return "note", offset, Fraction(item.duration.quarterLength), pitches, voice
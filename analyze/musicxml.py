@@ -0,0 +1,300 @@
+"""
+File: musicxml.py
+Author: Jeff Martin
+Email: jeffreymartin@outlook.com
+This file contains a streaming MusicXML reader that extracts an EventTable without building a music21 score.
+Copyright (c) 2022 by Jeff Martin.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import re
+import zipfile
+from decimal import Decimal
+from events import make_event_table, parse_events
+from fractions import Fraction
+from xml.etree import ElementTree
+
+# The pitch-class of each step
+_STEPS = {"C": 0, "D": 2, "E": 4, "F": 5, "G": 7, "A": 9, "B": 11}
+
+# The alterations of the displayed accidentals. music21 spells a note with its displayed accidental, and uses
+# the accidental for the pitch too when a note has no <alter>.
+_ACCIDENTALS = {"natural": 0, "sharp": 1, "flat": -1, "double-sharp": 2, "sharp-sharp": 2, "flat-flat": -2}
+
+# The sort order of measure contents at the same offset. This matches the order that music21 uses.
+_ORDER = {"clef": 0, "tempo": 1, "time_signature": 4, "voice": 5, "note": 20}
+
+# The length of each note type, in quarter notes
+_TYPES = {"maxima": Fraction(32), "long": Fraction(16), "breve": Fraction(8), "whole": Fraction(4),
+          "half": Fraction(2), "quarter": Fraction(1), "eighth": Fraction(1, 2), "16th": Fraction(1, 4),
+          "32nd": Fraction(1, 8), "64th": Fraction(1, 16), "128th": Fraction(1, 32), "256th": Fraction(1, 64),
+          "512th": Fraction(1, 128), "1024th": Fraction(1, 256)}
+
+
+def read_musicxml(path, tempo_overrides=None):
+    """
+    Reads an EventTable from an uncompressed (.xml, .musicxml) or compressed (.mxl) partwise MusicXML file.
+    The file is streamed with ElementTree.iterparse, and each measure is discarded as soon as it has been read,
+    so no score tree is built. The resulting EventTable matches the one that extract_events() produces from the
+    music21 parse of the same file: tied notes remain separate events, tuplets are read from the <duration>
+    values, <backup> and <forward> move the position within the measure, and octave treble and bass clefs are
+    recorded as transpositions. Tempos are taken from <metronome> marks, or from <sound tempo> if there is no
+    metronome mark.
+    :param path: The path of the MusicXML file
+    :param tempo_overrides: A dictionary of measure numbers and tempos (as Decimals). See make_event_table().
+    :return: An EventTable
+    :raise ValueError: If the file contains notation that the reader does not support (multi-staff parts,
+    microtones, timewise scores), or notation that music21 would read differently: note durations that do
+    not match their written types, accidentals that do not match their alterations, and directions that
+    extend a measure so that its length does not match its time signature. Use read_score() to fall back to
+    music21 automatically.
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            with archive.open(_get_root_file(archive)) as file:
+                measures = _read_parts(file)
+    else:
+        with open(path, "rb") as file:
+            measures = _read_parts(file)
+    return make_event_table(measures, tempo_overrides)
+
+
+def read_score(path, tempo_overrides=None):
+    """
+    Reads the EventTable of a score. MusicXML files are read with read_musicxml(), and anything that it does
+    not support (including other file formats) is parsed with music21.
+    :param path: The path of the score
+    :param tempo_overrides: A dictionary of measure numbers and tempos (as Decimals). See make_event_table().
+    :return: An EventTable
+    """
+    if str(path).lower().endswith((".xml", ".musicxml", ".mxl")):
+        try:
+            return read_musicxml(path, tempo_overrides)
+        except (ValueError, ElementTree.ParseError):
+            pass
+    return parse_events(path, tempo_overrides)
+
+
+def _get_root_file(archive):
+    """
+    Gets the name of the score file in a compressed MusicXML archive
+    :param archive: A ZipFile
+    :return: The name of the score file
+    """
+    names = archive.namelist()
+    if "META-INF/container.xml" in names:
+        container = ElementTree.fromstring(archive.read("META-INF/container.xml"))
+        for rootfile in container.iter("rootfile"):
+            if rootfile.get("full-path") is not None:
+                return rootfile.get("full-path")
+    for name in names:
+        if not name.startswith("META-INF") and (name.endswith(".xml") or name.endswith(".musicxml")):
+            return name
+    raise ValueError("The archive does not contain a MusicXML score.")
+
+
+def _get_written_duration(note, duration):
+    """
+    Gets the duration of a <note> from its <type>, <dot>s, and <time-modification>. music21 uses this duration
+    instead of the <duration> when the two differ.
+    :param note: A <note> element
+    :param duration: The duration of the note from its <duration>, which is used if the note has no type
+    :return: The written duration in quarter notes
+    """
+    note_type = note.findtext("type", "").strip()
+    if note_type == "":
+        return duration
+    if note_type not in _TYPES:
+        raise ValueError(f"The note type {note_type} is not supported.")
+    dots = len(note.findall("dot"))
+    written = _TYPES[note_type] * (2 - Fraction(1, 2 ** dots))
+    modification = note.find("time-modification")
+    if modification is not None:
+        written *= Fraction(int(modification.findtext("normal-notes")), int(modification.findtext("actual-notes")))
+    return written
+
+
+def _get_transposition(clef):
+    """
+    Gets the transposition of an octave treble or bass clef. MusicXML doesn't handle transposition properly for
+    8va and 8vb clefs, so we need manual transposition.
+    :param clef: A <clef> element
+    :return: The transposition in semitones
+    """
+    sign = clef.findtext("sign", "").strip()
+    line = clef.findtext("line", "").strip()
+    change = int(clef.findtext("clef-octave-change", "0"))
+    if abs(change) == 1 and ((sign == "G" and line in ("", "2")) or (sign == "F" and line in ("", "4"))):
+        return 12 * change
+    return 0
+
+
+def _read_measure(measure, state):
+    """
+    Reads the contents of a <measure> element
+    :param measure: The <measure> element
+    :param state: The running state of the part (divisions, current time signature length, and the hidden
+    rest that ends the measure, if any)
+    :return: The measure number, the length of the measure in quarter notes, and the contents of the measure
+    :raise ValueError: If the measure contains unsupported notation, or its durations would be read differently
+    by music21
+    """
+    contents = []   # (sort key, item) tuples
+    voices = []     # The voice ids in order of appearance
+    position = Fraction(0)
+    length = Fraction(0)
+    extent = Fraction(0)  # The latest offset of a direction
+    last_note = None
+    forward_rest = None  # The hidden rest of a <forward> that ends the measure
+    for i, element in enumerate(measure):
+        if element.tag == "attributes":
+            if element.findtext("divisions") is not None:
+                state["divisions"] = int(element.findtext("divisions"))
+            if int(element.findtext("staves", "1")) > 1:
+                raise ValueError("Multi-staff parts are not supported.")
+            for clef in element.iter("clef"):
+                contents.append(((position, _ORDER["clef"], i), ("clef", position, _get_transposition(clef))))
+            for time in element.iter("time"):
+                beats = time.findall("beats")
+                beat_types = time.findall("beat-type")
+                if len(beats) == 1 and len(beat_types) == 1:
+                    ratio = f"{beats[0].text.strip()}/{beat_types[0].text.strip()}"
+                    state["bar_length"] = Fraction(sum([int(b) for b in beats[0].text.split("+")]) * 4,
+                                                   int(beat_types[0].text))
+                    contents.append(((position, _ORDER["time_signature"], i), ("time_signature", position, ratio)))
+                elif len(beats) > 1:
+                    raise ValueError("Composite time signatures are not supported.")
+        elif element.tag == "direction" or element.tag == "sound":
+            offset = position
+            if element.findtext("offset") is not None:
+                offset += Fraction(int(element.findtext("offset")), state["divisions"])
+            extent = max(extent, offset)
+            tempo = element.findtext("direction-type/metronome/per-minute")
+            sound = element if element.tag == "sound" else element.find("sound")
+            if tempo is not None and re.fullmatch(r"\s*\d+(\.\d*)?\s*", tempo):
+                contents.append(((offset, _ORDER["tempo"], i), ("tempo", offset, Decimal(float(tempo)))))
+            elif sound is not None and sound.get("tempo") is not None:
+                tempo = Decimal(float(sound.get("tempo")))
+                contents.append(((offset, _ORDER["tempo"], i), ("tempo", offset, tempo)))
+        elif element.tag == "backup":
+            position -= Fraction(int(element.findtext("duration")), state["divisions"])
+        elif element.tag == "forward":
+            # music21 fills a forward with a hidden rest
+            duration = Fraction(int(element.findtext("duration")), state["divisions"])
+            voice = element.findtext("voice", voices[-1] if len(voices) > 0 else "1")
+            if voice not in voices:
+                voices.append(voice)
+            forward_rest = [position, i, voice, ["note", position, duration, [], 0]]
+            contents.append(forward_rest)
+            position += duration
+            length = max(length, position)
+        elif element.tag == "note":
+            forward_rest = None
+            # Grace notes have no duration
+            duration = Fraction(int(element.findtext("duration", "0")), state["divisions"])
+            if element.find("grace") is None and duration != _get_written_duration(element, duration):
+                raise ValueError("Note durations that do not match their types are not supported.")
+            voice = element.findtext("voice", "1")
+            if voice not in voices:
+                voices.append(voice)
+            pitches = []
+            pitch = element.find("pitch")
+            if pitch is not None:
+                step = pitch.findtext("step").strip()
+                alter = Fraction(pitch.findtext("alter", "0"))
+                if alter.denominator != 1:
+                    raise ValueError("Microtones are not supported.")
+                accidental = element.findtext("accidental", "").strip()
+                if accidental and _ACCIDENTALS.get(accidental) != alter:
+                    raise ValueError("Accidentals that do not match their alterations are not supported.")
+                octave = int(pitch.findtext("octave"))
+                name = step + ("#" * int(alter) if alter > 0 else "-" * -int(alter))
+                pitches.append(((octave + 1) * 12 + _STEPS[step] + int(alter), name, octave))
+            elif element.find("rest") is None:
+                # Unpitched notes are not analyzed, but they still take up time
+                if element.find("chord") is None:
+                    position += duration
+                    length = max(length, position)
+                continue
+            if element.find("chord") is not None and last_note is not None:
+                last_note[3][3] += pitches
+            else:
+                last_note = [position, i, voice, ["note", position, duration, pitches, 0]]
+                contents.append(last_note)
+                position += duration
+                length = max(length, position)
+
+    # Arrange the contents in the order that music21 would use. If there is more than one voice, all notes
+    # and rests belong to voices, which follow the other contents at offset 0.
+    items = []
+    state["forward_rest"] = None
+    for item in contents:
+        if type(item) == tuple:
+            items.append(item)
+        elif len(voices) > 1:
+            item[3][4] = voices.index(item[2]) + 1
+            items.append(((Fraction(0), _ORDER["voice"], item[3][4], item[0], item[1]), tuple(item[3])))
+        else:
+            items.append(((item[0], _ORDER["note"], item[1]), tuple(item[3])))
+            if item is forward_rest:
+                state["forward_rest"] = items[-1][1]
+    items.sort(key=lambda x: x[0])
+
+    # An empty measure lasts as long as its time signature. music21 extends a measure to any direction that is
+    # offset past its notes. If that makes the measure disagree with its time signature, the parts may no longer
+    # agree on where the following measures start.
+    if length == 0 and len(items) == 0:
+        length = state["bar_length"]
+    elif extent > length:
+        if extent != state["bar_length"]:
+            raise ValueError("Directions that extend a measure past its time signature are not supported.")
+        length = extent
+    number = re.match(r"\d*", measure.get("number", ""))[0]
+    return int(number) if number != "" else 0, length, [item[1] for item in items]
+
+
+def _read_parts(file):
+    """
+    Reads the measures of each part of a partwise MusicXML file
+    :param file: A binary file object
+    :return: A list of lists of measures, as described in make_event_table()
+    """
+    parts = []
+    state = None
+    offset = Fraction(0)
+    for event, element in ElementTree.iterparse(file, events=("start", "end")):
+        tag = element.tag
+        if event == "start":
+            if tag == "score-timewise":
+                raise ValueError("Timewise scores are not supported.")
+            elif tag == "part" and state is None:
+                parts.append([])
+                state = {"divisions": 1, "bar_length": Fraction(4), "forward_rest": None}
+                offset = Fraction(0)
+        elif tag == "measure" and state is not None:
+            number, length, contents = _read_measure(element, state)
+            parts[-1].append((number, offset, contents))
+            offset += length
+            element.clear()
+        elif tag == "part" and state is not None:
+            # Like music21, drop the hidden rest of a <forward> that closes the last measure of a part
+            if len(parts[-1]) > 0 and state["forward_rest"] is not None:
+                contents = parts[-1][-1][2]
+                notes = [j for j in range(len(contents)) if contents[j][0] == "note"]
+                if contents[notes[-1]] is state["forward_rest"]:
+                    del contents[notes[-1]]
+            state = None
+            element.clear()
+    return parts
@@ -21,19 +21,22 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import numpy
 from decimal import Decimal
+from slice_table import SliceTable, make_slice_table
 
 
 class Results:
-    def __init__(self, slices, measure_num_first, measure_num_last, voices, start_time=0):
+    def __init__(self, slices, measure_num_first, measure_num_last, voices, start_time=0, statistics=None):
         """
         Creates a Results object
-        :param slices: A list of slices
+        :param slices: A SliceTable or a list of slices
         :param measure_num_first: The first measure number analyzed
         :param measure_num_last: The last measure number analyzed
+        :param statistics: The SliceStatistics of the slices. If None, they will be calculated from the slices.
         """
         self._max_p_count = 0  # The maximum number of pitches in a chord (may be greater than PS)
         self._cseg_duration = None
         self._cseg_frequency = None
+        self._cseg_table = None  # The csegs as tuples, with their durations and frequencies
         self._duration = 0
         self._ins_avg = 0  # The INS average
         self._ins_max = 0
@@ -64,21 +67,26 @@ class Results:
         self._pitch_lowest_voices = None
         self._pset_duration = None
         self._pset_frequency = None
+        self._pset_table = None
         self._psc_duration = None
         self._psc_frequency = None
+        self._psc_table = None
         self._ps_avg = 0  # The PS average
         self._ps_max = 0
         self._ps_min = 0
         self._quarter_duration = 0
         self._slices = slices
         self._start_time = Decimal(start_time)
+        self._time_base = None  # The TimeBase of the slice durations
         self._uns_avg = 0  # The UNS average
         self._uns_max = 0
         self._uns_min = 0
         self._upper_bound = 0
 
         # Calculate values
-        self._calculate_values()
+        if statistics is None:
+            statistics = SliceStatistics(slices, voices)
+        self._calculate_values(statistics)
 
     @property
     def max_p_count(self):
@@ -95,6 +103,8 @@ class Results:
         and their cumulative durations in the analyzed measures (in seconds) are the values
         :return: A dictionary
         """
+        if self._cseg_duration is None and self._cseg_table is not None:
+            self._format_tables()
         return self._cseg_duration
 
     @property
@@ -104,6 +114,8 @@ class Results:
         and the number of nonconsecutive occurrences in the analyzed measures are the values
         :return: A dictionary
         """
+        if self._cseg_frequency is None and self._cseg_table is not None:
+            self._format_tables()
         return self._cseg_frequency
 
     @property
@@ -345,6 +357,8 @@ class Results:
         and their cumulative durations in the analyzed measures (in seconds) are the values
         :return: A dictionary
         """
+        if self._pset_duration is None and self._pset_table is not None:
+            self._format_tables()
         return self._pset_duration
 
     @property
@@ -354,6 +368,8 @@ class Results:
         and the number of nonconsecutive occurrences in the analyzed measures are the values
         :return: A dictionary
         """
+        if self._pset_frequency is None and self._pset_table is not None:
+            self._format_tables()
         return self._pset_frequency
 
     @property
@@ -363,6 +379,8 @@ class Results:
         and their cumulative durations in the analyzed measures (in seconds) are the values
         :return: A dictionary
         """
+        if self._psc_duration is None and self._psc_table is not None:
+            self._format_tables()
         return self._psc_duration
 
     @property
@@ -372,6 +390,8 @@ class Results:
         and the number of nonconsecutive occurrences in the analyzed measures are the values
         :return: A dictionary
         """
+        if self._psc_frequency is None and self._psc_table is not None:
+            self._format_tables()
         return self._psc_frequency
 
     @property
@@ -454,9 +474,10 @@ class Results:
         """
         return self._upper_bound
 
-    def _calculate_values(self):
+    def _calculate_values(self, statistics):
         """
-        Calculates values for the results object
+        Calculates values for the results object from the statistics of its slices and the register bounds
+        :param statistics: The SliceStatistics of the slices
         :return: None
         """
         if len(self._slices) > 0:
@@ -468,150 +489,570 @@ class Results:
             self._lns_min = self._lps_card
             self._mediant_max = self._lower_bound
             self._mediant_min = self._upper_bound
-            self._cseg_duration = {}  # The duration of each cseg
-            self._cseg_frequency = {}  # The number of occurrences of each cseg
-            self._pc_duration = {}  # The total number of seconds that this pitch-class is active
-            self._pc_duration_voices = [{} for v in range(self._num_voices)]
-            self._pc_frequency = {}  # The total number of distinct (nonadjacent) occurrences of this pitch-class
-            self._pc_frequency_voices = [{} for v in range(self._num_voices)]
-            self._pitch_duration = {}  # The total number of seconds that this pitch is active
-            self._pitch_duration_voices = [{} for v in range(self._num_voices)]
-            self._pitch_frequency = {}  # The total number of distinct (nonadjacent) occurrences of this pitch
-            self._pitch_frequency_voices = [{} for v in range(self._num_voices)]
-            self._pitch_highest_voices = [-numpy.inf for v in range(self._num_voices)]
-            self._pitch_lowest_voices = [numpy.inf for v in range(self._num_voices)]
-            self._pset_duration = {}
-            self._pset_frequency = {}
-            self._psc_duration = {}
-            self._psc_frequency = {}
             self._ps_min = self._lps_card
             self._uns_min = self._lps_card
+            self._duration = statistics.time_base.get_seconds(statistics.units)
+            self._quarter_duration = statistics.time_base.get_quarters(statistics.ticks)
+            self._max_p_count = statistics.max_p_count
 
-            # Sum values for averages and establish maxes and mins
-            for s in self._slices:
-                self._duration += s.duration
-                self._quarter_duration += s.quarter_duration
-                if s.ps is not None:
-                    self._ps_avg += s.ps
-                    if self._ps_max < s.ps:
-                        self._ps_max = s.ps
-                    if self._ps_min > s.ps:
-                        self._ps_min = s.ps
-                    if s.p_cardinality > 0:
-                        if self._pitch_lowest > s.pseg[0].p:
-                            self._pitch_lowest = s.pseg[0].p
-                        if self._pitch_highest < s.pseg[len(s.pseg) - 1].p:
-                            self._pitch_highest = s.pseg[len(s.pseg) - 1].p
-                        for v in range(self._num_voices):
-                            if len(s.psegs[v]) > 0:
-                                # print(v, len(self._pitch_lowest_voices), len(s.psegs))
-                                if self._pitch_lowest_voices[v] > s.psegs[v][0].p:
-                                    self._pitch_lowest_voices[v] = s.psegs[v][0].p
-                                if self._pitch_highest_voices[v] < s.psegs[v][len(s.psegs[v]) - 1].p:
-                                    self._pitch_highest_voices[v] = s.psegs[v][len(s.psegs[v]) - 1].p
-                if s.uns is not None:
-                    self._ins_avg += s.ins
-                    self._lns_avg += s.lns
-                    self._mediant_avg += s.mediant
-                    self._uns_avg += s.uns
-                    if self._ins_max < s.ins:
-                        self._ins_max = s.ins
-                    if self._ins_min > s.ins:
-                        self._ins_min = s.ins
-                    if self._lns_max < s.lns:
-                        self._lns_max = s.lns
-                    if self._lns_min > s.lns:
-                        self._lns_min = s.lns
-                    if self._mediant_max < s.mediant:
-                        self._mediant_max = s.mediant
-                    if self._mediant_max > s.mediant:
-                        self._mediant_max = s.mediant
-                    if self._uns_max < s.uns:
-                        self._uns_max = s.uns
-                    if self._uns_min > s.uns:
-                        self._uns_min = s.uns
-                if self._max_p_count < s.p_cardinality:
-                    self._max_p_count = s.p_cardinality
-
-            # Calculate pitch frequency
-            for i in range(0, len(self._slices)):
-                for v in range(len(self._slices[i].psets)):
-                    for p in self._slices[i].psets[v]:
-                        if p.p not in self._pitch_duration_voices[v].keys():
-                            self._pitch_duration_voices[v][p.p] = self._slices[i].duration
-                        else:
-                            self._pitch_duration_voices[v][p.p] += self._slices[i].duration
-                        if p.p not in self._pitch_frequency_voices[v].keys():
-                            self._pitch_frequency_voices[v][p.p] = 1
-                        elif len(self._slices[i-1].psets) == 0 or p not in self._slices[i-1].psets[v]:
-                            self._pitch_frequency_voices[v][p.p] += 1
-                    for pc in self._slices[i].pcsets[v]:
-                        if pc.pc not in self._pc_duration_voices[v].keys():
-                            self._pc_duration_voices[v][pc.pc] = self._slices[i].duration
-                        else:
-                            self._pc_duration_voices[v][pc.pc] += self._slices[i].duration
-                        if pc.pc not in self._pc_frequency_voices[v].keys():
-                            self._pc_frequency_voices[v][pc.pc] = 1
-                        elif len(self._slices[i - 1].pcsets) == 0 or pc not in self._slices[i - 1].pcsets[v]:
-                            self._pc_frequency_voices[v][pc.pc] += 1
-                for p in self._slices[i].pset:
-                    if p.p not in self._pitch_duration.keys():
-                        self._pitch_duration[p.p] = self._slices[i].duration
-                    else:
-                        self._pitch_duration[p.p] += self._slices[i].duration
-                    if p.p not in self._pitch_frequency.keys():
-                        self._pitch_frequency[p.p] = 1
-                    elif p not in self._slices[i-1].pset:
-                        self._pitch_frequency[p.p] += 1
-                for pc in self._slices[i].pcset:
-                    if pc.pc not in self._pc_duration.keys():
-                        self._pc_duration[pc.pc] = self._slices[i].duration
-                    else:
-                        self._pc_duration[pc.pc] += self._slices[i].duration
-                    if pc.pc not in self._pc_frequency.keys():
-                        self._pc_frequency[pc.pc] = 1
-                    elif pc not in self._slices[i-1].pcset:
-                        self._pc_frequency[pc.pc] += 1
-
-            # Calculate cseg frequency
-            for s in self._slices:
-                cseg = s.get_cseg_string()
-                pset = s.get_pset_string()
-                psc = str(s.ipseg)
-                if cseg not in self._cseg_frequency:
-                    self._cseg_frequency[cseg] = 1
-                    self._cseg_duration[cseg] = s.duration
-                else:
-                    self._cseg_frequency[cseg] += 1
-                    self._cseg_duration[cseg] += s.duration
-                if pset not in self._pset_frequency:
-                    self._pset_frequency[pset] = 1
-                    self._pset_duration[pset] = s.duration
-                else:
-                    self._pset_frequency[pset] += 1
-                    self._pset_duration[pset] += s.duration
-                if psc not in self._psc_frequency:
-                    self._psc_frequency[psc] = 1
-                    self._psc_duration[psc] = s.duration
-                else:
-                    self._psc_frequency[psc] += 1
-                    self._psc_duration[psc] += s.duration
-
-        # Finalize average calculation
-        non_null = self._get_non_null()
-        self._ins_avg /= non_null
-        self._lns_avg /= non_null
-        self._mediant_avg /= non_null
-        self._ps_avg /= len(self._slices)
-        self._uns_avg /= non_null
-
-    def _get_non_null(self):
-        """
-        Gets the number of slices that do not contain None for LNS and UNS
+            # Sum values for averages and establish maxes and mins. Only the slices that contain pitches
+            # have INS, LNS, MT, and UNS, and those depend on the bounds.
+            self._ps_avg = statistics.ps_sum
+            self._ps_max = max(self._ps_max, statistics.ps_max)
+            self._ps_min = min(self._ps_min, statistics.ps_min)
+            self._pitch_highest = max(self._pitch_highest, statistics.pitch_highest)
+            self._pitch_lowest = min(self._pitch_lowest, statistics.pitch_lowest)
+            n = statistics.num_sounding
+            if n > 0:
+                self._ins_avg = statistics.ins_sum
+                self._lns_avg = statistics.low_sum - n * self._lower_bound
+                self._uns_avg = n * self._upper_bound - statistics.high_sum
+                self._mediant_avg = (self._lns_avg - self._uns_avg) / 2
+                self._ins_max = max(self._ins_max, statistics.ins_max)
+                self._ins_min = min(self._ins_min, statistics.ins_min)
+                self._lns_max = max(self._lns_max, statistics.pitch_lowest_max - self._lower_bound)
+                self._lns_min = min(self._lns_min, statistics.pitch_lowest - self._lower_bound)
+                self._uns_max = max(self._uns_max, self._upper_bound - statistics.pitch_highest_min)
+                self._uns_min = min(self._uns_min, self._upper_bound - statistics.pitch_highest)
+                # The MT max has always been reported as the MT of the last slice, and the MT min as the upper bound
+                lowest, highest = statistics.last_extremes
+                self._mediant_max = ((lowest - self._lower_bound) - (self._upper_bound - highest)) / 2
+
+        # Pitch and pitch-class tables, with the durations converted from time units to seconds
+        self._time_base = statistics.time_base
+        self._pc_duration, self._pc_frequency = _convert_table(statistics.pc_table, self._time_base)
+        pc_tables = [_convert_table(table, self._time_base) for table in statistics.pc_tables_voices]
+        self._pc_duration_voices = [table[0] for table in pc_tables]
+        self._pc_frequency_voices = [table[1] for table in pc_tables]
+        self._pitch_duration, self._pitch_frequency = _convert_table(statistics.pitch_table, self._time_base)
+        pitch_tables = [_convert_table(table, self._time_base) for table in statistics.pitch_tables_voices]
+        self._pitch_duration_voices = [table[0] for table in pitch_tables]
+        self._pitch_frequency_voices = [table[1] for table in pitch_tables]
+        self._pitch_highest_voices = list(statistics.pitch_highest_voices)
+        self._pitch_lowest_voices = list(statistics.pitch_lowest_voices)
+
+        # The cseg, pset, and psc tables are kept with tuple keys until they are requested
+        self._cseg_table = statistics.cseg_table
+        self._pset_table = statistics.pset_table
+        self._psc_table = statistics.psc_table
+
+        # Finalize average calculation. A section without slices (or pitches) has averages of 0.
+        non_null = statistics.num_sounding
+        if non_null > 0:
+            self._ins_avg /= non_null
+            self._lns_avg /= non_null
+            self._mediant_avg /= non_null
+            self._uns_avg /= non_null
+        if len(self._slices) > 0:
+            self._ps_avg /= len(self._slices)
+
+    def _format_tables(self):
+        """
+        Makes the string-keyed cseg, pset, and psc tables
+        :return: None
+        """
+        self._cseg_duration, self._cseg_frequency = _format_table(
+            self._cseg_table, self._time_base, lambda cseg: "<" + ", ".join([str(cp) for cp in cseg]) + ">")
+        self._pset_duration, self._pset_frequency = _format_table(
+            self._pset_table, self._time_base, lambda pset: "{" + ", ".join([str(p) for p in pset]) + "}")
+        self._psc_duration, self._psc_frequency = _format_table(
+            self._psc_table, self._time_base, lambda psc: str(list(psc)))
+
+
+class SliceStatistics:
+    def __init__(self, slices, voices):
+        """
+        Calculates the statistics of a run of consecutive slices: counts, sums, maxes and mins, and the
+        duration and frequency tables. The statistics do not depend on the register bounds, so a Results
+        object can be made from them for any bounds. The statistics of adjacent runs can be combined
+        with combine(), so sections can be analyzed from the statistics of their parts.
+        :param slices: A SliceTable or a list of slices
+        :param voices: The number of voices
+        """
+        if not isinstance(slices, SliceTable):
+            slices = make_slice_table(slices, voices)
+        self._num_slices = len(slices)
+        self._num_voices = voices
+        self._first = slices[0] if len(slices) > 0 else None  # The first and last slices, for combining
+        self._last = slices[-1] if len(slices) > 0 else None
+        self._time_base = slices.time_base if len(slices) > 0 else None
+        durations = slices.units
+        self._ticks = int(slices.ticks.sum())
+        self._units = int(durations.sum())
+
+        # The PS of each slice is its cardinality
+        ps = slices.p_cardinality
+        self._max_p_count = int(ps.max()) if len(ps) > 0 else 0
+        self._ps_sum = int(ps.sum())
+        self._ps_max = int(ps.max()) if len(ps) > 0 else -numpy.inf
+        self._ps_min = int(ps.min()) if len(ps) > 0 else numpy.inf
+
+        # The lowest and highest pitch of each slice that contains pitches, from which LNS, MT, and UNS
+        # can be calculated for any bounds
+        sounding, lowest, highest = slices.get_extremes()
+        ins = highest - lowest + 1 - ps[sounding]
+        self._num_sounding = len(sounding)
+        self._ins_sum = int(ins.sum())
+        self._low_sum = int(lowest.sum())
+        self._high_sum = int(highest.sum())
+        self._ins_max = int(ins.max()) if len(ins) > 0 else -numpy.inf
+        self._ins_min = int(ins.min()) if len(ins) > 0 else numpy.inf
+        self._low_max = int(lowest.max()) if len(ins) > 0 else -numpy.inf
+        self._low_min = int(lowest.min()) if len(ins) > 0 else numpy.inf
+        self._high_max = int(highest.max()) if len(ins) > 0 else -numpy.inf
+        self._high_min = int(highest.min()) if len(ins) > 0 else numpy.inf
+        self._last_extremes = (int(lowest[-1]), int(highest[-1])) if len(ins) > 0 else None
+
+        # The lowest and highest pitch of each voice
+        self._pitch_highest_voices = [-numpy.inf for v in range(voices)]
+        self._pitch_lowest_voices = [numpy.inf for v in range(voices)]
+        voice, lowest, highest = slices.get_voice_extremes()
+        if len(voice) > 0:
+            voice_lowest = numpy.full(voices, numpy.iinfo(numpy.int64).max)
+            voice_highest = numpy.full(voices, numpy.iinfo(numpy.int64).min)
+            numpy.minimum.at(voice_lowest, voice, lowest)
+            numpy.maximum.at(voice_highest, voice, highest)
+            for v in numpy.unique(voice):
+                self._pitch_lowest_voices[v] = int(voice_lowest[v])
+                self._pitch_highest_voices[v] = int(voice_highest[v])
+
+        # Duration and frequency tables
+        self._pitch_table = _tabulate_sets(*slices.get_members(), durations)
+        self._pc_table = _tabulate_sets(*slices.get_members(True), durations)
+        self._pitch_tables_voices = [_tabulate_sets(*slices.get_members(False, v), durations)
+                                     for v in range(voices)]
+        self._pc_tables_voices = [_tabulate_sets(*slices.get_members(True, v), durations)
+                                  for v in range(voices)]
+        keys = slices.get_keys()
+        self._cseg_table = _tabulate_keys([k[0] for k in keys], durations)
+        self._pset_table = _tabulate_keys([k[1] for k in keys], durations)
+        self._psc_table = _tabulate_keys([k[2] for k in keys], durations)
+
+    @property
+    def cseg_table(self):
+        """
+        The duration and frequency dictionaries of the csegs, keyed by tuples
+        :return: The duration and frequency dictionaries
+        """
+        return self._cseg_table
+
+    @property
+    def high_sum(self):
+        """
+        The sum of the highest pitches of the slices that contain pitches
+        :return: The sum
+        """
+        return self._high_sum
+
+    @property
+    def ins_max(self):
+        """
+        The maximum INS of the slices that contain pitches
+        :return: The maximum INS (-inf if no slice contains pitches)
+        """
+        return self._ins_max
+
+    @property
+    def ins_min(self):
+        """
+        The minimum INS of the slices that contain pitches
+        :return: The minimum INS (inf if no slice contains pitches)
+        """
+        return self._ins_min
+
+    @property
+    def ins_sum(self):
+        """
+        The sum of the INS of the slices that contain pitches
+        :return: The sum
+        """
+        return self._ins_sum
+
+    @property
+    def last_extremes(self):
+        """
+        The lowest and highest pitches of the last slice that contains pitches
+        :return: A tuple of the lowest and highest pitches, or None if no slice contains pitches
+        """
+        return self._last_extremes
+
+    @property
+    def low_sum(self):
+        """
+        The sum of the lowest pitches of the slices that contain pitches
+        :return: The sum
+        """
+        return self._low_sum
+
+    @property
+    def max_p_count(self):
+        """
+        The maximum cardinality of the slices
+        :return: The maximum cardinality
+        """
+        return self._max_p_count
+
+    @property
+    def num_slices(self):
+        """
+        The number of slices
+        :return: The number of slices
+        """
+        return self._num_slices
+
+    @property
+    def num_sounding(self):
+        """
+        The number of slices that contain pitches
         :return: The number of slices
         """
-        counter = 0
-        for s in self._slices:
-            if s.uns is not None:
-                counter += 1
-        return counter
+        return self._num_sounding
+
+    @property
+    def pc_table(self):
+        """
+        The duration and frequency dictionaries of the pitch-classes
+        :return: The duration and frequency dictionaries
+        """
+        return self._pc_table
+
+    @property
+    def pc_tables_voices(self):
+        """
+        The duration and frequency dictionaries of the pitch-classes in each voice
+        :return: A list of (duration, frequency) tuples
+        """
+        return self._pc_tables_voices
+
+    @property
+    def pitch_highest(self):
+        """
+        The highest pitch of the slices
+        :return: The highest pitch (-inf if no slice contains pitches)
+        """
+        return self._high_max
+
+    @property
+    def pitch_highest_min(self):
+        """
+        The lowest of the highest pitches of the slices that contain pitches
+        :return: The pitch (inf if no slice contains pitches)
+        """
+        return self._high_min
+
+    @property
+    def pitch_highest_voices(self):
+        """
+        The highest pitch of each voice
+        :return: A list of pitches (-inf for a voice without pitches)
+        """
+        return self._pitch_highest_voices
+
+    @property
+    def pitch_lowest(self):
+        """
+        The lowest pitch of the slices
+        :return: The lowest pitch (inf if no slice contains pitches)
+        """
+        return self._low_min
+
+    @property
+    def pitch_lowest_max(self):
+        """
+        The highest of the lowest pitches of the slices that contain pitches
+        :return: The pitch (-inf if no slice contains pitches)
+        """
+        return self._low_max
+
+    @property
+    def pitch_lowest_voices(self):
+        """
+        The lowest pitch of each voice
+        :return: A list of pitches (inf for a voice without pitches)
+        """
+        return self._pitch_lowest_voices
+
+    @property
+    def pitch_table(self):
+        """
+        The duration and frequency dictionaries of the pitches
+        :return: The duration and frequency dictionaries
+        """
+        return self._pitch_table
+
+    @property
+    def pitch_tables_voices(self):
+        """
+        The duration and frequency dictionaries of the pitches in each voice
+        :return: A list of (duration, frequency) tuples
+        """
+        return self._pitch_tables_voices
+
+    @property
+    def ps_max(self):
+        """
+        The maximum PS of the slices
+        :return: The maximum PS (-inf if there are no slices)
+        """
+        return self._ps_max
+
+    @property
+    def ps_min(self):
+        """
+        The minimum PS of the slices
+        :return: The minimum PS (inf if there are no slices)
+        """
+        return self._ps_min
+
+    @property
+    def ps_sum(self):
+        """
+        The sum of the PS of the slices
+        :return: The sum
+        """
+        return self._ps_sum
+
+    @property
+    def psc_table(self):
+        """
+        The duration and frequency dictionaries of the pscs, keyed by tuples
+        :return: The duration and frequency dictionaries
+        """
+        return self._psc_table
+
+    @property
+    def pset_table(self):
+        """
+        The duration and frequency dictionaries of the psets, keyed by tuples
+        :return: The duration and frequency dictionaries
+        """
+        return self._pset_table
+
+    @property
+    def ticks(self):
+        """
+        The duration of the slices in ticks
+        :return: The duration
+        """
+        return self._ticks
+
+    @property
+    def time_base(self):
+        """
+        The TimeBase of the slice durations
+        :return: The TimeBase (None if there are no slices)
+        """
+        return self._time_base
+
+    @property
+    def units(self):
+        """
+        The duration of the slices in time units of the timebase
+        :return: The duration
+        """
+        return self._units
+
+    def combine(self, other, merge=False):
+        """
+        Combines these statistics with the statistics of the run of slices that immediately follows
+        :param other: The statistics of the following run of slices
+        :param merge: Whether or not the last slice of this run and the first slice of the following run
+        are merged into one slice if they have the same pitches (as merge_slices() does)
+        :return: The combined statistics
+        """
+        if other._num_slices == 0:
+            return self
+        if self._num_slices == 0:
+            return other
+        combined = SliceStatistics([], self._num_voices)
+        combined._num_slices = self._num_slices + other._num_slices
+        combined._first = self._first
+        combined._last = other._last
+        combined._time_base = self._time_base
+        combined._ticks = self._ticks + other._ticks
+        combined._units = self._units + other._units
+        combined._max_p_count = max(self._max_p_count, other._max_p_count)
+        combined._ps_sum = self._ps_sum + other._ps_sum
+        combined._ps_max = max(self._ps_max, other._ps_max)
+        combined._ps_min = min(self._ps_min, other._ps_min)
+        combined._num_sounding = self._num_sounding + other._num_sounding
+        combined._ins_sum = self._ins_sum + other._ins_sum
+        combined._low_sum = self._low_sum + other._low_sum
+        combined._high_sum = self._high_sum + other._high_sum
+        combined._ins_max = max(self._ins_max, other._ins_max)
+        combined._ins_min = min(self._ins_min, other._ins_min)
+        combined._low_max = max(self._low_max, other._low_max)
+        combined._low_min = min(self._low_min, other._low_min)
+        combined._high_max = max(self._high_max, other._high_max)
+        combined._high_min = min(self._high_min, other._high_min)
+        combined._last_extremes = other._last_extremes if other._num_sounding > 0 else self._last_extremes
+        combined._pitch_highest_voices = [max(self._pitch_highest_voices[v], other._pitch_highest_voices[v])
+                                          for v in range(self._num_voices)]
+        combined._pitch_lowest_voices = [min(self._pitch_lowest_voices[v], other._pitch_lowest_voices[v])
+                                         for v in range(self._num_voices)]
+
+        # Pitches that sound in the last slice of this run and the first slice of the following run
+        # are continuing, not recurring
+        last = self._last
+        first = other._first
+        combined._pitch_table = _combine_tables(self._pitch_table, other._pitch_table,
+                                                [p.p for p in last.pset.intersection(first.pset)])
+        combined._pc_table = _combine_tables(self._pc_table, other._pc_table,
+                                             [pc.pc for pc in last.pcset.intersection(first.pcset)])
+        combined._pitch_tables_voices = [
+            _combine_tables(self._pitch_tables_voices[v], other._pitch_tables_voices[v],
+                            [p.p for p in last.psets[v].intersection(first.psets[v])])
+            for v in range(self._num_voices)]
+        combined._pc_tables_voices = [
+            _combine_tables(self._pc_tables_voices[v], other._pc_tables_voices[v],
+                            [pc.pc for pc in last.pcsets[v].intersection(first.pcsets[v])])
+            for v in range(self._num_voices)]
+
+        # If the two slices are merged, the first slice of the following run no longer counts separately
+        merged = []
+        if merge and last.pitchseg == first.pitchseg:
+            merged = [first]
+            combined._num_slices -= 1
+            combined._ps_sum -= first.p_cardinality
+            if first.p_cardinality > 0:
+                lowest, highest, ins = _get_slice_extremes(first)
+                combined._num_sounding -= 1
+                combined._ins_sum -= ins
+                combined._low_sum -= lowest
+                combined._high_sum -= highest
+        keys = [_get_slice_keys(s) for s in merged]
+        combined._cseg_table = _combine_tables(self._cseg_table, other._cseg_table, [k[0] for k in keys])
+        combined._pset_table = _combine_tables(self._pset_table, other._pset_table, [k[1] for k in keys])
+        combined._psc_table = _combine_tables(self._psc_table, other._psc_table, [k[2] for k in keys])
+        return combined
+
+    def get_bounds(self):
+        """
+        Gets the lower and upper bounds of the slices
+        :return: The lower and upper bounds as a tuple, or (None, None) if the slices contain no pitches
+        """
+        if self._num_sounding == 0:
+            return None, None
+        return self._low_min, self._high_max
+
+
+def _combine_tables(table1, table2, continuing):
+    """
+    Combines the duration and frequency dictionaries of two adjacent runs of slices
+    :param table1: The duration and frequency dictionaries of the first run
+    :param table2: The duration and frequency dictionaries of the second run
+    :param continuing: The keys whose occurrence at the start of the second run continues an occurrence
+    at the end of the first run
+    :return: The combined duration and frequency dictionaries
+    """
+    durations = dict(table1[0])
+    frequencies = dict(table1[1])
+    for key in table2[0]:
+        if key in durations:
+            durations[key] += table2[0][key]
+            frequencies[key] += table2[1][key]
+        else:
+            durations[key] = table2[0][key]
+            frequencies[key] = table2[1][key]
+    for key in continuing:
+        frequencies[key] -= 1
+    return durations, frequencies
+
+
+def _convert_table(table, time_base):
+    """
+    Converts the durations of a duration and frequency table from time units to seconds
+    :param table: The duration and frequency dictionaries
+    :param time_base: The TimeBase of the durations
+    :return: The duration dictionary in seconds, and the frequency dictionary
+    """
+    durations, frequencies = table
+    return {key: time_base.get_seconds(durations[key]) for key in durations}, frequencies
+
+
+def _format_table(table, time_base, make_string):
+    """
+    Makes string-keyed duration and frequency dictionaries from tuple-keyed ones, with the durations
+    converted from time units to seconds
+    :param table: The duration and frequency dictionaries
+    :param time_base: The TimeBase of the durations
+    :param make_string: A function that makes the string key of a tuple key
+    :return: The string-keyed duration and frequency dictionaries
+    """
+    durations, frequencies = table
+    strings = {key: make_string(key) for key in durations}
+    return ({strings[key]: time_base.get_seconds(durations[key]) for key in durations},
+            {strings[key]: frequencies[key] for key in frequencies})
+
+
+def _get_slice_extremes(s):
+    """
+    Gets the lowest and highest pitches of a slice that contains pitches, and its INS
+    :param s: The slice
+    :return: The lowest pitch, the highest pitch, and the INS
+    """
+    lowest = s.pseg[0].p
+    highest = s.pseg[-1].p
+    return lowest, highest, highest - lowest + 1 - s.p_cardinality
+
+
+def _get_slice_keys(s):
+    """
+    Gets the cseg, pset, and psc of a slice as tuples
+    :param s: The slice
+    :return: The cseg, pset, and psc
+    """
+    return tuple(s.cseg), tuple([p.p for p in s.pseg]), tuple(s.ipseg)
+
+
+def _sum_by_group(groups, values, num_groups):
+    """
+    Sums integer values by group
+    :param groups: The group number of each value
+    :param values: An array of integer values
+    :param num_groups: The number of groups
+    :return: An array of sums
+    """
+    totals = numpy.zeros(num_groups, dtype=values.dtype)
+    numpy.add.at(totals, groups, values)
+    return totals
+
+
+def _tabulate_keys(keys, durations):
+    """
+    Counts the occurrences of each key in a sequence and sums their durations
+    :param keys: A hashable key for each slice
+    :param durations: An array of slice durations in time units
+    :return: A duration dictionary and a frequency dictionary, with keys in order of first occurrence
+    """
+    ids = {}
+    groups = numpy.array([ids.setdefault(key, len(ids)) for key in keys], dtype=numpy.int64)
+    frequencies = numpy.bincount(groups, minlength=len(ids))
+    totals = _sum_by_group(groups, durations, len(ids))
+    return {key: int(totals[i]) for key, i in ids.items()}, {key: int(frequencies[i]) for key, i in ids.items()}
+
+
+def _tabulate_sets(index, members, durations):
+    """
+    Sums the durations and counts the distinct (nonadjacent) occurrences of the members of the psets or pcsets
+    of a sequence of slices
+    :param index: The slice index of each member
+    :param members: The members (pitches or pitch-classes), grouped by slice
+    :param durations: An array of slice durations in time units
+    :return: A duration dictionary and a frequency dictionary, with keys in order of first occurrence
+    """
+    keys, first, groups = numpy.unique(members, return_index=True, return_inverse=True)
+
+    # Renumber the keys in order of first occurrence
+    order = numpy.argsort(first)
+    rank = numpy.empty_like(order)
+    rank[order] = numpy.arange(len(order))
+    groups = rank[groups]
+    keys = keys[order]
+
+    # A member occurs again if it was not present in the previous slice
+    totals = _sum_by_group(groups, durations[index], len(keys))
+    codes = index * len(keys) + groups
+    frequencies = numpy.bincount(groups[~numpy.isin(codes - len(keys), codes)], minlength=len(keys))
+    return ({int(keys[k]): int(totals[k]) for k in range(len(keys))},
+            {int(keys[k]): int(frequencies[k]) for k in range(len(keys))})
@@ -0,0 +1,998 @@
+"""
+File: slice_table.py
+Author: Jeff Martin
+Email: jeffreymartin@outlook.com
+This file contains the SliceTable class, which stores v_slices in NumPy arrays, and the SliceView class,
+which presents a single v_slice of a SliceTable like a VSlice.
+Copyright (c) 2022 by Jeff Martin.
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+
+import music21
+import numpy
+from events import REST
+from pctheory import cseg, pitch
+from vslice2 import sort_pnameseg
+
+
+class SliceTable:
+    def __init__(self, time_base=None, num_voices=1):
+        """
+        Creates an empty SliceTable. Each row of the table is a v_slice. The pitches of the v_slices are stored
+        in CSR form: the pitches of slice i in voice v are the entries offsets[i * num_voices + v] to
+        offsets[i * num_voices + v + 1] of the pitch and name columns, in the order in which they were added.
+        Everything else that a VSlice holds (psets, pcsets, segs, set-class names, and register values) is
+        calculated from these columns for the whole table at once, or for a single slice by its SliceView.
+        :param time_base: The TimeBase of the slice durations
+        :param num_voices: The number of voices
+        """
+        self._csegs = {}                                     # The csegs of the ipsegs that have been simplified
+        self._lower_bound = None                             # The lower bound of the slices
+        self._measure = numpy.zeros(0, dtype=numpy.int32)    # The measure number of each slice
+        self._name = numpy.zeros(0, dtype=numpy.int32)       # The pitch name index of each pitch
+        self._names = []                                     # The pitch names (with octave)
+        self._num_voices = num_voices                        # The number of voices
+        self._offsets = numpy.zeros(1, dtype=numpy.int64)    # The first pitch of each slice and voice
+        self._pitch = numpy.zeros(0, dtype=numpy.int32)      # The pitches, in p-space
+        self._sc = None                                      # The SetClass for naming pcsets
+        self._set_classes = {}                               # The set-class information of each pcset (by mask)
+        self._sets = None                                    # The psets, pcsets and pitchsegs (made on request)
+        self._start_position = numpy.zeros(0, dtype=numpy.int64)  # The start of each slice in its measure, in ticks
+        self._tempo = numpy.zeros(0, dtype=numpy.int16)      # The tempo index of each slice
+        self._tempos = []                                    # The tempos (in quarter notes per minute)
+        self._ticks = numpy.zeros(0, dtype=numpy.int64)      # The duration of each slice, in ticks
+        self._time_base = time_base                          # The TimeBase of the durations
+        self._time_signature = numpy.zeros(0, dtype=numpy.int16)  # The time signature index of each slice (or -1)
+        self._time_signatures = []                           # The time signatures (music21.meter.TimeSignature)
+        self._units = numpy.zeros(0, dtype=numpy.int64)      # The duration of each slice, in time units
+        self._upper_bound = None                             # The upper bound of the slices
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("SliceTable index out of range")
+        return SliceView(self, index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield SliceView(self, i)
+
+    def __len__(self):
+        return self._measure.shape[0]
+
+    @property
+    def lower_bound(self):
+        """
+        The lower bound of the slices
+        :return: The lower bound
+        """
+        return self._lower_bound
+
+    @lower_bound.setter
+    def lower_bound(self, value):
+        """
+        The lower bound of the slices
+        :param value: The new lower bound
+        :return: None
+        """
+        self._lower_bound = value
+
+    @property
+    def measure(self):
+        """
+        The measure number of each slice
+        :return: A NumPy array
+        """
+        return self._measure
+
+    @property
+    def num_voices(self):
+        """
+        The number of voices
+        :return: The number of voices
+        """
+        return self._num_voices
+
+    @property
+    def offsets(self):
+        """
+        The CSR offsets of the pitches of each slice and voice (see the constructor)
+        :return: A NumPy array of length len(self) * num_voices + 1
+        """
+        return self._offsets
+
+    @property
+    def p_cardinality(self):
+        """
+        The pitch cardinality of each slice (excludes duplicates)
+        :return: A NumPy array
+        """
+        return numpy.diff(self._get_sets()["pset"][0])
+
+    @property
+    def p_count(self):
+        """
+        The pitch count of each slice (includes duplicates)
+        :return: A NumPy array
+        """
+        return numpy.diff(self._get_slice_offsets())
+
+    @property
+    def pitch(self):
+        """
+        The pitches of the slices, in p-space
+        :return: A NumPy array
+        """
+        return self._pitch
+
+    @property
+    def start_position(self):
+        """
+        The start position of each slice relative to its measure, in ticks
+        :return: A NumPy array
+        """
+        return self._start_position
+
+    @property
+    def ticks(self):
+        """
+        The duration of each slice, in ticks
+        :return: A NumPy array
+        """
+        return self._ticks
+
+    @property
+    def time_base(self):
+        """
+        The TimeBase of the slice durations
+        :return: The TimeBase
+        """
+        return self._time_base
+
+    @property
+    def units(self):
+        """
+        The duration of each slice, in time units of the timebase. The array has the int64 type if the sum of
+        the durations cannot overflow, and otherwise holds Python integers.
+        :return: A NumPy array
+        """
+        return self._units
+
+    @property
+    def upper_bound(self):
+        """
+        The upper bound of the slices
+        :return: The upper bound
+        """
+        return self._upper_bound
+
+    @upper_bound.setter
+    def upper_bound(self, value):
+        """
+        The upper bound of the slices
+        :param value: The new upper bound
+        :return: None
+        """
+        self._upper_bound = value
+
+    def get_extremes(self):
+        """
+        Gets the lowest and highest pitches of the slices that contain pitches
+        :return: The indices of the slices that contain pitches, and their lowest and highest pitches,
+        as NumPy arrays
+        """
+        offsets, psets = self._get_sets()["pset"]
+        sounding = numpy.flatnonzero(offsets[1:] > offsets[:-1])
+        return sounding, psets[offsets[sounding]], psets[offsets[sounding + 1] - 1]
+
+    def get_keys(self):
+        """
+        Gets the cseg, pset, and psc of each slice as tuples
+        :return: A list of (cseg, pset, psc) tuples
+        """
+        offsets, psets = self._get_sets()["pset"]
+        keys = []
+        for i in range(len(self)):
+            pset = tuple(psets[offsets[i]:offsets[i + 1]].tolist())
+            ipseg = tuple(numpy.diff(psets[offsets[i]:offsets[i + 1]]).tolist())
+            keys.append((tuple(self._get_cseg(ipseg)), pset, ipseg))
+        return keys
+
+    def get_members(self, pitch_classes=False, voice=None):
+        """
+        Gets the members of the psets or pcsets of the slices. The members of each slice are in ascending order.
+        :param pitch_classes: Whether to get the members of the pcsets rather than the psets
+        :param voice: The voice whose psets or pcsets to get (None means all voices)
+        :return: The slice index of each member, and the members, as NumPy arrays
+        """
+        if voice is None:
+            offsets, members = self._get_sets()["pcset" if pitch_classes else "pset"]
+            return numpy.repeat(numpy.arange(len(self)), numpy.diff(offsets)), members
+        offsets, members = self._get_sets()["pcsets" if pitch_classes else "psets"]
+        groups = numpy.repeat(numpy.arange(len(offsets) - 1), numpy.diff(offsets))
+        in_voice = groups % self._num_voices == voice
+        return groups[in_voice] // self._num_voices, members[in_voice]
+
+    def get_voice_extremes(self):
+        """
+        Gets the lowest and highest pitches of each voice of each slice, for the voices that contain pitches
+        :return: The voice, lowest pitch, and highest pitch of each voice of each slice, as NumPy arrays
+        """
+        offsets, psets = self._get_sets()["psets"]
+        groups = numpy.flatnonzero(offsets[1:] > offsets[:-1])
+        return groups % self._num_voices, psets[offsets[groups]], psets[offsets[groups + 1] - 1]
+
+    def merge(self, match_tempo=False, sections=None):
+        """
+        Combines runs of adjacent identical v_slices. The first v_slice of each run absorbs the durations of
+        the others. Slices are identical if they have the same pitchseg (and tempo, if required), and a run is
+        broken at the start of each section.
+        :param match_tempo: Whether or not to force tempo match
+        :param sections: A collection of the measure numbers at which sections start
+        :return: A new SliceTable of the combined v_slices
+        """
+        offsets, pitchsegs = self._get_sets()["pitchseg"]
+        lengths = numpy.diff(offsets)
+        same = lengths[1:] == lengths[:-1]
+
+        # Compare each pitch of a slice with the pitch in the same place in the previous slice
+        index = numpy.repeat(numpy.arange(len(self)), lengths)
+        compare = index > 0
+        compare[compare] = same[index[compare] - 1]
+        entries = numpy.flatnonzero(compare)
+        differ = entries[pitchsegs[entries] != pitchsegs[entries - lengths[index[entries]]]]
+        same[index[differ] - 1] = False
+
+        if match_tempo:
+            same &= self._tempo[1:] == self._tempo[:-1]
+        if sections is not None:
+            starts = numpy.isin(self._measure[1:], numpy.array(list(sections), dtype=numpy.int64))
+            same &= ~(starts & (self._measure[:-1] < self._measure[1:]))
+        heads = numpy.flatnonzero(numpy.concatenate(([len(self) > 0], ~same)))
+        merged = self.take(heads)
+        if len(heads) > 0:
+            merged._ticks = numpy.add.reduceat(self._ticks, heads)
+            merged._units = numpy.add.reduceat(self._units, heads)
+        return merged
+
+    def run_calculations(self, sc):
+        """
+        Calculates the set-class information of the v_slices. Tables that are made from this table with
+        merge() or take() share the information.
+        :param sc: A SetClass object
+        :return: None
+        """
+        self._sc = sc
+        self._get_set_classes()
+
+    def take(self, rows):
+        """
+        Makes a new SliceTable from some of the slices of this table
+        :param rows: The indices of the slices, in order
+        :return: The new SliceTable
+        """
+        rows = numpy.asarray(rows, dtype=numpy.int64)
+        table = SliceTable(self._time_base, self._num_voices)
+        table._csegs = self._csegs
+        table._lower_bound = self._lower_bound
+        table._measure = self._measure[rows]
+        table._names = self._names
+        table._sc = self._sc
+        table._set_classes = self._set_classes
+        table._start_position = self._start_position[rows]
+        table._tempo = self._tempo[rows]
+        table._tempos = self._tempos
+        table._ticks = self._ticks[rows]
+        table._time_signature = self._time_signature[rows]
+        table._time_signatures = self._time_signatures
+        table._units = self._units[rows]
+        table._upper_bound = self._upper_bound
+
+        # The pitches of the slices are contiguous, so they can be gathered slice by slice
+        groups = (rows[:, numpy.newaxis] * self._num_voices + numpy.arange(self._num_voices)).ravel()
+        sizes = self._offsets[groups + 1] - self._offsets[groups]
+        table._offsets = numpy.concatenate(([0], numpy.cumsum(sizes))).astype(numpy.int64)
+        entries = _get_ranges(self._offsets[groups], sizes)
+        table._pitch = self._pitch[entries]
+        table._name = self._name[entries]
+        return table
+
+    def _get_cseg(self, ipseg):
+        """
+        Gets the cseg of an ipseg
+        :param ipseg: The ipseg, as a tuple
+        :return: The cseg
+        """
+        if ipseg not in self._csegs:
+            self._csegs[ipseg] = cseg.simplify(list(ipseg))
+        return self._csegs[ipseg]
+
+    def _get_masks(self):
+        """
+        Gets the pcset of each slice as a bit mask
+        :return: A NumPy array
+        """
+        index, pcs = self.get_members(True)
+        masks = numpy.zeros(len(self), dtype=numpy.int64)
+        numpy.add.at(masks, index, numpy.left_shift(1, pcs.astype(numpy.int64)))
+        return masks
+
+    def _get_set_class(self, mask):
+        """
+        Gets the set-class information of a pcset
+        :param mask: The pcset, as a bit mask
+        :return: The set-class name, the Carter name, whether or not the pcset is a core harmony, and the derived
+        core associations. If the table has no SetClass, the information is None.
+        """
+        if self._sc is None:
+            return None
+        if mask not in self._set_classes:
+            self._sc.pcset = {pitch.PitchClass(pc) for pc in range(12) if mask >> pc & 1}
+            cardinality = bin(mask).count("1")
+            name_carter = self._sc.name_carter if 1 < cardinality < 11 else ""
+            core = (name_carter in ("18", "23") and cardinality == 4) or (name_carter == "35" and cardinality == 6)
+            self._set_classes[mask] = (self._sc.name_morris, name_carter, core, self._sc.derived_core)
+        return self._set_classes[mask]
+
+    def _get_set_classes(self):
+        """
+        Gets the set-class information of each slice
+        :return: A list of set-class information tuples (see _get_set_class())
+        """
+        return [self._get_set_class(int(mask)) for mask in self._get_masks()]
+
+    def _get_sets(self):
+        """
+        Gets the pitchsegs (sorted, with duplicates), psets, and pcsets of the slices, and the psets and pcsets
+        of each voice. Each is a tuple of CSR offsets and values, with the values of each slice in ascending order.
+        :return: A dictionary of (offsets, values) tuples
+        """
+        if self._sets is None:
+            num_groups = len(self) * self._num_voices
+            groups = numpy.repeat(numpy.arange(num_groups), numpy.diff(self._offsets))
+            index = groups // self._num_voices if self._num_voices > 0 else groups
+            pcs = self._pitch % 12
+            order = numpy.lexsort((self._pitch, index))
+            self._sets = {
+                "pcset": _get_distinct(index, pcs, len(self)),
+                "pcsets": _get_distinct(groups, pcs, num_groups),
+                "pitchseg": (self._get_slice_offsets(), self._pitch[order]),
+                "pset": _get_distinct(index, self._pitch, len(self)),
+                "psets": _get_distinct(groups, self._pitch, num_groups)
+            }
+        return self._sets
+
+    def _get_slice_offsets(self):
+        """
+        Gets the CSR offsets of the pitches of each slice (in all voices)
+        :return: A NumPy array of length len(self) + 1
+        """
+        if self._num_voices == 0:
+            return numpy.zeros(len(self) + 1, dtype=numpy.int64)
+        return self._offsets[::self._num_voices]
+
+
+class SliceView:
+    def __init__(self, table, index):
+        """
+        Creates a view of a single v_slice of a SliceTable. The view has the properties and string methods of
+        a VSlice, which are calculated from the table when they are requested. It is read-only: the slices of a
+        table are changed by making new tables.
+        :param table: The SliceTable
+        :param index: The index of the slice
+        """
+        self._index = index
+        self._table = table
+
+    @property
+    def cseg(self):
+        """
+        The contour of the pseg
+        :return: The contour
+        """
+        return self._table._get_cseg(tuple(self.ipseg))
+
+    @property
+    def core(self):
+        """
+        Whether or not the chord is a core harmony
+        :return: True or False
+        """
+        set_class = self._get_set_class()
+        return set_class is not None and set_class[2]
+
+    @property
+    def derived_core(self):
+        """
+        Whether or not the chord is a derived core harmony
+        :return: True or False
+        """
+        return self.derived_core_associations is not None
+
+    @property
+    def derived_core_associations(self):
+        """
+        Derived core associations, if any
+        :return: Derived core associations, if any
+        """
+        set_class = self._get_set_class()
+        return set_class[3] if set_class is not None else None
+
+    @property
+    def duration(self):
+        """
+        The duration in seconds
+        :return: The duration in seconds, as a Decimal
+        """
+        return self._table.time_base.get_seconds(self.units)
+
+    @property
+    def index(self):
+        """
+        The index of the slice in its table
+        :return: The index
+        """
+        return self._index
+
+    @property
+    def ins(self):
+        """
+        The internal negative space (INS)
+        :return: The internal negative space (INS)
+        """
+        pset = self._get_pset()
+        return pset[-1] - pset[0] + 1 - len(pset) if len(pset) > 0 else 0
+
+    @property
+    def ipseg(self):
+        """
+        The ipseg (ordered interval succession between adjacent pitches from low to high)
+        :return: The ipseg
+        """
+        pset = self._get_pset()
+        return [pset[i] - pset[i - 1] for i in range(1, len(pset))]
+
+    @property
+    def lns(self):
+        """
+        The lower negative space (LNS)
+        :return: The lower negative space (LNS)
+        """
+        pset = self._get_pset()
+        if self.lower_bound is None or self.upper_bound is None or len(pset) == 0:
+            return None
+        return pset[0] - self.lower_bound
+
+    @property
+    def lower_bound(self):
+        """
+        The lower bound
+        :return: The lower bound
+        """
+        return self._table.lower_bound
+
+    @property
+    def measure(self):
+        """
+        The measure number
+        :return: The measure number
+        """
+        return int(self._table.measure[self._index])
+
+    @property
+    def mediant(self):
+        """
+        The median trajectory (MT)
+        :return: The median trajectory (MT)
+        """
+        lns = self.lns
+        return (lns - self.uns) / 2 if lns is not None else None
+
+    @property
+    def ns(self):
+        """
+        The negative space (NS). If the lower and upper bounds are defined, but LNS and UNS are not,
+        the NS represents the entire pitch area encompassed by the piece. Otherwise it is None.
+        :return: The negative space (NS)
+        """
+        if self.lower_bound is None or self.upper_bound is None or len(self._get_pset()) > 0:
+            return None
+        return self.upper_bound - self.lower_bound + 1
+
+    @property
+    def p_cardinality(self):
+        """
+        The pitch cardinality of the VSlice (excludes duplicates)
+        :return: The pitch cardinality
+        """
+        return len(self._get_pset())
+
+    @property
+    def p_count(self):
+        """
+        The pitch count of the VSlice (contains duplicates)
+        :return: The pitch count
+        """
+        offsets = self._table._get_slice_offsets()
+        return int(offsets[self._index + 1] - offsets[self._index])
+
+    @property
+    def pc_cardinality(self):
+        """
+        The pitch-class cardinality of the VSlice (excludes duplicates)
+        :return: The pitch-class cardinality
+        """
+        offsets = self._table._get_sets()["pcset"][0]
+        return int(offsets[self._index + 1] - offsets[self._index])
+
+    @property
+    def ps(self):
+        """
+        The positive space (PS)
+        :return: The positive space (PS)
+        """
+        return self.p_cardinality
+
+    @property
+    def pcseg(self):
+        """
+        The pcseg of the VSlice
+        :return: The pcseg
+        """
+        return [pitch.PitchClass(p.pc) for p in self.pseg]
+
+    @property
+    def pcset(self):
+        """
+        The pcset of the VSlice
+        :return: The pcset
+        """
+        offsets, pcsets = self._table._get_sets()["pcset"]
+        return {pitch.PitchClass(pc) for pc in pcsets[offsets[self._index]:offsets[self._index + 1]].tolist()}
+
+    @property
+    def pcsegs(self):
+        """
+        The pcsegs of the VSlice by voice
+        :return: The pcsegs
+        """
+        return [[pitch.PitchClass(p.pc) for p in pseg] for pseg in self.psegs]
+
+    @property
+    def pcsets(self):
+        """
+        The pcsets of the VSlice by voice
+        :return: The pcsets
+        """
+        return [{pitch.PitchClass(pc) for pc in pcs} for pcs in self._get_voice_sets("pcsets")]
+
+    @property
+    def pitchseg(self):
+        """
+        The pitchseg of the VSlice (sorted, with duplicates)
+        :return: The pitchseg
+        """
+        offsets, pitchsegs = self._table._get_sets()["pitchseg"]
+        return pitchsegs[offsets[self._index]:offsets[self._index + 1]].tolist()
+
+    @property
+    def pitchsegs(self):
+        """
+        The pitchsegs of the VSlice by voice (sorted, with duplicates)
+        :return: The pitchsegs
+        """
+        return [sorted(self._table.pitch[start:stop].tolist()) for start, stop in self._get_voice_ranges()]
+
+    @property
+    def pnameseg(self):
+        """
+        A list of pitch names
+        :return: A list of pitch names
+        """
+        offsets = self._table._get_slice_offsets()
+        return self._get_names(offsets[self._index], offsets[self._index + 1])
+
+    @property
+    def pnamesegs(self):
+        """
+        The lists of pitch names by voice
+        :return: The lists of pitch names
+        """
+        return [self._get_names(start, stop) for start, stop in self._get_voice_ranges()]
+
+    @property
+    def pseg(self):
+        """
+        The pseg of the VSlice
+        :return: The pseg
+        """
+        return [pitch.Pitch(p) for p in self._get_pset()]
+
+    @property
+    def pset(self):
+        """
+        The pset of the VSlice
+        :return: The pset
+        """
+        return set(self.pseg)
+
+    @property
+    def psegs(self):
+        """
+        The psegs of the VSlice by voice
+        :return: The psegs
+        """
+        return [[pitch.Pitch(p) for p in ps] for ps in self._get_voice_sets("psets")]
+
+    @property
+    def psets(self):
+        """
+        The psets of the VSlice by voice
+        :return: The psets
+        """
+        return [set(pseg) for pseg in self.psegs]
+
+    @property
+    def quarter_duration(self):
+        """
+        The duration in quarter notes
+        :return: The duration in quarter notes, as a Fraction
+        """
+        return self._table.time_base.get_quarters(self.ticks)
+
+    @property
+    def sc_name(self):
+        """
+        The set-class name of the VSlice
+        :return: The set-class name
+        """
+        set_class = self._get_set_class()
+        return set_class[0] if set_class is not None else None
+
+    @property
+    def sc_name_carter(self):
+        """
+        The Carter name of the VSlice
+        :return: The Carter name
+        """
+        set_class = self._get_set_class()
+        return set_class[1] if set_class is not None else None
+
+    @property
+    def start_position(self):
+        """
+        The start position in the measure
+        :return: The start position in quarter notes, as a Fraction
+        """
+        return self._table.time_base.get_quarters(int(self._table.start_position[self._index]))
+
+    @property
+    def ticks(self):
+        """
+        The duration in ticks
+        :return: The duration in ticks
+        """
+        return int(self._table.ticks[self._index])
+
+    @property
+    def time_base(self):
+        """
+        The TimeBase of the durations
+        :return: The TimeBase
+        """
+        return self._table.time_base
+
+    @property
+    def time_signature(self):
+        """
+        The time signature (music21.meter.TimeSignature)
+        :return: The time signature
+        """
+        index = self._table._time_signature[self._index]
+        return self._table._time_signatures[index] if index >= 0 else None
+
+    @property
+    def uns(self):
+        """
+        The upper negative space (UNS)
+        :return: The upper negative space (UNS)
+        """
+        pset = self._get_pset()
+        if self.lower_bound is None or self.upper_bound is None or len(pset) == 0:
+            return None
+        return self.upper_bound - pset[-1]
+
+    @property
+    def units(self):
+        """
+        The duration in time units of the timebase
+        :return: The duration in time units
+        """
+        return int(self._table.units[self._index])
+
+    @property
+    def upper_bound(self):
+        """
+        The upper bound
+        :return: The upper bound
+        """
+        return self._table.upper_bound
+
+    def get_cseg_string(self):
+        """
+        Gets the cseg as a string
+        :return: The cseg as a string
+        """
+        return "<" + ", ".join([str(cp) for cp in self.cseg]) + ">"
+
+    def get_ipseg_string(self):
+        """
+        Gets the ipseg as a string
+        :return: The ipseg as a string
+        """
+        return "\"<" + ", ".join([str(ip) for ip in self.ipseg]) + ">\""
+
+    def get_pcset_string(self):
+        """
+        The pcset
+        :return: The pcset
+        """
+        return "{" + "".join([str(pc) for pc in sorted(self.pcset)]) + "}"
+
+    def get_pset_string(self):
+        """
+        The pset
+        :return: The pset
+        """
+        return "{" + ", ".join([str(p) for p in self._get_pset()]) + "}"
+
+    def _get_names(self, start, stop):
+        """
+        Gets the sorted pitch names of a range of pitches of the table
+        :param start: The first pitch
+        :param stop: The pitch after the last pitch
+        :return: A list of pitch names
+        """
+        return sort_pnameseg([self._table._names[i] for i in self._table._name[start:stop].tolist()])
+
+    def _get_pset(self):
+        """
+        Gets the pset as a sorted list of integers
+        :return: The pset
+        """
+        offsets, psets = self._table._get_sets()["pset"]
+        return psets[offsets[self._index]:offsets[self._index + 1]].tolist()
+
+    def _get_set_class(self):
+        """
+        Gets the set-class information of the pcset
+        :return: The set-class information (see SliceTable._get_set_class()), or None if the table has no SetClass
+        """
+        offsets, pcsets = self._table._get_sets()["pcset"]
+        mask = sum([1 << pc for pc in pcsets[offsets[self._index]:offsets[self._index + 1]].tolist()])
+        return self._table._get_set_class(mask)
+
+    def _get_voice_ranges(self):
+        """
+        Gets the range of pitches of the table in each voice of the slice
+        :return: A list of (start, stop) tuples
+        """
+        num_voices = self._table.num_voices
+        offsets = self._table.offsets[self._index * num_voices:(self._index + 1) * num_voices + 1].tolist()
+        return [(offsets[v], offsets[v + 1]) for v in range(num_voices)]
+
+    def _get_voice_sets(self, name):
+        """
+        Gets the psets or pcsets of each voice as sorted lists of integers
+        :param name: "psets" or "pcsets"
+        :return: A list of lists
+        """
+        num_voices = self._table.num_voices
+        offsets, values = self._table._get_sets()[name]
+        offsets = offsets[self._index * num_voices:(self._index + 1) * num_voices + 1].tolist()
+        return [values[offsets[v]:offsets[v + 1]].tolist() for v in range(num_voices)]
+
+
+def make_slice_table(slices, num_voices):
+    """
+    Makes a SliceTable from a list of v_slices, such as the slices read by read_analysis_from_file()
+    :param slices: A list of v_slices (or SliceViews)
+    :param num_voices: The number of voices
+    :return: The SliceTable
+    """
+    table = SliceTable(slices[0].time_base if len(slices) > 0 else None, num_voices)
+    tempos = {}
+    time_signatures = {}
+    pitches = []
+    names = {}
+    name = []
+    sizes = []
+    for s in slices:
+        for v in range(num_voices):
+            pitchseg = s.pitchsegs[v] if v < len(s.pitchsegs) else []
+            pnameseg = s.pnamesegs[v] if v < len(s.pnamesegs) else []
+            pitches += pitchseg
+            name += [names.setdefault(pname, len(names)) for pname in pnameseg]
+            sizes.append(len(pitchseg))
+    table._measure = numpy.array([s.measure if s.measure is not None else -1 for s in slices], dtype=numpy.int32)
+    table._name = numpy.array(name, dtype=numpy.int32)
+    table._names = list(names)
+    table._offsets = numpy.concatenate(([0], numpy.cumsum(sizes, dtype=numpy.int64))).astype(numpy.int64)
+    table._pitch = numpy.array(pitches, dtype=numpy.int32)
+    table._start_position = numpy.array([table.time_base.get_ticks(s.start_position)
+                                         if s.start_position is not None else 0 for s in slices], dtype=numpy.int64)
+    table._tempo = numpy.array([tempos.setdefault(getattr(s, "_tempo", None), len(tempos)) for s in slices],
+                               dtype=numpy.int16)
+    table._tempos = list(tempos)
+    table._ticks = numpy.array([s.ticks for s in slices], dtype=numpy.int64)
+    table._time_signature = numpy.array([time_signatures.setdefault(id(s.time_signature), len(time_signatures))
+                                         if s.time_signature is not None else -1 for s in slices], dtype=numpy.int16)
+    table._time_signatures = [None for i in range(len(time_signatures))]
+    for s in slices:
+        if s.time_signature is not None:
+            table._time_signatures[time_signatures[id(s.time_signature)]] = s.time_signature
+    table._units = _make_integer_array([s.units for s in slices])
+    table._lower_bound = slices[0].lower_bound if len(slices) > 0 else None
+    table._upper_bound = slices[0].upper_bound if len(slices) > 0 else None
+    return table
+
+
+def slice_events(events, measures, n=None):
+    """
+    Takes vertical slices from an EventTable. If n is provided, each beat is cut into n slices of equal length.
+    Otherwise each measure is cut only at the points where an event starts or ends, so the number of slices
+    depends on the number of distinct verticalities rather than on the rhythmic subdivisions of the piece.
+    A slice takes its tempo from the first event that covers it and its time signature from the last, and a
+    slice that no event covers is silent and has the tempo of its measure.
+    :param events: An EventTable
+    :param measures: The range of measure indices to slice
+    :param n: The number of slices per quarter note (None means slice at event onsets and releases)
+    :return: A SliceTable
+    """
+    tpq = events.ticks_per_quarter
+    time_base = events.get_time_base(n if n is not None else 1)
+    scale = time_base.ticks_per_quarter // tpq  # The number of timebase ticks in a tick of the table
+    table = SliceTable(time_base, events.num_parts)
+    table._tempos = events.tempos
+    table._time_signatures = [music21.meter.TimeSignature(ts) for ts in events.time_signatures]
+    if len(measures) == 0:
+        return table
+    rows = slice(events.get_measure_rows(measures.start).start, events.get_measure_rows(measures.stop - 1).stop)
+    measure = events.measure[rows].astype(numpy.int64) - measures.start
+    onsets = events.onset[rows] - events.measure_starts[events.measure[rows]]
+    releases = onsets + events.duration[rows]
+
+    # Find the first and last slice covered by each event, numbering the slices across all the measures
+    if n is not None:
+        starts = onsets * n // tpq
+        stops = starts + events.duration[rows] * n // tpq
+        counts = numpy.zeros(len(measures), dtype=numpy.int64)
+        numpy.maximum.at(counts, measure, stops)
+        firsts = numpy.concatenate(([0], numpy.cumsum(counts)))
+        positions = (numpy.arange(firsts[-1]) - numpy.repeat(firsts[:-1], counts)) * (time_base.ticks_per_quarter // n)
+        durations = numpy.full(firsts[-1], time_base.ticks_per_quarter // n, dtype=numpy.int64)
+        starts = starts + firsts[measure]
+        stops = stops + firsts[measure]
+    else:
+        # The boundaries of all the measures are numbered together, as (measure, tick) pairs
+        width = int(releases.max(initial=0)) + 1
+        boundaries = numpy.unique(numpy.concatenate((measure * width + onsets, measure * width + releases)))
+        boundary_measures = boundaries // width
+        boundary_ticks = boundaries % width
+        counts = numpy.maximum(numpy.bincount(boundary_measures, minlength=len(measures)) - 1, 0)
+        firsts = numpy.concatenate(([0], numpy.cumsum(counts)))
+        inner = boundary_measures[1:] == boundary_measures[:-1]  # Boundaries that are not last in their measure
+        positions = boundary_ticks[:-1][inner] * scale
+        durations = numpy.diff(boundary_ticks)[inner] * scale
+        # The slice of a boundary is its index less the number of measures before it that have boundaries
+        shift = numpy.searchsorted(boundary_measures, measure) - firsts[measure]
+        starts = numpy.searchsorted(boundaries, measure * width + onsets) - shift
+        stops = numpy.searchsorted(boundaries, measure * width + releases) - shift
+    num_slices = int(firsts[-1])
+
+    # Each event covers a run of slices
+    sizes = stops - starts
+    covered_rows = numpy.repeat(numpy.arange(len(sizes)), sizes)
+    covered = _get_ranges(starts, sizes)
+    first_rows = numpy.full(num_slices, len(sizes), dtype=numpy.int64)
+    last_rows = numpy.full(num_slices, -1, dtype=numpy.int64)
+    numpy.minimum.at(first_rows, covered, covered_rows)
+    numpy.maximum.at(last_rows, covered, covered_rows)
+    slice_measures = numpy.repeat(numpy.arange(len(measures)), counts)
+    silent = last_rows < 0
+    first_rows[silent] = numpy.searchsorted(measure, slice_measures[silent])
+    tempo = events.tempo[rows][first_rows]
+    time_signature = events.time_signature[rows][numpy.maximum(last_rows, 0)]
+    time_signature[silent] = -1
+
+    # The pitches of each slice are grouped by voice, in the order of the events
+    pitched = (events.midi[rows] != REST)[covered_rows]
+    covered = covered[pitched]
+    covered_rows = covered_rows[pitched]
+    groups = covered * events.num_parts + events.part[rows][covered_rows]
+    order = numpy.argsort(groups, kind="stable")
+    pnames = events.get_pitch_names()[rows]
+    names = {}
+    name = numpy.array([names.setdefault(pname, len(names)) if pname is not None else -1 for pname in pnames],
+                       dtype=numpy.int32)
+
+    table._measure = events.measure_numbers[measures.start + slice_measures].astype(numpy.int32)
+    table._name = name[covered_rows[order]]
+    table._names = list(names)
+    table._offsets = numpy.concatenate(([0], numpy.cumsum(numpy.bincount(
+        groups, minlength=num_slices * events.num_parts)))).astype(numpy.int64)
+    table._pitch = events.get_pitches()[rows][covered_rows[order]].astype(numpy.int32)
+    table._start_position = positions.astype(numpy.int64)
+    table._tempo = tempo.astype(numpy.int16)
+    table._ticks = durations.astype(numpy.int64)
+    table._time_signature = time_signature.astype(numpy.int16)
+    table._units = _get_units(time_base, events.tempos, table._ticks, table._tempo)
+    return table
+
+
+def _get_distinct(groups, values, num_groups):
+    """
+    Gets the distinct values of each group in CSR form
+    :param groups: The group of each value
+    :param values: An array of integer values
+    :param num_groups: The number of groups
+    :return: The CSR offsets of the groups, and the distinct values of each group in ascending order
+    """
+    if len(values) == 0:
+        return numpy.zeros(num_groups + 1, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.int64)
+    low = int(values.min())
+    width = int(values.max()) - low + 1
+    keys = numpy.unique(groups.astype(numpy.int64) * width + (values - low))
+    offsets = numpy.concatenate(([0], numpy.cumsum(numpy.bincount(keys // width, minlength=num_groups))))
+    return offsets.astype(numpy.int64), keys % width + low
+
+
+def _get_ranges(starts, sizes):
+    """
+    Concatenates ranges of integers
+    :param starts: The start of each range
+    :param sizes: The size of each range
+    :return: A NumPy array of the integers in the ranges
+    """
+    ends = numpy.cumsum(sizes)
+    return numpy.arange(ends[-1] if len(ends) > 0 else 0) + numpy.repeat(starts - ends + sizes, sizes)
+
+
+def _get_units(time_base, tempos, ticks, tempo):
+    """
+    Gets the duration of each slice in time units
+    :param time_base: The TimeBase
+    :param tempos: The tempos
+    :param ticks: The duration of each slice in ticks
+    :param tempo: The tempo index of each slice
+    :return: An array of durations (see _make_integer_array())
+    """
+    units_per_tick = [time_base.get_units(1, t) for t in tempos]
+    if len(ticks) == 0 or max(units_per_tick) * int(ticks.sum()) < 2 ** 62:
+        return ticks * numpy.array(units_per_tick, dtype=numpy.int64)[tempo]
+    return numpy.array([int(ticks[i]) * units_per_tick[tempo[i]] for i in range(len(ticks))], dtype=object)
+
+
+def _make_integer_array(values):
+    """
+    Makes an array of integers. It has the int64 type if its sums cannot overflow, and otherwise holds
+    Python integers.
+    :param values: A list of integers
+    :return: The array
+    """
+    if len(values) > 0 and max(values) * len(values) >= 2 ** 62:
+        return numpy.array(values, dtype=object)
+    return numpy.array(values, dtype=numpy.int64)
@@ -18,94 +18,99 @@ GNU General Public License for more details.
 You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
+import bisect
 import fractions
 import json
+import math
 import music21
+import numpy
+from event_cache import load_events
+from events import TimeBase, extract_events
 from vslice2 import VSlice
-from results import Results
+from results import Results, SliceStatistics
+from slice_table import SliceTable, slice_events
 from fractions import Fraction
 from pctheory import pitch, pcset
 from decimal import Decimal
 
+# Tempos to use in place of the marked tempo for specific measures (adjustments for Carter 5)
+_TEMPO_OVERRIDES = {46: Decimal(512) / Decimal(7), 66: Decimal(384) / Decimal(7), 128: Decimal(1152) / Decimal(10)}
 
-def analyze(input_xml, first=-1, last=-1, use_local=False):
+
+def analyze(input_xml, first=-1, last=-1, use_local=False, use_onsets=False, cache_dir=None):
     """
     Performs a vertical analysis on the given stream and writes a report to CSV
     :param input_xml: The musicxml file to analyze
     :param first: The first measure to analyze
     :param last: The last measure to analyze
     :param use_local: Whether or not to use local bounds for register analysis
+    :param use_onsets: Whether or not to slice only at event onsets and releases, rather than on a uniform grid
+    :param cache_dir: A directory for caching the events of parsed scores (None means always parse the score)
     :return: A Results object containing the results of the analysis
     """
-    stream = music21.converter.parse(input_xml)
-    parts = []
-    for item in stream:
-        if type(item) == music21.stream.Part:
-            parts.append(item)
-    results = slice_parts(parts, get_slice_num(parts), [], [use_local], first, last)
+    events = load_events(input_xml, _TEMPO_OVERRIDES, cache_dir)
+    n = None if use_onsets else events.summary.slices_per_quarter
+    results = slice_event_table(events, n, [], [use_local], first, last)
     return results
 
 
-def analyze_corpus(name, first=-1, last=-1, use_local=False):
+def analyze_corpus(name, first=-1, last=-1, use_local=False, use_onsets=False, cache_dir=None):
     """
     Performs a vertical analysis on the given stream and writes a report to CSV
     :param name: The musicxml file in the music21 corpus to analyze
     :param first: The first measure to analyze
     :param last: The last measure to analyze
     :param use_local: Whether or not to use local bounds for register analysis
+    :param use_onsets: Whether or not to slice only at event onsets and releases, rather than on a uniform grid
+    :param cache_dir: A directory for caching the events of parsed scores (None means always parse the score)
     :return: A Results object containing the results of the analysis
     """
-    stream = music21.corpus.parse(name)
-    parts = []
-    for item in stream:
-        if type(item) == music21.stream.Part:
-            parts.append(item)
-    results = slice_parts(parts, get_slice_num(parts), [], [use_local], first, last)
+    path = music21.corpus.getWork(name)
+    if type(path) == list:
+        path = path[0]
+    events = load_events(path, _TEMPO_OVERRIDES, cache_dir)
+    n = None if use_onsets else events.summary.slices_per_quarter
+    results = slice_event_table(events, n, [], [use_local], first, last)
     return results[0]
 
 
-def analyze_with_sections(input_xml, section_divisions, use_local):
+def analyze_with_sections(input_xml, section_divisions, use_local, use_onsets=False, cache_dir=None):
     """
     Performs a vertical analysis on the given stream and writes a report to CSV
     :param input_xml: The musicxml file to analyze
     :param section_divisions: A list of section divisions
     :param use_local: Whether or not to use local bounds for register analysis
+    :param use_onsets: Whether or not to slice only at event onsets and releases, rather than on a uniform grid
+    :param cache_dir: A directory for caching the events of parsed scores (None means always parse the score)
     :return: A list of Results objects containing the results of the analysis.
     Index 0 is a complete analysis, and the remaining indices are section analyses
     in the order in which they were provided.
     """
-    stream = music21.converter.parse(input_xml)
-    parts = []
-    for item in stream:
-        if type(item) == music21.stream.Part:
-            parts.append(item)
-    return slice_parts(parts, get_slice_num(parts), section_divisions, use_local, -1, -1)
+    events = load_events(input_xml, _TEMPO_OVERRIDES, cache_dir)
+    n = None if use_onsets else events.summary.slices_per_quarter
+    return slice_event_table(events, n, section_divisions, use_local, -1, -1)
+
+
+def annotate_slices(slices, sc):
+    """
+    Runs the set-theory calculations on the v_slices of a SliceTable
+    :param slices: A SliceTable
+    :param sc: A SetClass object
+    :return: The annotated SliceTable
+    """
+    slices.run_calculations(sc)
+    return slices
 
 
 def clean_slices(slices, match_tempo=False, sections=None):
     """
-    Cleans up a list of v_slices
-    :param slices: A list of v_slices
+    Cleans up a SliceTable by combining adjacent identical slices
+    :param slices: A SliceTable
     :param match_tempo: Whether or not to force tempo match
     :param sections: A list of section divisions
+    :return: The cleaned SliceTable
     """
-    # Remove duplicate slices, and update durations
-    i = 1
-    while i < len(slices):
-        equal = True
-        if match_tempo and slices[i]._tempo != slices[i - 1]._tempo:
-            equal = False
-        elif slices[i].pitchseg != slices[i - 1].pitchseg:
-            equal = False
-        elif sections is not None:
-            if slices[i].measure in sections and slices[i - 1].measure < slices[i].measure:
-                equal = False
-        if equal:
-            slices[i - 1].duration += slices[i].duration
-            slices[i - 1].quarter_duration += slices[i].quarter_duration
-            del slices[i]
-        else:
-            i += 1
+    return merge_slices(slices, match_tempo, sections)
 
 
 def factor(n):
@@ -157,6 +162,25 @@ def get_bounds(slices):
     return lower_bound, upper_bound
 
 
+def get_measure_range(events, first=-1, last=-1):
+    """
+    Gets the measure indices of an EventTable to analyze. Analysis begins at the first measure whose number
+    is at least first, and stops before the next measure whose number is greater than last.
+    :param events: An EventTable
+    :param first: The first measure to analyze (-1 means start at the beginning)
+    :param last: The last measure to analyze (-1 means analyze to the end)
+    :return: A range of measure indices
+    """
+    numbers = events.measure_numbers
+    start = 0
+    while start < len(numbers) and numbers[start] < first:
+        start += 1
+    stop = start + 1 if start < len(numbers) else start
+    while stop < len(numbers) and not numbers[stop] > last > -1:
+        stop += 1
+    return range(start, stop)
+
+
 #done
 def get_piece_bounds(parts):
     """
@@ -266,19 +290,99 @@ def lcm(integers):
     return multiple
 
 
+def merge_slices(slices, match_tempo=False, sections=None):
+    """
+    Combines runs of adjacent identical v_slices. The first v_slice of each run absorbs the durations of the
+    others. Slices are identical if they have the same pitchseg (and tempo, if required), and a run is broken
+    at the start of each section.
+    :param slices: A SliceTable
+    :param match_tempo: Whether or not to force tempo match
+    :param sections: A collection of the measure numbers at which sections start
+    :return: A new SliceTable of the combined v_slices
+    """
+    return slices.merge(match_tempo, sections)
+
+
 #done
 def set_slice_bounds(slices, bounds):
     """
-    Sets the bounds of a list of v_slices
-    :param slices: A list of v_slices
+    Sets the bounds of a SliceTable or a list of v_slices
+    :param slices: A SliceTable or a list of v_slices
     :param bounds: A tuple with the lower and upper bounds
     """
-
+    if isinstance(slices, SliceTable):
+        slices.lower_bound, slices.upper_bound = bounds
+        return
     for i in range(len(slices)):
         slices[i].lower_bound = bounds[0]
         slices[i].upper_bound = bounds[1]
 
 
+def slice_event_table(events, n, section_divisions, use_local, first=-1, last=-1):
+    """
+    Takes n vertical slices of each beat from an EventTable and analyzes them
+    :param events: An EventTable
+    :param n: The number of slices per quarter note (None means slice at event onsets and releases)
+    :param section_divisions: A list of section divisions
+    :param use_local: Whether or not to use local bounds for register analysis
+    :param first: The first measure to analyze (-1 means start at the beginning)
+    :param last: The last measure to analyze (-1 means analyze to the end)
+    :return: A list of Results objects
+    """
+    sc = pcset.SetClass()  # A set-class for calculating names, etc.
+    sections = [section_divisions[i][0] for i in range(len(section_divisions))]
+    results = []
+    global_bounds = (events.summary.lower_bound, events.summary.upper_bound)
+    time_base = events.get_time_base(n if n is not None else 1)
+    measures = get_measure_range(events, first, last)
+    first_measure = int(events.measure_numbers[measures.start]) if len(measures) > 0 else -1
+    last_measure = int(events.measure_numbers[measures.stop - 1]) if len(measures) > 0 else -1
+
+    # Each stage of the pipeline works on a whole SliceTable at once
+    slices = slice_events(events, measures, n)
+    slices = merge_slices(slices, True, sections)
+    slices = annotate_slices(slices, sc)
+    final_slices = merge_slices(slices, False, sections)
+
+    # Divide the slices into runs at the section boundaries, and gather the statistics of each run.
+    # The statistics of each section and of the whole piece are combined from the statistics of the runs.
+    boundaries = sorted(set([d[0] for d in section_divisions] + [d[1] + 1 for d in section_divisions]))
+    run_index = numpy.searchsorted(numpy.array(boundaries, dtype=numpy.int64), final_slices.measure, "right")
+    runs = [numpy.flatnonzero(run_index == i) for i in range(len(boundaries) + 1)]
+    statistics = [SliceStatistics(final_slices.take(run), events.num_parts) for run in runs]
+
+    # Create overall results. Identical slices are merged across section boundaries, without changing the
+    # slices of the sections.
+    overall = SliceStatistics([], events.num_parts)
+    for run_statistics in statistics:
+        overall = overall.combine(run_statistics, True)
+    bounds = global_bounds
+    if len(use_local) == 1:
+        if use_local[0]:
+            bounds = overall.get_bounds()
+    overall_slices = merge_slices(final_slices)
+    set_slice_bounds(overall_slices, bounds)
+    results.append(Results(overall_slices, first_measure, last_measure, events.num_parts, statistics=overall))
+
+    # Create sectional results. Each section has its own SliceTable, so it can have its own bounds.
+    for i in range(len(section_divisions)):
+        start = boundaries.index(section_divisions[i][0])
+        end = bisect.bisect_right(boundaries, section_divisions[i][1])
+        start_time = time_base.get_seconds(sum([statistics[j].units for j in range(start + 1)]))
+        section = SliceStatistics([], events.num_parts)
+        for j in range(start + 1, end + 1):
+            section = section.combine(statistics[j])
+        section_slices = final_slices.take(numpy.concatenate([runs[j] for j in range(start + 1, end + 1)]
+                                                             + [numpy.zeros(0, dtype=numpy.int64)]))
+        section_bounds = global_bounds
+        if use_local[i]:
+            section_bounds = section.get_bounds()
+        set_slice_bounds(section_slices, section_bounds)
+        results.append(Results(section_slices, section_divisions[i][0], section_divisions[i][1],
+                               events.num_parts, start_time, section))
+    return results
+
+
 #done
 def slice_parts(parts, n, section_divisions, use_local, first=-1, last=-1):
     """
@@ -287,238 +391,18 @@ def slice_parts(parts, n, section_divisions, use_local, first=-1, last=-1):
     independently of the time signature. The parts do not even need to have the same number of total beats.
     However, it is assumed that a quarter note in any given part is equal in duration to a quarter note in
     any other part (this means that all parts must share the same tempo for a quarter note).
+    The parts are first converted to an EventTable, and all slicing is done from the table.
     :param parts: A list of parts
-    :param n: The number of slices per quarter note
+    :param n: The number of slices per quarter note (None means slice at event onsets and releases)
     :param section_divisions: A list of section divisions
     :param use_local: Whether or not to use local bounds for register analysis
     :param first: The first measure to analyze (-1 means start at the beginning)
     :param last: The last measure to analyze (-1 means analyze to the end)
     :return: A list of v_slices
     """
-
-    sc = pcset.SetClass()  # A set-class for calculating names, etc.
-    final_slices = []      # Holds the finalized slices to return
-    first_measure = -1     # We assume that the first measure is -1
-    last_measure = -1      # We assume that the last measure is -1
-    next_indices = [0 for i in range(len(parts))]  # The index of the next measure, for each part
-    next_measure = -1      # The number of the next measure
-    tempo = Decimal(60)    # We assume a tempo of 60 to begin
-    tempo_multiplier = 10  # This is in place to avoid floats
-    time_signature = None  # The current time signature
-    transpose = [0 for i in range(len(parts))]  # The amount by which to transpose, for each part
-
     if len(parts) == 0:
         print("No parts were provided")
-
-    else:
-        # Determine the index of the first measure in each part. a is the part index,
-        # and b is the index of the item inside the current part (which may or may not be a measure)
-        for a in range(len(parts)):
-            found_first = False
-            for b in range(len(parts[a])):
-                if type(parts[a][b]) == music21.stream.Measure:
-                    if parts[a][b].number >= first:
-                        next_measure = parts[a][b].number
-                        first_measure = next_measure
-                        next_indices[a] = b
-                        found_first = True
-                # No need to continue after the first measure was found
-                if found_first:
-                    break
-
-        # We consider each measure separately. When we have finished the last measure,
-        # the next_measure will reset to -1 and we will stop.
-        while next_measure != -1:
-            last_measure = next_measure
-            # The slices taken for this measure
-            measure_slices = []
-
-            # Consider each part separately for this measure
-            for a in range(len(parts)):
-                # Tracks the number of slices taken for the current part in the current measure
-                num_slices_taken = 0
-                for item in parts[a][next_indices[a]]:
-                    last_item_was_voice = False
-                    furthest_voice_slice = 0
-
-                    # MusicXML doesn't handle transposition properly for 8va and 8vb clefs, so we need manual
-                    # transposition. Record for the future.
-                    if type(item) == music21.clef.Bass8vaClef or type(item) == music21.clef.Treble8vaClef:
-                        transpose[a] = 12
-                    elif type(item) == music21.clef.Bass8vbClef or type(item) == music21.clef.Treble8vbClef:
-                        transpose[a] = -12
-                    elif isinstance(item, music21.clef.Clef):
-                        transpose[a] = 0
-
-                    # Record the current time signature
-                    if type(item) == music21.meter.TimeSignature:
-                        time_signature = item
-
-                    # Update the tempo if we find a new one
-                    if type(item) == music21.tempo.MetronomeMark:
-                        tempo = Decimal(item.number)
-
-                        # Specific adjustments for Carter 5
-                        if parts[a][next_indices[a]].number == 46:
-                            tempo = Decimal(512) / Decimal(7)
-                        elif parts[a][next_indices[a]].number == 66:
-                            tempo = Decimal(384) / Decimal(7)
-                        elif parts[a][next_indices[a]].number == 128:
-                            tempo = Decimal(1152) / Decimal(10)
-                        # print(f"Tempo: {tempo}, Measure {parts[a][next_indices[a]].number}")
-                        # deprecated:
-                        # tempo_multiplier = 10 ** str(tempo)[::-1].find(".")
-
-                    # If we have found multiple voices in the same part in the same measure
-                    if type(item) == music21.stream.Voice:
-                        last_item_was_voice = True
-
-                        # Track the start point for the voice
-                        slice_start = num_slices_taken
-
-                        for item2 in item:
-                            # We can only take slices of notes, rests, or chords
-                            if type(item2) == music21.note.Note or type(item2) == music21.note.Rest or type(
-                                    item2) == music21.chord.Chord:
-                                ql = item2.duration.quarterLength
-                                if type(item2.duration.quarterLength) != Fraction:
-                                    ql = Fraction(item2.duration.quarterLength)
-
-                                num_slices = int(ql * n)
-                                # the pitches are considered as integers in p-space. The p_names hold pitch names
-                                # which is often more convenient for humans.
-                                pitches_in_item = []
-                                p_names_in_item = []
-
-                                # We use Morris's p-space. Obviously rests do not have pitches.
-                                if type(item2) != music21.note.Rest:
-                                    for p in item2.pitches:
-                                        name = p.name
-                                        octave = p.octave + (transpose[a] // 12)
-                                        pitches_in_item.append(p.midi - 60 + transpose[a])
-                                        p_names_in_item.append(name + str(octave))
-
-                                # Perform slicing. num_slices is the number of slices we take for the current object.
-                                for j in range(num_slices):
-                                    if num_slices_taken >= len(measure_slices):
-                                        measure_slices.append(
-                                            VSlice(tempo, Fraction(1, n.numerator), parts[a][next_indices[a]].number,
-                                                   len(parts)))
-                                    measure_slices[num_slices_taken].add_pitches(pitches_in_item, p_names_in_item, a)
-                                    measure_slices[num_slices_taken].time_signature = time_signature
-                                    measure_slices[num_slices_taken].start_position = Fraction(num_slices_taken,
-                                                                                               n.numerator)
-                                    num_slices_taken += 1
-
-                        # Record the furthest slice reached in this voice if necessary
-                        if furthest_voice_slice < num_slices_taken:
-                            furthest_voice_slice = num_slices_taken
-
-                        # Reset the slice counter to start on the next voice
-                        num_slices_taken = slice_start
-
-                    # If we just evaluated a voice and are done, we need to reset the slice counter
-                    elif last_item_was_voice and num_slices_taken < furthest_voice_slice:
-                        num_slices_taken = furthest_voice_slice
-
-                    # We can only take slices of notes, rests, or chords
-                    if type(item) == music21.note.Note or type(item) == music21.note.Rest or type(
-                            item) == music21.chord.Chord:
-                        ql = item.duration.quarterLength
-                        if type(item.duration.quarterLength) != Fraction:
-                            ql = Fraction(item.duration.quarterLength)
-
-                        num_slices = int(ql * n)
-
-                        # the pitches are considered as integers in p-space. The p_objects hold pitch names which
-                        # is often more convenient for humans.
-                        pitches_in_item = []
-                        p_names_in_item = []
-
-                        # We use Morris's p-space. Obviously rests do not have pitches.
-                        if type(item) != music21.note.Rest:
-                            for p in item.pitches:
-                                name = p.name
-                                octave = p.octave + (transpose[a] // 12)
-                                pitches_in_item.append(p.midi - 60 + transpose[a])
-                                p_names_in_item.append(name + str(octave))
-
-                        # Perform slicing. num_slices is the number of slices we take for the current object.
-                        for j in range(num_slices):
-                            if num_slices_taken >= len(measure_slices):
-                                measure_slices.append(
-                                    VSlice(tempo, Fraction(1, n.numerator), parts[a][next_indices[a]].number,
-                                           len(parts)))
-                            measure_slices[num_slices_taken].add_pitches(pitches_in_item, p_names_in_item, a)
-                            measure_slices[num_slices_taken].time_signature = time_signature
-                            measure_slices[num_slices_taken].start_position = Fraction(num_slices_taken,
-                                                                                       n.numerator)
-                            num_slices_taken += 1
-
-            # Clean up the slices from this measure
-            clean_slices(measure_slices, True)
-            for item in measure_slices:
-                final_slices.append(item)
-
-            # Find the next measure for each part
-            for a in range(len(parts)):  # a is the part index
-                found_next = False
-                next_measure = -1
-                # We start at the item after the current measure
-                for b in range(next_indices[a] + 1, len(parts[a])):
-                    if type(parts[a][b]) == music21.stream.Measure:
-                        next_measure = parts[a][b].number
-                        next_indices[a] = b
-                        found_next = True
-                    # No need to continue after the first measure was found
-                    if found_next:
-                        break
-
-            # If we've analyzed the last measure, it's time to stop analyzing
-            if next_measure > last > -1:
-                next_measure = -1
-
-    results = []
-    global_bounds = get_piece_bounds(parts)
-
-    # Make pctheory objects
-    for sl in final_slices:
-        sl.prepare_for_clean()
-
-    clean_slices(final_slices, True, [section_divisions[i][0] for i in range(len(section_divisions))])
-    for s in final_slices:
-        s.run_calculations(sc)
-    clean_slices(final_slices, False, [section_divisions[i][0] for i in range(len(section_divisions))])
-
-    # Create sectional results
-    for i in range(len(section_divisions)):
-        start_time = 0
-        section_slices = []
-        for sl in final_slices:
-            if section_divisions[i][0] < sl.measure:
-                start_time += sl.duration
-            elif sl.measure <= section_divisions[i][1]:
-                section_slices.append(sl)
-        bounds = global_bounds
-        if use_local[i]:
-            bounds = get_bounds(section_slices)
-        set_slice_bounds(section_slices, bounds)
-        for s in section_slices:
-            s.run_calculations_burt()
-        results.append(Results(section_slices, section_divisions[i][0], section_divisions[i][1],
-                               len(parts), start_time))
-
-    # Create overall results
-    clean_slices(final_slices)
-    bounds = global_bounds
-    if len(use_local) == 1:
-        if use_local[0]:
-            bounds = get_bounds(final_slices)
-    set_slice_bounds(final_slices, bounds)
-    for f_slice in final_slices:
-        f_slice.run_calculations_burt()
-    results.insert(0, Results(final_slices, first_measure, last_measure, len(parts)))
-    return results
+    return slice_event_table(extract_events(parts, _TEMPO_OVERRIDES), n, section_divisions, use_local, first, last)
 
 
 def read_analysis_from_file(path):
@@ -531,6 +415,12 @@ def read_analysis_from_file(path):
     results = []
     with open(path, "r") as file_in:
         data = json.load(file_in)
+
+    # The slice durations are read into a timebase that can represent all of them exactly
+    dslices = [dslice for item in data for dslice in item["slices"]]
+    time_base = TimeBase(math.lcm(1, *[dslice["quarter_duration"][1] for dslice in dslices],
+                                  *[dslice["start_position"][1] for dslice in dslices]), (),
+                         math.lcm(1, *[Fraction(Decimal(dslice["duration"])).denominator for dslice in dslices]))
     for item in data:
         slices = []
         for dslice in item["slices"]:
@@ -539,7 +429,8 @@ def read_analysis_from_file(path):
             cslice._core = bool(dslice["core"])
             cslice._derived_core = bool(dslice["derived_core"])
             cslice._derived_core_associations = dslice["derived_core_associations"]
-            cslice._duration = Decimal(dslice["duration"])
+            cslice._time_base = time_base
+            cslice.duration = Decimal(dslice["duration"])
             cslice._ipseg = dslice["ipseg"]
             cslice._measure = dslice["measure"]
             cslice._p_cardinality = dslice["p_cardinality"]
@@ -559,7 +450,7 @@ def read_analysis_from_file(path):
             cslice._psegs = [[pitch.Pitch(p) for p in dslice["psegs"][v]] for v in range(len(dslice["psegs"]))]
             cslice._pset = set(cslice.pseg)
             cslice._psets = [set(cslice.psegs[v]) for v in range(len(cslice.psegs))]
-            cslice._quarter_duration = Fraction(dslice["quarter_duration"][0], dslice["quarter_duration"][1])
+            cslice.quarter_duration = Fraction(dslice["quarter_duration"][0], dslice["quarter_duration"][1])
             cslice._sc_name = dslice["sc_name"]
             cslice._sc_name_carter = dslice["sc_name_carter"]
             cslice._ins = dslice["ins"]
@@ -20,7 +20,7 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
 from pctheory import cseg, pitch
-from decimal import Decimal
+from events import TimeBase
 
 
 def sort_pnameseg(pnameseg):
@@ -43,19 +43,21 @@ def sort_pnameseg(pnameseg):
 
 
 class VSlice:
-    def __init__(self, tempo=1, quarter_duration=1, measure=None, num_voices=1):
+    def __init__(self, tempo=1, ticks=1, measure=None, num_voices=1, time_base=None):
         """
         Creates a v_slice
-        :param duration: The duration of the slice, in seconds
-        :param quarter_duration: The duration of the slice, in quarter notes
+        :param tempo: The tempo of the slice, in quarter notes per minute
+        :param ticks: The duration of the slice, in ticks
         :param measure: The measure number
-        :param aslice: An existing slice if using copy constructor functionality
+        :param num_voices: The number of voices
+        :param time_base: The TimeBase of the ticks, which must include the tempo. If None, a tick is a quarter note.
         """
+        if time_base is None:
+            time_base = TimeBase(1, [tempo])
         self._core = False                      # Whether or not the chord is a core harmony
         self._cseg = None                       # The contour of the pset
         self._derived_core = False              # Whether or not the chord is a derived core harmony
         self._derived_core_associations = None  # Derived core associations, if any
-        self._duration = 0           # The duration of the slice in seconds
         self._ipseg = []             # The ipseg of the slice
         self._measure = measure      # The measure number in which the slice begins
         self._num_voices = num_voices   # The number of voices
@@ -74,10 +76,12 @@ class VSlice:
         self._psets = [set() for i in range(num_voices)]             # The psets by voice
         self._pseg = None            # The pseg
         self._psegs = []             # The psegs by voice
-        self._quarter_duration = quarter_duration  # The duration in quarters
         self._sc_name = None         # The set-class name of the pcset
         self._sc_name_carter = None  # The Carter set-class name of the pcset
         self._tempo = tempo          # The tempo
+        self._ticks = ticks          # The duration in ticks
+        self._time_base = time_base  # The timebase for converting durations
+        self._units = time_base.get_units(ticks, tempo)  # The duration in time units of the timebase
 
         self._ins = None  # The INS of the slice
         self._lns = None  # The LNS of the slice
@@ -126,19 +130,19 @@ class VSlice:
     @property
     def duration(self):
         """
-        The duration
-        :return: The duration
+        The duration in seconds
+        :return: The duration in seconds, as a Decimal
         """
-        return self._duration
+        return self._time_base.get_seconds(self._units)
 
     @duration.setter
     def duration(self, value):
         """
-        The duration
-        :param value: The new duration
+        The duration in seconds
+        :param value: The new duration, which must be a whole number of time units of the timebase
         :return: None
         """
-        self._duration = value
+        self._units = self._time_base.get_units_from_seconds(value)
 
     @property
     def ins(self):
@@ -337,18 +341,18 @@ class VSlice:
     def quarter_duration(self):
         """
         The duration in quarter notes
-        :return: The duration in quarter notes
+        :return: The duration in quarter notes, as a Fraction
         """
-        return self._quarter_duration
+        return self._time_base.get_quarters(self._ticks)
 
     @quarter_duration.setter
     def quarter_duration(self, value):
         """
         The duration in quarter notes
-        :param value: The new duration
+        :param value: The new duration, which must be a whole number of ticks
         :return: None
         """
-        self._quarter_duration = value
+        self._ticks = self._time_base.get_ticks(value)
 
     @property
     def sc_name(self):
@@ -383,6 +387,31 @@ class VSlice:
         """
         self._start_position = value
 
+    @property
+    def ticks(self):
+        """
+        The duration in ticks
+        :return: The duration in ticks
+        """
+        return self._ticks
+
+    @ticks.setter
+    def ticks(self, value):
+        """
+        The duration in ticks
+        :param value: The new duration
+        :return: None
+        """
+        self._ticks = value
+
+    @property
+    def time_base(self):
+        """
+        The TimeBase of the durations
+        :return: The TimeBase
+        """
+        return self._time_base
+
     @property
     def time_signature(self):
         """
@@ -408,6 +437,23 @@ class VSlice:
         """
         return self._uns
 
+    @property
+    def units(self):
+        """
+        The duration in time units of the timebase
+        :return: The duration in time units
+        """
+        return self._units
+
+    @units.setter
+    def units(self, value):
+        """
+        The duration in time units of the timebase
+        :param value: The new duration
+        :return: None
+        """
+        self._units = value
+
     @property
     def upper_bound(self):
         """
@@ -445,7 +491,7 @@ class VSlice:
         Copies the VSlice
         :return: A copy of the VSlice
         """
-        v = VSlice(self._tempo, self._quarter_duration, self._measure, self._num_voices)
+        v = VSlice(self._tempo, self._ticks, self._measure, self._num_voices, self._time_base)
 
     def get_cseg_string(self):
         """
@@ -543,8 +589,6 @@ class VSlice:
         # Calculate values
         self._p_cardinality = len(self._pset)
         self._pc_cardinality = len(self._pcset)
-        self._duration = (Decimal(60) / Decimal(self._tempo)) * (Decimal(self._quarter_duration.numerator) /
-                                                                 Decimal(self._quarter_duration.denominator))
 
         # Calculate set theory info
         sc.pcset = self._pcset
@@ -22,6 +22,234 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
 from pctheory import pcset, pcset, poset, pitch, tables, transformations
+import itertools
+import multiprocessing
+import numpy
+
+_tto_table = None
+
+
+def find_tto_masks(mask1: int, mask2: int, multipliers=(1, 11)):
+    """
+    Finds the TTOs that transform one pcset bitmask into another. The TTOs are found in the same order as
+    transformations.find_ttos.
+    :param mask1: A pcset bitmask
+    :param mask2: A transformed pcset bitmask
+    :param multipliers: The multipliers to consider
+    :return: A list of TTOs
+    """
+    table = get_tto_table()
+    return [transformations.TTO(n, m) for m in multipliers for n in range(12) if table[n, m, mask1] == mask2]
+
+
+def generate_array_chains(array, length: int, alt_ret=True, multipliers=(1, 11)):
+    """
+    Generates every chain of arrays that make_array_chain could make. Each link transforms the accumulated array by a
+    TTO that maps the begin-set (or the end-set, for alternately retrograded links) onto the current end-set, and
+    joins each row to a transformed row that begins with its last cell. Where make_array_chain only uses the first
+    TTO it finds, this explores every valid TTO at every link, depth-first. A TTO is valid only if every row can be
+    joined.
+    :param array: An array (as a list of rows or a mask array; see make_mask_array)
+    :param length: The length
+    :param alt_ret: Whether or not to alternately retrograde the arrays
+    :param multipliers: The multipliers to consider for the TTOs
+    :return: A generator of (mask array, list of TTOs) tuples
+    """
+    masks = array if type(array) == numpy.ndarray else make_mask_array(array)
+    table = get_tto_table()
+    pcset_start = int(numpy.bitwise_or.reduce(masks[:, 0]))
+    pcset_end = int(numpy.bitwise_or.reduce(masks[:, -1]))
+    ttos = []
+
+    def extend(masks1, i):
+        if i == length:
+            yield masks1, list(ttos)
+            return
+        ends = masks1[:, -1]
+        retrograde = alt_ret and i % 2
+        order_ends = numpy.argsort(ends, kind="stable")
+        for tto in find_tto_masks(pcset_end if retrograde else pcset_start,
+                                  int(numpy.bitwise_or.reduce(ends)), multipliers):
+            m = table[tto[0], tto[1]][masks1]
+            if retrograde:
+                m = m[:, ::-1]
+            m = m[::-1]
+
+            # Each row is joined to the first unused transformed row that begins with its last cell.
+            order_starts = numpy.argsort(m[:, 0], kind="stable")
+            if not numpy.array_equal(ends[order_ends], m[order_starts, 0]):
+                continue
+            match = numpy.empty(len(ends), dtype=numpy.intp)
+            match[order_ends] = order_starts
+            ttos.append(tto)
+            yield from extend(numpy.concatenate((masks1, m[match, 1:]), axis=1), i + 1)
+            ttos.pop()
+
+    yield from extend(masks, 1)
+
+
+def get_tto_table():
+    """
+    Gets a table of TTOs applied to every pcset bitmask. The table is built on first use.
+    :return: A (12, 12, 4096) int16 ndarray, where [n, m, mask] is the mask transformed by TnMm
+    """
+    global _tto_table
+    if _tto_table is None:
+        bits = (numpy.arange(4096)[:, numpy.newaxis] >> numpy.arange(12)) & 1
+        _tto_table = numpy.zeros((12, 12, 4096), dtype=numpy.int16)
+        for n in range(12):
+            for m in range(12):
+                _tto_table[n, m] = bits @ (1 << ((numpy.arange(12) * m + n) % 12))
+    return _tto_table
+
+
+def make_array_from_masks(masks: numpy.ndarray, pc_cells=None):
+    """
+    Makes an array from a mask array (see make_mask_array)
+    :param masks: The mask array
+    :param pc_cells: A boolean ndarray of the cells that hold single pcs rather than pcsets. If None, the cells in
+    even columns hold pcs and the cells in odd columns hold pcsets, as in the chains of poset.py.
+    :return: The array, as a list of rows
+    """
+    if pc_cells is None:
+        pc_cells = numpy.zeros(masks.shape, dtype=bool)
+        pc_cells[:, ::2] = True
+    array = []
+    for i in range(masks.shape[0]):
+        row = []
+        for j in range(masks.shape[1]):
+            cell = pcset.make_pcset_from_bitmask(int(masks[i, j]))
+            if pc_cells[i, j]:
+                if len(cell) != 1:
+                    raise ValueError(f"The cell at ({i}, {j}) does not hold a single pc.")
+                cell = cell.pop()
+            row.append(cell)
+        array.append(row)
+    return array
+
+
+def make_mask_array(array: list):
+    """
+    Makes a mask array from an array of pcs and pcsets. Every cell becomes a 12-bit mask, whether it holds a pc or a
+    pcset.
+    :param array: An array (a list of rows of equal length)
+    :return: An int16 ndarray
+    """
+    masks = numpy.zeros((len(array), len(array[0]) if len(array) > 0 else 0), dtype=numpy.int16)
+    for i in range(len(array)):
+        if len(array[i]) != masks.shape[1]:
+            raise ValueError("The rows of the array must all have the same length.")
+        for j in range(len(array[i])):
+            if type(array[i][j]) == pitch.PitchClass:
+                masks[i, j] = 1 << array[i][j].pc
+            elif type(array[i][j]) in (set, frozenset):
+                masks[i, j] = pcset.make_bitmask(array[i][j])
+            else:
+                raise ValueError(f"The cell at ({i}, {j}) is not a pc or a pcset.")
+    return masks
+
+
+def search_array_blocks(array, blocks: list, length: int = 1, alt_ret=True, multipliers=(1, 11), permute_rows=True,
+                        permute_columns=False, aggregate=True, exact=False, set_class=None, processes=1,
+                        chunk_size=5040):
+    """
+    Searches for arrays that satisfy block constraints (see verify_array_blocks). The candidates are every chain
+    that generate_array_chains can make from the array, with every ordering of its rows if permute_rows is True,
+    and every ordering of its columns if permute_columns is True. Cells are moved only by reordering whole rows
+    and columns: the cells of a single row are never reordered independently of the other rows, since that
+    would multiply the search by the number of orderings of every row.
+    The orderings are checked in vectorized batches, and the batches can be spread across a process pool.
+    Since this function can start worker processes, scripts that call it with processes > 1 should do so under
+    if __name__ == "__main__".
+    :param array: An array (as a list of rows or a mask array)
+    :param blocks: The blocks (see verify_array_blocks)
+    :param length: The chain length (1 searches the array itself)
+    :param alt_ret: Whether or not to alternately retrograde the arrays in the chains
+    :param multipliers: The multipliers to consider for the TTOs
+    :param permute_rows: Whether to try every ordering of the rows
+    :param permute_columns: Whether to try every ordering of the columns
+    :param aggregate: Whether each block must form an aggregate
+    :param exact: Whether each block must contain each pc exactly once
+    :param set_class: A set-class name that the content of each block must belong to (or None)
+    :param processes: The number of worker processes (1 searches in this process)
+    :param chunk_size: The number of orderings to check in each batch
+    :return: A list of (mask array, list of TTOs, row ordering, column ordering) tuples, in search order
+    """
+    masks = array if type(array) == numpy.ndarray else make_mask_array(array)
+    criteria = (aggregate, exact, set_class)
+
+    def get_batches():
+        for masks1, ttos in generate_array_chains(masks, length, alt_ret, multipliers):
+            rows = itertools.permutations(range(masks1.shape[0])) if permute_rows else \
+                [tuple(range(masks1.shape[0]))]
+            columns = list(itertools.permutations(range(masks1.shape[1]))) if permute_columns else \
+                [tuple(range(masks1.shape[1]))]
+            orderings = itertools.product(rows, columns)
+            while True:
+                batch = list(itertools.islice(orderings, chunk_size))
+                if len(batch) == 0:
+                    break
+                yield (masks1, ttos, numpy.array([b[0] for b in batch], dtype=numpy.intp),
+                       numpy.array([b[1] for b in batch], dtype=numpy.intp), blocks, criteria)
+
+    results = []
+    if processes == 1:
+        for batch in get_batches():
+            results += _search_batch(batch)
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            for result in pool.imap(_search_batch, get_batches()):
+                results += result
+    return results
+
+
+def transform_mask_array(masks: numpy.ndarray, tto: transformations.TTO, retrograde=False):
+    """
+    Transforms every cell of a mask array at once
+    :param masks: A mask array
+    :param tto: A TTO
+    :param retrograde: Whether to retrograde each row
+    :return: The transformed mask array
+    """
+    masks = get_tto_table()[tto[0] % 12, tto[1] % 12][masks]
+    return masks[:, ::-1] if retrograde else masks
+
+
+def verify_array_blocks(masks: numpy.ndarray, blocks: list, aggregate=True, exact=False, set_class=None):
+    """
+    Checks the content of blocks of cells in mask arrays. Each block is the union of its cells, found with bitmask
+    ORs, so any number of arrays can be checked at once.
+    :param masks: A mask array of shape (rows, columns), or a stack of mask arrays of shape (..., rows, columns)
+    :param blocks: A list of (rows, columns) tuples. Each of rows and columns is an index, a list of indices, a
+    range or a slice, and the block holds every cell in those rows and columns. For example, (0, range(0, 5)) is the
+    first five cells of row 0, and (slice(None), 4) is column 4.
+    :param aggregate: Whether each block must form an aggregate
+    :param exact: Whether each block must contain each pc exactly once (this implies aggregate)
+    :param set_class: A set-class name that the content of each block must belong to (or None)
+    :return: A boolean ndarray of shape (..., number of blocks), which is True where a block satisfies the constraints
+    """
+    masks = numpy.asarray(masks)
+    class_masks = None
+    class_mask = None
+    if set_class is not None:
+        sc = pcset.SetClass()
+        sc.load_from_name(set_class)
+        class_masks = pcset.get_class_masks()
+        class_mask = class_masks[pcset.make_bitmask(sc.pcset)]
+    result = numpy.ones(masks.shape[:-2] + (len(blocks),), dtype=bool)
+    for b, (rows, columns) in enumerate(blocks):
+        rows = numpy.atleast_1d(numpy.arange(masks.shape[-2])[rows])
+        columns = numpy.atleast_1d(numpy.arange(masks.shape[-1])[columns])
+        cells = masks[..., rows[:, numpy.newaxis], columns].reshape(masks.shape[:-2] + (-1,))
+        union = numpy.bitwise_or.reduce(cells, axis=-1)
+        if aggregate or exact:
+            result[..., b] &= union == 0xFFF
+        if exact:
+            sizes = ((cells[..., numpy.newaxis] >> numpy.arange(12)) & 1).sum(axis=(-2, -1))
+            result[..., b] &= sizes == 12
+        if set_class is not None:
+            result[..., b] &= class_masks[union] == class_mask
+    return result
 
 
 def transform_row_content(array: list, ro: transformations.RO):
@@ -109,3 +337,17 @@ def make_array_chain(array: list, length: int, alt_ret=True):
                     break
 
     return array1
+
+
+def _search_batch(args: tuple):
+    """
+    Checks a batch of row and column orderings of an array for search_array_blocks. This can run in a worker
+    process.
+    :param args: A tuple (mask array, TTOs, row orderings, column orderings, blocks, (aggregate, exact, set_class))
+    :return: A list of (mask array, list of TTOs, row ordering, column ordering) tuples for the orderings that
+    satisfy the blocks
+    """
+    masks, ttos, rows, columns, blocks, criteria = args
+    candidates = masks[rows[:, :, numpy.newaxis], columns[:, numpy.newaxis, :]]
+    valid = numpy.flatnonzero(verify_array_blocks(candidates, blocks, *criteria).all(axis=-1))
+    return [(candidates[i], ttos, tuple(rows[i].tolist()), tuple(columns[i].tolist())) for i in valid]
@@ -22,6 +22,7 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
 from pctheory import pcset, pitch, tables, transformations
+import numpy
 import random
 
 
@@ -130,6 +131,32 @@ def generate_random_pcseg_from_pcset(pcset: set):
     return pcseg
 
 
+def get_invariance_counts(tensors, diagonal=None):
+    """
+    Counts the invariances recorded in invariance tensors (see make_invariance_tensors). Without a diagonal
+    direction, the count for value v of a matrix is the number of cells holding v, which is the number of pcs of
+    pcseg C that the operator with index v maps into pcseg A. With a diagonal direction, the count for value v is
+    the number of adjacent cell pairs along that direction that both hold v, which is the number of ordered
+    (diagonal) or retrograde (anti-diagonal) dyads that the operator maps from C into A.
+    :param tensors: An array of invariance tensors, of shape (..., 4, m, n)
+    :param diagonal: None, "diagonal", or "anti-diagonal"
+    :return: An int array of shape (..., 4, 12)
+    """
+    tensors = numpy.asarray(tensors)
+    values = numpy.arange(12)
+    if diagonal is None:
+        cells = tensors[..., numpy.newaxis] == values
+    elif diagonal == "diagonal":
+        cells = tensors[..., :-1, :-1, numpy.newaxis] == values
+        cells &= (tensors[..., :-1, :-1] == tensors[..., 1:, 1:])[..., numpy.newaxis]
+    elif diagonal == "anti-diagonal":
+        cells = tensors[..., :-1, 1:, numpy.newaxis] == values
+        cells &= (tensors[..., :-1, 1:] == tensors[..., 1:, :-1])[..., numpy.newaxis]
+    else:
+        raise ValueError("Invalid diagonal direction")
+    return cells.sum(axis=(-3, -2))
+
+
 def get_intervals(pcseg: list):
     """
     Gets the interval sequence of a pcseg
@@ -142,6 +169,60 @@ def get_intervals(pcseg: list):
     return intervals
 
 
+def get_rotational_array_verticals(arrays):
+    """
+    Gets the verticals (columns) of a batch of rotational arrays as pcset bitmasks
+    :param arrays: An array of rotational arrays, of shape (N, k, k) (see make_rotational_arrays)
+    :return: An int16 array of shape (N, k)
+    """
+    return numpy.bitwise_or.reduce(numpy.left_shift(1, numpy.asarray(arrays), dtype=numpy.int16), axis=-2)
+
+
+def get_row_classes(pcsegs, rotation=False, multiplication=False):
+    """
+    Gets the canonical row-class representatives of a batch of pcsegs. Two pcsegs belong to the same row class if
+    one is a P, I, R, or RI form of the other (the 48 RO operations). Rotations and M5/M7 forms can optionally be
+    treated as equivalent as well. The representative is the lexicographically smallest equivalent form that
+    starts on pc 0, and the key is that form packed into a base-12 integer, so that equal keys mean equal row classes.
+    :param pcsegs: A pcseg, a list of pcsegs of equal length, or an (N, k) array of pc integers
+    :param rotation: Whether or not rotations are considered equivalent
+    :param multiplication: Whether or not M5 and M7 forms are considered equivalent
+    :return: A tuple (keys, forms). keys is an (N,) int64 array of row-class keys, and forms is an (N, k) array
+    of the row-class representatives.
+    """
+    segs = make_pcseg_array(pcsegs)
+    num_segs, length = segs.shape
+    if length > 17:
+        raise ValueError("Pcsegs longer than 17 cannot be packed into a row-class key")
+    if length == 0:
+        return numpy.zeros(num_segs, dtype=numpy.int64), numpy.zeros((num_segs, 0), dtype=numpy.int8)
+
+    # Every order permutation (P, R, and optionally their rotations) and every multiplier
+    indices = numpy.arange(length)
+    orders = [indices, indices[::-1]]
+    if rotation:
+        orders = [numpy.roll(order, n) for order in orders for n in range(length)]
+    orders = numpy.array(orders)
+    multipliers = numpy.array([1, 11, 5, 7] if multiplication else [1, 11], dtype=numpy.int16)
+    weights = 12 ** numpy.arange(length - 1, -1, -1, dtype=numpy.int64)
+
+    keys = numpy.empty(num_segs, dtype=numpy.int64)
+    forms = numpy.empty((num_segs, length), dtype=numpy.int8)
+
+    # Work through the batch in blocks, so that the (block, forms, length) tensor stays small
+    for start in range(0, num_segs, 4096):
+        block = segs[start:start + 4096, orders].astype(numpy.int16)
+        block = block[:, numpy.newaxis] * multipliers[:, numpy.newaxis, numpy.newaxis]
+        block = block.reshape(block.shape[0], -1, length)
+        block = (block - block[:, :, :1]) % 12
+        block_keys = block @ weights
+        best = block_keys.argmin(axis=1)
+        rows = numpy.arange(block.shape[0])
+        keys[start:start + 4096] = block_keys[rows, best]
+        forms[start:start + 4096] = block[rows, best]
+    return keys, forms
+
+
 def get_secondary_forms(pcseg: list, subseg: list):
     """
     Gets all secondary forms that contain the provided ordered subseg
@@ -183,6 +264,52 @@ def get_secondary_forms(pcseg: list, subseg: list):
     return secondary_forms
 
 
+def get_segmental_invariance(pcsegs, multiplication=False):
+    """
+    Computes segmental invariance tables for a batch of pcsegs. For every contiguous window of each pcseg and every
+    RO form of that pcseg, the tables record whether the form has the same content (unordered) or the same order
+    in the same window positions. Window contents are compared as bitmasks built by extending the union of each
+    window one position at a time.
+    :param pcsegs: A pcseg, a list of pcsegs of equal length, or an (N, k) array of pc integers
+    :param multiplication: Whether or not to include the M5 and M7 forms
+    :return: A tuple (ros, content, order). ros is the list of ROs, and content and order are boolean arrays of
+    shape (N, len(ros), k, k + 1). Index [n, f, i, l] refers to the window of length l starting at order position i.
+    Windows of length 0 and windows that extend past the end of the pcseg are False.
+    """
+    segs = make_pcseg_array(pcsegs)
+    length = segs.shape[1]
+    ros, forms = _make_ro_forms(segs, multiplication)
+    bits = numpy.left_shift(1, forms, dtype=numpy.int16)
+    same = forms == segs[:, numpy.newaxis]
+    masks = numpy.zeros(forms.shape + (length + 1,), dtype=numpy.int16)
+    order = numpy.zeros(masks.shape, dtype=bool)
+    valid = numpy.zeros((length, length + 1), dtype=bool)
+    order[..., 0] = True
+    for n in range(1, length + 1):
+        masks[..., :length - n + 1, n] = masks[..., :length - n + 1, n - 1] | bits[..., n - 1:]
+        order[..., :length - n + 1, n] = order[..., :length - n + 1, n - 1] & same[..., n - 1:]
+        valid[:length - n + 1, n] = True
+    content = (masks == masks[:, :1]) & valid
+    order &= valid
+    return ros, content, order
+
+
+def group_row_classes(pcsegs, rotation=False, multiplication=False):
+    """
+    Groups a batch of pcsegs by row class (see get_row_classes)
+    :param pcsegs: A pcseg, a list of pcsegs of equal length, or an (N, k) array of pc integers
+    :param rotation: Whether or not rotations are considered equivalent
+    :param multiplication: Whether or not M5 and M7 forms are considered equivalent
+    :return: A dictionary in which the row-class keys are the keys, and arrays of the indices of the pcsegs
+    in each row class are the values
+    """
+    keys = get_row_classes(pcsegs, rotation, multiplication)[0]
+    unique_keys, inverse = numpy.unique(keys, return_inverse=True)
+    order = numpy.argsort(inverse, kind="stable")
+    groups = numpy.split(order, numpy.cumsum(numpy.bincount(inverse))[:-1])
+    return {int(unique_keys[i]): groups[i] for i in range(len(unique_keys))}
+
+
 def invert(pcseg: list):
     """
     Inverts a pcseg
@@ -253,6 +380,63 @@ def make_pcseg(*args):
     return [pitch.PitchClass(pc) for pc in args]
 
 
+def make_pcseg_array(pcsegs):
+    """
+    Makes a 2D array of pc integers from a batch of pcsegs
+    :param pcsegs: A pcseg, a list of pcsegs of equal length, or an array of pc integers
+    :return: An (N, k) int8 array with one pcseg per row
+    """
+    if isinstance(pcsegs, numpy.ndarray):
+        segs = pcsegs
+    else:
+        pcsegs = list(pcsegs)
+        if len(pcsegs) > 0 and not isinstance(pcsegs[0], (pitch.PitchClass, int, numpy.integer)):
+            segs = [[pc.pc if isinstance(pc, pitch.PitchClass) else pc for pc in seg] for seg in pcsegs]
+        else:
+            segs = [pc.pc if isinstance(pc, pitch.PitchClass) else pc for pc in pcsegs]
+        segs = numpy.array(segs, dtype=numpy.int64)
+    if segs.ndim == 1:
+        segs = segs[numpy.newaxis]
+    return (segs % 12).astype(numpy.int8)
+
+
+def make_invariance_tensors(a, c):
+    """
+    Makes the four Morris invariance matrices (T, I, M, and MI) for a batch of pcseg pairs. Index [t, i, j] of each
+    tensor is the same as InvarianceMatrix(("T", "I", "M", "MI")[t], a, c).at(i, j).
+    :param a: Pcseg A, or a batch of N pcsegs of length n
+    :param c: Pcseg C, or a batch of N pcsegs of length m
+    :return: An int8 array of shape (N, 4, m, n)
+    """
+    multipliers = numpy.array([11, 1, 7, 5], dtype=numpy.int16)
+    a = make_pcseg_array(a).astype(numpy.int16)
+    c = make_pcseg_array(c).astype(numpy.int16)
+    b = c[:, numpy.newaxis, :, numpy.newaxis] * multipliers[:, numpy.newaxis, numpy.newaxis]
+    return ((b + a[:, numpy.newaxis, numpy.newaxis, :]) % 12).astype(numpy.int8)
+
+
+def make_rotational_arrays(pcsegs):
+    """
+    Makes Stravinsky-style rotational arrays for a batch of pcsegs. Row i of each array is the pcseg rotated to
+    begin on its order position i, then transposed to begin on pc 0. This matches RotationalArray.
+    :param pcsegs: A pcseg, a list of pcsegs of equal length, or an (N, k) array of pc integers
+    :return: An int8 array of shape (N, k, k)
+    """
+    segs = make_pcseg_array(pcsegs).astype(numpy.int16)
+    length = segs.shape[1]
+    indices = (numpy.arange(length)[:, numpy.newaxis] + numpy.arange(length)) % length
+    return ((segs[:, indices] - segs[:, :, numpy.newaxis]) % 12).astype(numpy.int8)
+
+
+def make_pcsegs_from_array(array):
+    """
+    Makes a list of pcsegs from a 2D array of pc integers
+    :param array: An (N, k) array of pc integers
+    :return: A list of pcsegs
+    """
+    return [[pitch.PitchClass(int(pc)) for pc in seg] for seg in numpy.asarray(array)]
+
+
 def multiply(pcseg: list, n: int):
     """
     Multiplies a pcseg
@@ -330,6 +514,17 @@ def rotate(pcseg: list, n: int):
     return pcseg2
 
 
+def rotational_array_census(pcsegs, name_tables=None):
+    """
+    Takes a set-class census of the verticals of the rotational arrays of a batch of pcsegs
+    :param pcsegs: A pcseg, a list of pcsegs of equal length, or an (N, k) array of pc integers
+    :param name_tables: A dictionary of name tables
+    :return: A dictionary in which the Morris set-class names are the keys, and the numbers of verticals in each
+    set-class are the values
+    """
+    return pcset.set_class_census(get_rotational_array_verticals(make_rotational_arrays(pcsegs)), name_tables)
+
+
 def transpose(pcseg: list, n: int):
     """
     Transposes a pcseg
@@ -343,6 +538,43 @@ def transpose(pcseg: list, n: int):
     return pcseg2
 
 
+def unpack_row_class_key(key: int, length: int):
+    """
+    Unpacks a row-class key (see get_row_classes) into its representative pcseg
+    :param key: The row-class key
+    :param length: The length of the pcsegs in the row class
+    :return: The representative pcseg
+    """
+    pcseg = []
+    for i in range(length):
+        pcseg.insert(0, pitch.PitchClass(key % 12))
+        key //= 12
+    return pcseg
+
+
+def _make_ro_forms(segs, multiplication=False):
+    """
+    Makes the RO forms of a batch of pcsegs
+    :param segs: An (N, k) array of pc integers
+    :param multiplication: Whether or not to include the M5 and M7 forms
+    :return: A tuple (ros, forms). ros is the list of ROs, in the order of transformations.get_ros, and forms is an
+    (N, len(ros), k) int8 array. The first form is always T0.
+    """
+    operator_types = [transformations.OperatorType.Tn, transformations.OperatorType.TnI,
+                      transformations.OperatorType.RTn, transformations.OperatorType.RTnI]
+    if multiplication:
+        operator_types += [transformations.OperatorType.TnM5, transformations.OperatorType.TnM7,
+                           transformations.OperatorType.RTnM5, transformations.OperatorType.RTnM7]
+    ros = transformations.get_ros(*operator_types)
+    transposition = numpy.array([ro[0] for ro in ros], dtype=numpy.int16)
+    retrograde = numpy.array([ro[1] for ro in ros], dtype=bool)
+    multiplier = numpy.array([ro[2] for ro in ros], dtype=numpy.int16)
+    forms = (segs[:, numpy.newaxis].astype(numpy.int16) * multiplier[:, numpy.newaxis] +
+             transposition[:, numpy.newaxis]) % 12
+    forms[:, retrograde] = forms[:, retrograde, ::-1]
+    return ros, forms.astype(numpy.int8)
+
+
 class InvarianceMatrix:
     """
     Represents an invariance matrix
@@ -519,6 +751,236 @@ class InvarianceMatrix:
         print(lines)
 
 
+class InvarianceTensor:
+    """
+    Represents all four invariance matrices (T, I, M, and MI) of a pair of pcsegs as a single tensor
+    """
+    mx_types = ("T", "I", "M", "MI")
+
+    def __init__(self, a=None, c=None):
+        """
+        Creates an invariance tensor
+        :param a: Pcseg A
+        :param c: Pcseg C
+        """
+        self._a = None
+        self._c = None
+        self._tensor = None
+        if a is not None and c is not None:
+            self.load_tensor(a, c)
+
+    def __repr__(self):
+        return "<pctheory.pcseg.InvarianceTensor object at " + str(id(self)) + ">: " + str(self._tensor)
+
+    @property
+    def pcseg_a(self):
+        """
+        Gets the pcseg A
+        :return: The pcseg A
+        """
+        return self._a
+
+    @property
+    def pcseg_c(self):
+        """
+        Gets the pcseg C
+        :return: The pcseg C
+        """
+        return self._c
+
+    @property
+    def tensor(self):
+        """
+        Gets the tensor. The first axis is the matrix type, in the order of InvarianceTensor.mx_types.
+        :return: An int8 array of shape (4, m, n)
+        """
+        return self._tensor
+
+    def at(self, mx_type, i, j):
+        """
+        Gets the pc at the specified matrix, row and column
+        :param mx_type: The matrix type (T, I, M, or MI)
+        :param i: The row
+        :param j: The column
+        :return: The pc
+        """
+        return pitch.PitchClass(int(self._tensor[self.mx_types.index(mx_type.upper()), i, j]))
+
+    def get_antidiagonal_counts(self):
+        """
+        Counts the anti-diagonal (retrograde dyad) invariances of each matrix
+        :return: An int array of shape (4, 12), indexed by matrix type and operator index
+        """
+        return get_invariance_counts(self._tensor, "anti-diagonal")
+
+    def get_cells_in_pcset(self, pcset1: set):
+        """
+        Finds the cells that hold a member of a pcset
+        :param pcset1: A pcset
+        :return: A boolean array of shape (4, m, n)
+        """
+        mask = pcset.make_bitmask(pcset1)
+        return numpy.array([mask >> pc & 1 for pc in range(12)], dtype=bool)[self._tensor]
+
+    def get_diagonal_counts(self):
+        """
+        Counts the diagonal (ordered dyad) invariances of each matrix
+        :return: An int array of shape (4, 12), indexed by matrix type and operator index
+        """
+        return get_invariance_counts(self._tensor, "diagonal")
+
+    def get_matrix(self, mx_type):
+        """
+        Gets one of the matrices
+        :param mx_type: The matrix type (T, I, M, or MI)
+        :return: An int8 array of shape (m, n)
+        """
+        return self._tensor[self.mx_types.index(mx_type.upper())]
+
+    def get_positions(self, pc: pitch.PitchClass):
+        """
+        Finds the positions of a pc in each matrix
+        :param pc: A pc
+        :return: An array of (type, row, column) index triples
+        """
+        return numpy.argwhere(self._tensor == pc.pc)
+
+    def get_value_counts(self):
+        """
+        Counts the occurrences of each pc in each matrix
+        :return: An int array of shape (4, 12), indexed by matrix type and operator index
+        """
+        return get_invariance_counts(self._tensor)
+
+    def load_tensor(self, a: list, c: list):
+        """
+        Loads the tensor
+        :param a: Pcseg A
+        :param c: Pcseg C
+        :return: None
+        """
+        self._tensor = make_invariance_tensors(a, c)[0]
+        self._a = a.copy()
+        self._c = c.copy()
+
+
+class RandomPcsegGenerator:
+    """
+    Generates random pcsegs in bulk from a seedable NumPy random generator. Unlike generate_random_pcseg and related
+    functions, the generator is seeded once, so runs can be reproduced, and independent substreams can be spawned
+    for parallel workers.
+    """
+    def __init__(self, seed=None, name_tables=None):
+        """
+        Creates a RandomPcsegGenerator
+        :param seed: An integer seed or a numpy.random.SeedSequence (if None, fresh entropy is taken from the OS)
+        :param name_tables: A dictionary of name tables (only needed for all-interval rows)
+        """
+        self._seed_sequence = seed if isinstance(seed, numpy.random.SeedSequence) else \
+            numpy.random.SeedSequence(seed)
+        self._rng = numpy.random.Generator(numpy.random.PCG64(self._seed_sequence))
+        self._tables = name_tables
+        self._all_interval_generators = None
+
+    def __repr__(self):
+        return "<pctheory.pcseg.RandomPcsegGenerator object at " + str(id(self)) + ">: " + \
+               str(self._seed_sequence.entropy)
+
+    @property
+    def rng(self):
+        """
+        Gets the NumPy random generator
+        :return: The numpy.random.Generator
+        """
+        return self._rng
+
+    @property
+    def seed_sequence(self):
+        """
+        Gets the seed sequence. Its entropy can be used to reproduce the run.
+        :return: The numpy.random.SeedSequence
+        """
+        return self._seed_sequence
+
+    def generate_all_interval_rows(self, n: int, starting_pc=None):
+        """
+        Generates random all-interval rows
+        :param n: The number of rows
+        :param starting_pc: The starting pitch-class. If None, random starting pitch-classes are used.
+        :return: An (n, 12) int8 array of rows
+        """
+        if self._all_interval_generators is None:
+            if self._tables is None:
+                self._tables = tables.create_tables()
+            self._all_interval_generators = numpy.array(self._tables["allIntervalRowGenerators"], dtype=numpy.int16)
+        generators = self._all_interval_generators[self._rng.integers(len(self._all_interval_generators), size=n)]
+        starts = self._get_starting_pcs(n, starting_pc)
+        rows = numpy.zeros((n, 12), dtype=numpy.int16)
+        rows[:, 1:] = numpy.cumsum(generators, axis=1)
+        return ((rows + starts[:, numpy.newaxis]) % 12).astype(numpy.int8)
+
+    def generate_pcsegs(self, n: int, length: int, non_duplicative=False, starting_pc=None):
+        """
+        Generates random pcsegs
+        :param n: The number of pcsegs
+        :param length: The length of each pcseg
+        :param non_duplicative: Whether or not duplicate pcs may occur (must be True to generate rows)
+        :param starting_pc: The starting pitch-class. If None, random starting pitch-classes are used.
+        :return: An (n, length) int8 array of pcsegs
+        """
+        if non_duplicative and 0 < length <= 12:
+            # Random permutations of the aggregate. Giving the starting pc the lowest sort key puts it first.
+            keys = self._rng.random((n, 12))
+            if starting_pc is not None:
+                keys[:, starting_pc % 12] = -1
+            return numpy.argsort(keys, axis=1)[:, :length].astype(numpy.int8)
+        elif not non_duplicative and 0 < length:
+            segs = self._rng.integers(12, size=(n, length), dtype=numpy.int8)
+            if starting_pc is not None:
+                segs[:, 0] = starting_pc % 12
+            return segs
+        else:
+            raise ValueError("Invalid length")
+
+    def generate_pcsegs_from_pcset(self, n: int, pcset1: set):
+        """
+        Generates random orderings of a pcset
+        :param n: The number of pcsegs
+        :param pcset1: A pcset
+        :return: An (n, len(pcset1)) int8 array of pcsegs
+        """
+        pcs = numpy.array(sorted([pc.pc for pc in pcset1]), dtype=numpy.int8)
+        return pcs[numpy.argsort(self._rng.random((n, len(pcs))), axis=1)]
+
+    def generate_rows(self, n: int, starting_pc=None):
+        """
+        Generates random rows
+        :param n: The number of rows
+        :param starting_pc: The starting pitch-class. If None, random starting pitch-classes are used.
+        :return: An (n, 12) int8 array of rows
+        """
+        return self.generate_pcsegs(n, 12, True, starting_pc)
+
+    def spawn(self, n: int):
+        """
+        Spawns independent generators, for example one for each parallel worker
+        :param n: The number of generators
+        :return: A list of RandomPcsegGenerators
+        """
+        return [RandomPcsegGenerator(child, self._tables) for child in self._seed_sequence.spawn(n)]
+
+    def _get_starting_pcs(self, n: int, starting_pc=None):
+        """
+        Gets starting pcs for a batch
+        :param n: The size of the batch
+        :param starting_pc: The starting pitch-class. If None, random starting pitch-classes are used.
+        :return: An int16 array of starting pcs
+        """
+        if starting_pc is None:
+            return self._rng.integers(12, size=n, dtype=numpy.int16)
+        return numpy.full(n, starting_pc % 12, dtype=numpy.int16)
+
+
 class RotationalArray:
     """
     Represents a rotational array
@@ -591,6 +1053,14 @@ class RotationalArray:
         """
         return self._array[i].copy()
 
+    def get_vertical_masks(self):
+        """
+        Gets the verticals (columns) of the rotational array as pcset bitmasks
+        :return: A list of bitmasks
+        """
+        array = make_pcseg_array(self._array)
+        return get_rotational_array_verticals(array).tolist()
+
     def import_pcseg(self, pcseg: list):
         """
         Imports a pcseg
@@ -598,9 +1068,137 @@ class RotationalArray:
         :return: None
         """
         self._pcseg = transpose(pcseg, 12 - pcseg[0].pc)
-        self._array.clear()
-        for i in range(len(self._pcseg)):
-            self._array.append(rotate(transpose(self._pcseg, -self._pcseg[i].pc), len(self._pcseg) - i))
+        self._array = make_pcsegs_from_array(make_rotational_arrays(self._pcseg)[0])
+
+
+class SegmentalInvarianceTable:
+    """
+    Represents the segmental invariance table of a pcseg across all of its RO forms
+    """
+    def __init__(self, pcseg=None, multiplication=False):
+        """
+        Creates a segmental invariance table
+        :param pcseg: A pcseg to import
+        :param multiplication: Whether or not to include the M5 and M7 forms
+        """
+        self._content = None
+        self._masks = None
+        self._multiplication = multiplication
+        self._order = None
+        self._pcseg = None
+        self._ro_index = {}
+        self._ros = []
+        if pcseg is not None:
+            self.import_pcseg(pcseg)
+
+    def __repr__(self):
+        return "<pctheory.pcseg.SegmentalInvarianceTable object at " + str(id(self)) + ">: " + str(self._pcseg)
+
+    @property
+    def content(self):
+        """
+        Gets the content invariance table. Index [f, i, l] is True if RO form f has the same content as the pcseg
+        in the window of length l starting at order position i.
+        :return: A boolean array of shape (len(ros), k, k + 1)
+        """
+        return self._content
+
+    @property
+    def masks(self):
+        """
+        Gets the window bitmasks of the pcseg. Index [i, l] is the bitmask of the window of length l starting at
+        order position i.
+        :return: An int16 array of shape (k, k + 1)
+        """
+        return self._masks
+
+    @property
+    def order(self):
+        """
+        Gets the order invariance table. Index [f, i, l] is True if RO form f has the same ordered segment as the
+        pcseg in the window of length l starting at order position i.
+        :return: A boolean array of shape (len(ros), k, k + 1)
+        """
+        return self._order
+
+    @property
+    def pcseg(self):
+        """
+        Gets the pcseg
+        :return: The pcseg
+        """
+        return self._pcseg
+
+    @property
+    def ros(self):
+        """
+        Gets the ROs that index the first axis of the tables
+        :return: A list of ROs
+        """
+        return self._ros
+
+    def get_content_counts(self):
+        """
+        Gets the number of RO forms that preserve the content of each window
+        :return: An int array of shape (k, k + 1)
+        """
+        return self._content.sum(axis=0)
+
+    def get_content_invariant_ros(self, start: int, length: int):
+        """
+        Gets the ROs that preserve the content of a window
+        :param start: The starting order position of the window
+        :param length: The length of the window
+        :return: A list of ROs
+        """
+        return [self._ros[f] for f in numpy.flatnonzero(self._content[:, start, length])]
+
+    def get_invariant_segments(self, ro: transformations.RO, ordered=False):
+        """
+        Gets the windows that an RO holds invariant
+        :param ro: An RO
+        :param ordered: Whether to look for order invariance instead of content invariance
+        :return: A list of (start, length) tuples
+        """
+        table = self._order if ordered else self._content
+        windows = numpy.argwhere(table[self._ro_index[tuple(ro.ro)]])
+        return [(int(window[0]), int(window[1])) for window in windows]
+
+    def get_order_invariant_ros(self, start: int, length: int):
+        """
+        Gets the ROs that preserve the order of a window
+        :param start: The starting order position of the window
+        :param length: The length of the window
+        :return: A list of ROs
+        """
+        return [self._ros[f] for f in numpy.flatnonzero(self._order[:, start, length])]
+
+    def get_segment(self, start: int, length: int):
+        """
+        Gets the content of a window as a pcset
+        :param start: The starting order position of the window
+        :param length: The length of the window
+        :return: A pcset
+        """
+        return pcset.make_pcset_from_bitmask(int(self._masks[start, length]))
+
+    def import_pcseg(self, pcseg: list):
+        """
+        Imports a pcseg and computes its tables
+        :param pcseg: A pcseg
+        :return: None
+        """
+        self._pcseg = pcseg.copy()
+        segs = make_pcseg_array(pcseg)
+        self._ros, content, order = get_segmental_invariance(segs, self._multiplication)
+        self._ro_index = {tuple(self._ros[f].ro): f for f in range(len(self._ros))}
+        self._content = content[0]
+        self._order = order[0]
+        length = segs.shape[1]
+        bits = numpy.left_shift(1, segs[0], dtype=numpy.int16)
+        self._masks = numpy.zeros((length, length + 1), dtype=numpy.int16)
+        for n in range(1, length + 1):
+            self._masks[:length - n + 1, n] = self._masks[:length - n + 1, n - 1] | bits[n - 1:]
 
 
 class TwelveToneMatrix:
@@ -23,6 +23,9 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 from typing import Set
 from pctheory import pitch, tables, transformations
+import numpy
+
+_class_masks = None  # The cached lookup table for get_class_masks
 
 
 class SetClass:
@@ -503,6 +506,25 @@ class SetClass:
         return pclists[0]
 
 
+def get_class_masks():
+    """
+    Gets a lookup table that maps every 12-bit pcset mask to the smallest mask among its Tn and TnI forms.
+    Two masks belong to the same set-class if and only if they map to the same entry. The table is computed
+    once and cached.
+    :return: An int16 array of length 4096
+    """
+    global _class_masks
+    if _class_masks is None:
+        masks = numpy.arange(4096)
+        bits = (masks[:, numpy.newaxis] >> numpy.arange(12)) & 1
+        forms = []
+        for multiplier in (1, 11):
+            for n in range(12):
+                forms.append(bits @ (1 << ((numpy.arange(12) * multiplier + n) % 12)))
+        _class_masks = numpy.min(forms, axis=0).astype(numpy.int16)
+    return _class_masks
+
+
 def get_complement(pcset: set):
     """
     Gets the complement of a pcset
@@ -564,6 +586,18 @@ def invert(pcset: set):
     return pcset2
 
 
+def make_bitmask(pcset: set):
+    """
+    Makes a 12-bit mask from a pcset. Bit n is set if pc n is in the pcset.
+    :param pcset: A pcset
+    :return: The bitmask as an integer
+    """
+    mask = 0
+    for pc in pcset:
+        mask |= 1 << pc.pc
+    return mask
+
+
 def make_pcset(*args):
     """
     Makes a pcset
@@ -576,6 +610,20 @@ def make_pcset(*args):
     return pcset
 
 
+def make_pcset_from_bitmask(mask: int):
+    """
+    Makes a pcset from a 12-bit mask
+    :param mask: The bitmask
+    :return: A pcset
+    """
+    pcset = set()
+    while mask:
+        bit = mask & -mask
+        pcset.add(pitch.PitchClass(bit.bit_length() - 1))
+        mask ^= bit
+    return pcset
+
+
 def multiply(pcset: set, n: int):
     """
     Multiplies a pcset
@@ -589,6 +637,23 @@ def multiply(pcset: set, n: int):
     return pcset2
 
 
+def set_class_census(masks, name_tables=None):
+    """
+    Takes a set-class census of a batch of pcset bitmasks
+    :param masks: An array of 12-bit pcset masks
+    :param name_tables: A dictionary of name tables
+    :return: A dictionary in which the Morris set-class names are the keys, and the numbers of masks in each
+    set-class are the values
+    """
+    class_masks, counts = numpy.unique(get_class_masks()[numpy.asarray(masks)], return_counts=True)
+    sc = SetClass(name_tables)
+    census = {}
+    for i in range(len(class_masks)):
+        sc.pcset = make_pcset_from_bitmask(int(class_masks[i]))
+        census[sc.name_morris] = int(counts[i])
+    return census
+
+
 def set_class_filter(name: str, sets: list):
     """
     Filters a list of pcsets
@@ -21,9 +21,57 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
+import itertools
+import multiprocessing
+import random
+import numpy
 from pctheory import pitch, pcset, pcseg, tables, transformations
 
 
+def count_chains_weak(p0: pitch.PitchClass, sc_list: list, max_2_similarity: float = 0.4,
+                      min_2_similarity: float = 0, max_3_similarity: float = 1, min_3_similarity: float = 0,
+                      pn=None, include_filter=None, exclude_filter=None, histogram=False):
+    """
+    Counts the "weak" chains that generate_chains_weak would produce, without building them. The count is made
+    with dynamic programming over the states (last pivot, last pcset, previous pcset), so each state is only
+    explored once no matter how many chains pass through it.
+    :param p0: The starting pitch
+    :param sc_list: The list of set-class names
+    :param max_2_similarity: The maximum adjacent similarity percentage (see generate_chains_weak)
+    :param min_2_similarity: The corresponding minimum of max_2_similarity
+    :param max_3_similarity: The maximum similarity percentage of three adjacent pcsets (see generate_chains_weak)
+    :param min_3_similarity: The corresponding minimum of max_3_similarity
+    :param pn: The ending pitch (if left as None, no ending pitch will be separated out of the last sets)
+    :param include_filter: An optional position filter for inclusion (see filter_poset_positions)
+    :param exclude_filter: An optional position filter for exclusion (see filter_poset_positions)
+    :param histogram: Whether to return the number of chains for each starting pcset instead of the total
+    :return: The number of chains, or a dictionary of (starting pcset, number of chains) pairs if histogram is True.
+    Starting pcsets that begin no chains are left out of the dictionary.
+    """
+    corpora = _get_corpora(sc_list)
+    similarity = (max_2_similarity, min_2_similarity, max_3_similarity, min_3_similarity)
+    allowed = _make_position_masks(2 * len(corpora) + (pn is not None), include_filter, exclude_filter)
+    counts = _count_chains(p0.pc, corpora, similarity, None if pn is None else pn.pc, allowed)
+    if histogram:
+        return {frozenset(pcset.make_pcset_from_bitmask(mask)): counts[mask] for mask in counts if counts[mask]}
+    return sum(counts.values())
+
+
+def filter_chain_array(chains: numpy.ndarray, include_filter=None, exclude_filter=None):
+    """
+    Filters a chain array (see make_chain_array). This is the array version of filter_poset_positions; both filters
+    are compiled into one bitmask of allowed pcs per column, and the whole array is filtered at once.
+    :param chains: The chain array
+    :param include_filter: An optional position filter for inclusion (see filter_poset_positions)
+    :param exclude_filter: An optional position filter for exclusion (see filter_poset_positions)
+    :return: The filtered chain array
+    """
+    allowed = numpy.array(_make_position_masks(chains.shape[1], include_filter, exclude_filter), dtype=numpy.int16)
+    masks = chains.copy()
+    masks[:, ::2] = numpy.left_shift(1, chains[:, ::2])
+    return chains[~numpy.any(masks & ~allowed, axis=1)]
+
+
 def filter_poset_positions(posets: list, position_filter: list, exclude=False):
     """
     Filters a list of posets
@@ -60,9 +108,89 @@ def filter_poset_positions(posets: list, position_filter: list, exclude=False):
     return filtered
 
 
+def generate_chains_overlap(p0: pitch.PitchClass, sc_list: list, overlap: int = 1, max_2_similarity: float = 1,
+                            min_2_similarity: float = 0, max_3_similarity: float = 1, min_3_similarity: float = 0,
+                            pn=None, include_filter=None, exclude_filter=None, strong=False):
+    """
+    Generates all possible chains of pcsets in which each pair of adjacent pcsets is linked by a pivot of overlap pcs.
+    The result is a list of posets of the form
+    <pc_0 {...} {pivot_1} {...} {pivot_2} {...}>
+    With an overlap of 1, the pivots are single pcs and the chains are the "weak" chains of generate_chains_weak.
+    :param p0: The starting pitch
+    :param sc_list: The list of set-class names
+    :param overlap: The number of pcs in each pivot. No pc of a pivot may be reused in the next pivot.
+    :param max_2_similarity: The maximum adjacent similarity percentage (see generate_chains_weak)
+    :param min_2_similarity: The corresponding minimum of max_2_similarity
+    :param max_3_similarity: The maximum similarity percentage of three adjacent pcsets (see generate_chains_weak)
+    :param min_3_similarity: The corresponding minimum of max_3_similarity
+    :param pn: The ending pitch (if left as None, no ending pitch will be separated out of the last sets)
+    :param include_filter: An optional position filter for inclusion (see filter_poset_positions)
+    :param exclude_filter: An optional position filter for exclusion (see filter_poset_positions)
+    :param strong: Whether each pivot must be the complete intersection of its adjacent pcsets (see
+    generate_chains_strong)
+    :return: A list of chains, in depth-first order
+    """
+    return list(generate_chains_overlap_iter(p0, sc_list, overlap, max_2_similarity, min_2_similarity,
+                                             max_3_similarity, min_3_similarity, pn, include_filter, exclude_filter,
+                                             strong))
+
+
+def generate_chains_overlap_iter(p0: pitch.PitchClass, sc_list: list, overlap: int = 1,
+                                 max_2_similarity: float = 1, min_2_similarity: float = 0,
+                                 max_3_similarity: float = 1, min_3_similarity: float = 0, pn=None,
+                                 include_filter=None, exclude_filter=None, strong=False):
+    """
+    Generates the same chains as generate_chains_overlap, but lazily (see generate_chains_weak_iter)
+    :param p0: The starting pitch
+    :param sc_list: The list of set-class names
+    :param overlap: The number of pcs in each pivot
+    :param max_2_similarity: The maximum adjacent similarity percentage (see generate_chains_weak)
+    :param min_2_similarity: The corresponding minimum of max_2_similarity
+    :param max_3_similarity: The maximum similarity percentage of three adjacent pcsets (see generate_chains_weak)
+    :param min_3_similarity: The corresponding minimum of max_3_similarity
+    :param pn: The ending pitch (if left as None, no ending pitch will be separated out of the last sets)
+    :param include_filter: An optional position filter for inclusion (see filter_poset_positions)
+    :param exclude_filter: An optional position filter for exclusion (see filter_poset_positions)
+    :param strong: Whether each pivot must be the complete intersection of its adjacent pcsets
+    :return: A generator of chains
+    """
+    if overlap < 1:
+        raise ValueError("The overlap must be at least 1.")
+    corpora = _get_corpora(sc_list)
+    similarity = (max_2_similarity, min_2_similarity, max_3_similarity, min_3_similarity)
+    allowed = _make_position_masks(2 * len(corpora) + (pn is not None), include_filter, exclude_filter)
+    members = {}
+    for chain in _search_chains(p0.pc, corpora, similarity, None if pn is None else pn.pc, allowed, overlap, strong):
+        yield _make_chain(chain, members)
+
+
+def generate_chains_strong(p0: pitch.PitchClass, sc_list: list, overlap: int = 1, max_2_similarity: float = 1,
+                           min_2_similarity: float = 0, max_3_similarity: float = 1, min_3_similarity: float = 0,
+                           pn=None, include_filter=None, exclude_filter=None):
+    """
+    Generates all possible "strong" chains of pcsets, after Morris 1987. In a strong chain, adjacent pcsets overlap
+    completely in their pivot: the intersection of each pair of adjacent pcsets is exactly the pivot between them,
+    and it has overlap pcs. The chains have the same form as those of generate_chains_overlap.
+    :param p0: The starting pitch
+    :param sc_list: The list of set-class names
+    :param overlap: The number of pcs shared by adjacent pcsets
+    :param max_2_similarity: The maximum adjacent similarity percentage (see generate_chains_weak)
+    :param min_2_similarity: The corresponding minimum of max_2_similarity
+    :param max_3_similarity: The maximum similarity percentage of three adjacent pcsets (see generate_chains_weak)
+    :param min_3_similarity: The corresponding minimum of max_3_similarity
+    :param pn: The ending pitch (if left as None, no ending pitch will be separated out of the last sets)
+    :param include_filter: An optional position filter for inclusion (see filter_poset_positions)
+    :param exclude_filter: An optional position filter for exclusion (see filter_poset_positions)
+    :return: A list of strong chains, in depth-first order
+    """
+    return list(generate_chains_overlap_iter(p0, sc_list, overlap, max_2_similarity, min_2_similarity,
+                                             max_3_similarity, min_3_similarity, pn, include_filter, exclude_filter,
+                                             True))
+
+
 def generate_chains_weak(p0: pitch.PitchClass, sc_list: list, max_2_similarity: float = 0.4,
                          min_2_similarity: float = 0, max_3_similarity: float = 1, min_3_similarity: float = 0,
-                         pn=None):
+                         pn=None, include_filter=None, exclude_filter=None):
     """
     Generates all possible "weak" chains of pcsets that match the specified input criteria. The result is a list of
     posets of the form
@@ -84,81 +212,602 @@ def generate_chains_weak(p0: pitch.PitchClass, sc_list: list, max_2_similarity:
     which imposes no similarity restrictions.
     :param min_3_similarity: The corresponding minimum of max_3_similarity
     :param pn: The ending pitch (if left as None, no ending pitch will be separated out of the last sets)
-    :return: A list of weak chains. The list will be empty if it was impossible to generate any chains matching the
-    provided specifications.
-    """
-    chain_build = []   # The chains will be stored here
-    chain_build2 = []      # (a temporary storage place for chains)
-    sc = pcset.SetClass()  # The set-class object for pcset generation
-
-    # Consider the first pcset and initialize the chains
-    sc.load_from_name(sc_list[0])
-    corpus = pcset.get_corpus(sc.pcset)
-
-    # If a pcset in the corpus matches the starting pc, we can use that pcset to start a chain.
-    for frozen_pcset in corpus:
-        pcset2 = set(frozen_pcset)
-        if p0 in pcset2:
-            pcset2.remove(p0)
-            chain_build.append([p0, pcset2])
-
-    # Continue building chains in the same manner as before
-    for i in range(1, len(sc_list)):
-        sc.load_from_name(sc_list[i])
-        corpus = pcset.get_corpus(sc.pcset)
-        for frozen_pcset in corpus:
-            pcset2 = set(frozen_pcset)
-            # Now we need to look at each chain we already have
-            for j in range(len(chain_build)):
-                # Temporarily reconstruct the previous set
-                tempset = set(chain_build[j][len(chain_build[j]) - 1])
-                tempset.add(chain_build[j][len(chain_build[j]) - 2])
-
-                # Calculate the similarity of the last set with the current one (sim2)
-                intersect = tempset.intersection(pcset2)
-                sim2 = len(intersect) / len(pcset2)
-
-                # Calculate the similarity of the last two sets with the current one (sim3)
+    :param include_filter: An optional position filter for inclusion, in the format of filter_poset_positions.
+    The filter is applied while the chains are built, so it gives the same result as filtering afterward.
+    :param exclude_filter: An optional position filter for exclusion, in the format of filter_poset_positions
+    :return: A list of weak chains, in depth-first order. The list will be empty if it was impossible to generate any
+    chains matching the provided specifications.
+    """
+    return list(generate_chains_weak_iter(p0, sc_list, max_2_similarity, min_2_similarity, max_3_similarity,
+                                          min_3_similarity, pn, include_filter, exclude_filter))
+
+
+def generate_chains_weak_array(p0: pitch.PitchClass, sc_list: list, max_2_similarity: float = 0.4,
+                               min_2_similarity: float = 0, max_3_similarity: float = 1, min_3_similarity: float = 0,
+                               pn=None, include_filter=None, exclude_filter=None):
+    """
+    Generates the same "weak" chains as generate_chains_weak, as a chain array (see make_chain_array). No PitchClass
+    objects or sets are made along the way.
+    :param p0: The starting pitch
+    :param sc_list: The list of set-class names
+    :param max_2_similarity: The maximum adjacent similarity percentage (see generate_chains_weak)
+    :param min_2_similarity: The corresponding minimum of max_2_similarity
+    :param max_3_similarity: The maximum similarity percentage of three adjacent pcsets (see generate_chains_weak)
+    :param min_3_similarity: The corresponding minimum of max_3_similarity
+    :param pn: The ending pitch (if left as None, no ending pitch will be separated out of the last sets)
+    :param include_filter: An optional position filter for inclusion (see filter_poset_positions)
+    :param exclude_filter: An optional position filter for exclusion (see filter_poset_positions)
+    :return: The chain array
+    """
+    corpora = _get_corpora(sc_list)
+    similarity = (max_2_similarity, min_2_similarity, max_3_similarity, min_3_similarity)
+    length = 2 * len(corpora) + (pn is not None)
+    allowed = _make_position_masks(length, include_filter, exclude_filter)
+    chains = _search_chains(p0.pc, corpora, similarity, None if pn is None else pn.pc, allowed)
+    return _make_chain_array_from_masks(list(chains), length)
+
+
+def generate_chains_weak_iter(p0: pitch.PitchClass, sc_list: list, max_2_similarity: float = 0.4,
+                              min_2_similarity: float = 0, max_3_similarity: float = 1, min_3_similarity: float = 0,
+                              pn=None, include_filter=None, exclude_filter=None):
+    """
+    Generates the same "weak" chains as generate_chains_weak, but lazily. The chains are built depth-first, so
+    partial chains share their prefixes and only one partial chain exists at a time. Memory grows with the
+    length of the chains, not with the number of chains. The position filters, the similarity bounds and the ending
+    pitch are all checked as each pcset is added, so branches that cannot produce a valid chain are cut as early as
+    possible.
+    :param p0: The starting pitch
+    :param sc_list: The list of set-class names
+    :param max_2_similarity: The maximum adjacent similarity percentage (see generate_chains_weak)
+    :param min_2_similarity: The corresponding minimum of max_2_similarity
+    :param max_3_similarity: The maximum similarity percentage of three adjacent pcsets (see generate_chains_weak)
+    :param min_3_similarity: The corresponding minimum of max_3_similarity
+    :param pn: The ending pitch (if left as None, no ending pitch will be separated out of the last sets)
+    :param include_filter: An optional position filter for inclusion (see filter_poset_positions)
+    :param exclude_filter: An optional position filter for exclusion (see filter_poset_positions)
+    :return: A generator of weak chains
+    """
+    corpora = _get_corpora(sc_list)
+    similarity = (max_2_similarity, min_2_similarity, max_3_similarity, min_3_similarity)
+    allowed = _make_position_masks(2 * len(corpora) + (pn is not None), include_filter, exclude_filter)
+    members = {}  # The pcs of each bitmask, so that chains can share PitchClass objects like they used to
+    for chain in _search_chains(p0.pc, corpora, similarity, None if pn is None else pn.pc, allowed):
+        yield _make_chain(chain, members)
+
+
+def generate_chains_weak_parallel(p0, sc_lists: list, max_2_similarity: float = 0.4, min_2_similarity: float = 0,
+                                  max_3_similarity: float = 1, min_3_similarity: float = 0, pn=None,
+                                  include_filter=None, exclude_filter=None, processes=None, deduplicate=False,
+                                  sort=False):
+    """
+    Generates weak chains for several set-class orderings and starting pitches across a process pool. The search is
+    partitioned by ordering, starting pitch and first two pcsets, so that each worker only holds the chains of one
+    small partition at a time. The chains of each partition are converted as they arrive, in order, so the result is
+    identical to calling generate_chains_weak for each ordering and each starting pitch in turn and concatenating the
+    results.
+    Since this function starts worker processes, scripts that call it should do so under
+    if __name__ == "__main__".
+    :param p0: The starting pitch, or a list of starting pitches
+    :param sc_lists: A list of set-class name lists (orderings)
+    :param max_2_similarity: The maximum adjacent similarity percentage (see generate_chains_weak)
+    :param min_2_similarity: The corresponding minimum of max_2_similarity
+    :param max_3_similarity: The maximum similarity percentage of three adjacent pcsets (see generate_chains_weak)
+    :param min_3_similarity: The corresponding minimum of max_3_similarity
+    :param pn: The ending pitch (if left as None, no ending pitch will be separated out of the last sets)
+    :param include_filter: An optional position filter for inclusion (see filter_poset_positions)
+    :param exclude_filter: An optional position filter for exclusion (see filter_poset_positions)
+    :param processes: The number of worker processes (if None, the number of CPUs is used)
+    :param deduplicate: Whether to drop chains that have already been generated
+    :param sort: Whether to sort the chains by their pcs
+    :return: A list of weak chains
+    """
+    p0s = list(p0) if type(p0) == list else [p0]
+    similarity = (max_2_similarity, min_2_similarity, max_3_similarity, min_3_similarity)
+    partitions = []
+    for sc_list in sc_lists:
+        corpora = _get_corpora(sc_list)
+        allowed = _make_position_masks(2 * len(corpora) + (pn is not None), include_filter, exclude_filter)
+        for p in p0s:
+            for mask in corpora[0]:
+                if mask & (1 << p.pc):
+                    # The successors of each pcset are searched in corpus order, so splitting by the second pcset
+                    # keeps the chains in the same order.
+                    for heads in ([[[mask], [mask2]] for mask2 in corpora[1]] if len(corpora) > 1 else [[[mask]]]):
+                        partitions.append((p.pc, heads + corpora[len(heads):], similarity,
+                                           None if pn is None else pn.pc, allowed))
+
+    chains = []
+    keys = []  # The sort keys of the chains, if sorting
+    seen = set()  # The chains in bitmask form that have been generated, if deduplicating
+    members = {}
+    with multiprocessing.Pool(processes) as pool:
+        for partition in pool.imap(_search_partition, partitions):
+            for masks in partition:
+                if deduplicate:
+                    if masks in seen:
+                        continue
+                    seen.add(masks)
+                if sort:
+                    keys.append(_get_chain_sort_key(masks))
+                chains.append(_make_chain(masks, members))
+    if sort:
+        chains = [chains[i] for i in sorted(range(len(chains)), key=keys.__getitem__)]
+    return chains
+
+
+def make_chain_array(chains: list):
+    """
+    Makes a chain array from a list of chains. Each row is a chain. The even columns hold the pcs as integers, and
+    the odd columns hold the unordered pcsets as 12-bit masks.
+    :param chains: A list of chains (all of the same length)
+    :return: The chain array (an int16 ndarray)
+    """
+    if len(chains) == 0:
+        return numpy.zeros((0, 0), dtype=numpy.int16)
+    masks = []
+    for chain in chains:
+        masks.append(tuple(1 << item.pc if i % 2 == 0 else pcset.make_bitmask(item) for i, item in enumerate(chain)))
+    return _make_chain_array_from_masks(masks, len(chains[0]))
+
+
+def make_chains_from_array(chains: numpy.ndarray):
+    """
+    Makes a list of chains from a chain array (see make_chain_array)
+    :param chains: The chain array
+    :return: A list of chains
+    """
+    masks = numpy.array(chains, dtype=numpy.int64)
+    masks[:, ::2] = numpy.left_shift(1, masks[:, ::2])
+    members = {}
+    return [_make_chain(tuple(row), members) for row in masks.tolist()]
+
+
+def _count_chains(p0: int, corpora: list, similarity: tuple, pn=None, allowed=None, overlap: int = 1,
+                  strong: bool = False):
+    """
+    Counts weak chains by dynamic programming. This follows the same rules as _search_chains.
+    :param p0: The starting pc
+    :param corpora: The corpus of each position in the chain, as lists of bitmasks
+    :param similarity: A tuple (max_2_similarity, min_2_similarity, max_3_similarity, min_3_similarity)
+    :param pn: The ending pc (or None)
+    :param allowed: The allowed pcs for each position in the chain, as bitmasks (see _make_position_masks)
+    :param overlap: The number of pcs in each pivot after the first
+    :param strong: Whether the pivots must be the complete intersections of adjacent pcsets
+    :return: A dictionary of (starting pcset bitmask, number of chains) pairs
+    """
+    max_3_similarity, min_3_similarity = similarity[2:]
+    last = len(corpora) - 1
+    p0 = 1 << p0
+    pn = None if pn is None else 1 << pn
+    if allowed is None:
+        allowed = [0xFFF for i in range(2 * len(corpora) + (pn is not None))]
+    corpora, adjacency = _prepare_search(p0, corpora, similarity, pn, allowed, overlap, strong)
+    memo = [{} for i in range(len(corpora))]  # The number of completions of each state, for each position
+
+    def count(i, pivot, mask, previous, residual):
+        # Counts the ways to complete a chain whose pcset i is mask with the given pivot
+        if i == last:
+            return 1
+        state = (pivot, mask, previous)
+        if state not in memo[i]:
+            total = 0
+            for mask2, options in adjacency[i][mask]:
+                # Calculate the similarity of the last two sets with the next one (sim3)
                 sim3 = min_3_similarity
-                if len(chain_build[j]) >= 4:
-                    tempset2 = set(chain_build[j][len(chain_build[j]) - 3])
-                    tempset2.add(chain_build[j][len(chain_build[j]) - 4])
-                    tempset2.add(chain_build[j][len(chain_build[j]) - 2])
-                    union1 = tempset.union(tempset2)
-                    intersect2 = union1.intersection(pcset2)
-                    sim3 = len(intersect2) / len(pcset2)
-
-                # If the similarity conditions are satisfied, we can continue building the chains
-                if max_2_similarity >= sim2 >= min_2_similarity and max_3_similarity >= sim3 >= min_3_similarity:
-                    # We consider each pc that can be used as an intersection point
-                    for pc in intersect:
-                        # We cannot use the same pc as an intersection point twice in a row.
-                        if pc != chain_build[j][len(chain_build[j]) - 2]:
-                            new_chain = []
-                            # Unfortunately we need to manually copy the data structures to avoid disaster
-                            for item in chain_build[j]:
-                                if type(item) == set:
-                                    new_chain.append(set(item))
-                                else:
-                                    new_chain.append(item)
-                            new_chain.append(pc)
-                            new_chain.append(set(pcset2))
-                            # Remove the intersecting pc from its surrounding sets
-                            new_chain[len(new_chain) - 3].remove(pc)
-                            new_chain[len(new_chain) - 1].remove(pc)
-                            chain_build2.append(new_chain)
-
-        # Clear out the previous generation of chains and add in the new chains
-        chain_build = chain_build2
-        chain_build2 = []
-
-    # If the last pitch is specified, we need to separate it out and prune the chains that don't have it.
+                if i >= 1:
+                    sim3 = ((previous | mask) & mask2).bit_count() / mask2.bit_count()
+                if not max_3_similarity >= sim3 >= min_3_similarity:
+                    continue
+                for pivot2 in options:
+                    if pivot2 & pivot or pivot2 & ~allowed[2 * i + 2] or residual & ~pivot2:
+                        continue
+                    residual2 = _get_residual(mask2 & ~pivot2, i + 1, last, allowed, pn, overlap)
+                    if residual2 is not None:
+                        total += count(i + 1, pivot2, mask2, mask, residual2)
+            memo[i][state] = total
+        return memo[i][state]
+
+    counts = {}
+    for mask in corpora[0]:
+        residual = _get_residual(mask & ~p0, 0, last, allowed, pn, overlap)
+        counts[mask] = 0 if residual is None else count(0, p0, mask, 0, residual)
+    return counts
+
+
+def _get_chain_sort_key(masks: tuple):
+    """
+    Gets a sort key for a chain in bitmask form, which orders chains by their pcs
+    :param masks: The chain as a tuple of bitmasks
+    :return: The sort key
+    """
+    return tuple(masks[i].bit_length() - 1 if i % 2 == 0 else tuple(pc for pc in range(12) if masks[i] >> pc & 1)
+                 for i in range(len(masks)))
+
+
+def _get_corpora(sc_list: list):
+    """
+    Gets the corpus of each set-class in a list, as sorted lists of bitmasks
+    :param sc_list: The list of set-class names
+    :return: A list of corpora
+    """
+    sc = pcset.SetClass()
+    corpora = []
+    for name in sc_list:
+        sc.load_from_name(name)
+        corpora.append(sorted([pcset.make_bitmask(pcset2) for pcset2 in pcset.get_corpus(sc.pcset)]))
+    return corpora
+
+
+def _get_residual(free: int, i: int, last: int, allowed: list, pn=None, overlap: int = 1):
+    """
+    Checks the free part of a pcset in a chain after its pivot has been chosen. A pc that is not allowed in the free
+    part can only be saved by becoming part of the next pivot, so there can be at most overlap of them.
+    :param free: The pcset without its pivot, as a bitmask
+    :param i: The index of the pcset in the chain
+    :param last: The index of the last pcset in the chain
+    :param allowed: The allowed pcs for each position in the chain, as bitmasks
+    :param pn: The ending pc, as a bitmask (or None)
+    :param overlap: The number of pcs in each pivot after the first
+    :return: The bitmask of the pcs that must be in the next pivot (or 0), or None if the pcset cannot be used
+    """
+    if i == last:
+        if pn is not None:
+            if not free & pn:
+                return None
+            free &= ~pn
+        return None if free & ~allowed[2 * i + 1] else 0
+    residual = free & ~allowed[2 * i + 1]
+    return residual if residual.bit_count() <= overlap else None
+
+
+def _make_adjacency(corpus1: list, corpus2: list, max_2_similarity: float, min_2_similarity: float,
+                    overlap: int = 1, strong: bool = False):
+    """
+    Precomputes which members of corpus2 may follow each member of corpus1 in a chain, and which pivots may link
+    them, so that each step of a search is a table lookup
+    :param corpus1: A corpus of bitmasks
+    :param corpus2: The corpus of bitmasks for the next position in the chain
+    :param max_2_similarity: The maximum adjacent similarity percentage
+    :param min_2_similarity: The minimum adjacent similarity percentage
+    :param overlap: The number of pcs in each pivot
+    :param strong: Whether the pivot must be the complete intersection
+    :return: A dictionary in which the members of corpus1 are the keys, and lists of (member of corpus2, pivots)
+    tuples are the values. The pivots are bitmasks in ascending order.
+    """
+    adjacency = {}
+    for mask1 in corpus1:
+        adjacency[mask1] = []
+        for mask2 in corpus2:
+            intersection = mask1 & mask2
+            size = intersection.bit_count()
+            if size < overlap or (strong and size > overlap):
+                continue
+            if max_2_similarity >= size / mask2.bit_count() >= min_2_similarity:
+                pcs = [1 << pc for pc in range(12) if intersection >> pc & 1]
+                pivots = tuple(sum(pivot) for pivot in itertools.combinations(pcs, overlap))
+                adjacency[mask1].append((mask2, pivots))
+    return adjacency
+
+
+def _make_chain(masks: tuple, members: dict):
+    """
+    Makes a chain from its bitmask representation
+    :param masks: A tuple of bitmasks. Even indices hold the pivots, and odd indices hold pcsets. A pivot with more than
+    one pc becomes a pcset.
+    :param members: A cache of the pcs of each bitmask that has been converted so far
+    :return: A chain
+    """
+    chain = []
+    for i in range(len(masks)):
+        if masks[i] not in members:
+            members[masks[i]] = tuple(pcset.make_pcset_from_bitmask(masks[i]))
+        if i % 2 or masks[i].bit_count() > 1:
+            chain.append(set(members[masks[i]]))
+        else:
+            chain.append(members[masks[i]][0])
+    return chain
+
+
+def _make_chain_array_from_masks(chains: list, length: int):
+    """
+    Makes a chain array from chains in bitmask form
+    :param chains: A list of chains as tuples of bitmasks
+    :param length: The length of the chains
+    :return: The chain array
+    """
+    array = numpy.array(chains, dtype=numpy.int16).reshape((len(chains), length))
+    if len(chains) > 0:
+        array[:, ::2] = numpy.log2(array[:, ::2]).astype(numpy.int16)
+    return array
+
+
+def _make_position_masks(length: int, include_filter=None, exclude_filter=None):
+    """
+    Combines inclusion and exclusion position filters into one bitmask of allowed pcs for each position
+    :param length: The length of the posets
+    :param include_filter: A position filter for inclusion (or None)
+    :param exclude_filter: A position filter for exclusion (or None)
+    :return: A list of bitmasks. A pc (or every pc in a pcset) at a position must be in the bitmask for that position.
+    """
+    allowed = [0xFFF for i in range(length)]
+    for position_filter, exclude in ((include_filter, False), (exclude_filter, True)):
+        if position_filter is not None:
+            if len(position_filter) != length:
+                raise ValueError(f"The position filter must have length {length}.")
+            for i in range(length):
+                if position_filter[i] is not None:
+                    mask = pcset.make_bitmask(position_filter[i])
+                    allowed[i] &= ~mask if exclude else mask
+    return allowed
+
+
+def _prepare_search(p0: int, corpora: list, similarity: tuple, pn, allowed: list, overlap: int = 1,
+                    strong: bool = False):
+    """
+    Restricts the corpora to the pcsets that can appear in a chain, and builds the adjacency tables for a search
+    :param p0: The starting pc, as a bitmask
+    :param corpora: The corpus of each position in the chain, as lists of bitmasks
+    :param similarity: A tuple (max_2_similarity, min_2_similarity, max_3_similarity, min_3_similarity)
+    :param pn: The ending pc, as a bitmask (or None)
+    :param allowed: The allowed pcs for each position in the chain, as bitmasks
+    :param overlap: The number of pcs in each pivot after the first
+    :param strong: Whether the pivots must be the complete intersections of adjacent pcsets
+    :return: The restricted corpora and the adjacency tables
+    """
+    # The first pcset must contain the starting pc, and the last pcset must contain the ending pc.
+    corpora = list(corpora)
+    corpora[0] = [mask for mask in corpora[0] if mask & p0]
     if pn is not None:
-        for chain in chain_build:
-            if pn in chain[len(chain) - 1]:
-                chain.append(pn)
-                chain[len(chain) - 2].remove(pn)
-                chain_build2.append(chain)
-        return chain_build2
-
-    return chain_build
+        corpora[-1] = [mask for mask in corpora[-1] if mask & pn]
+    if not p0 & allowed[0] or (pn is not None and not pn & allowed[-1]):
+        corpora[0] = []
+    adjacency = [_make_adjacency(corpora[i - 1], corpora[i], similarity[0], similarity[1], overlap, strong)
+                 for i in range(1, len(corpora))]
+
+    # Remove the pcsets that have no possible successor, working backward from the end of the chain
+    for i in range(len(adjacency) - 2, -1, -1):
+        for mask in adjacency[i]:
+            adjacency[i][mask] = [item for item in adjacency[i][mask] if adjacency[i + 1][item[0]]]
+    return corpora, adjacency
+
+
+def _search_partition(args: tuple):
+    """
+    Searches one partition of a parallel chain search. This runs in a worker process.
+    :param args: The arguments for _search_chains
+    :return: A list of chains as tuples of bitmasks
+    """
+    return list(_search_chains(*args))
+
+
+def _search_chains(p0: int, corpora: list, similarity: tuple, pn=None, allowed=None, overlap: int = 1,
+                   strong: bool = False):
+    """
+    Searches depth-first for weak chains. Pivots and pcsets are handled as bitmasks.
+    :param p0: The starting pc
+    :param corpora: The corpus of each position in the chain, as lists of bitmasks
+    :param similarity: A tuple (max_2_similarity, min_2_similarity, max_3_similarity, min_3_similarity)
+    :param pn: The ending pc (or None)
+    :param allowed: The allowed pcs for each position in the chain, as bitmasks (see _make_position_masks)
+    :param overlap: The number of pcs in each pivot after the first
+    :param strong: Whether the pivots must be the complete intersections of adjacent pcsets
+    :return: A generator of chains as tuples of bitmasks. Even indices hold the pivots and odd indices hold the pcsets
+    with the pivots removed. If pn is specified, it is the last item.
+    """
+    max_3_similarity, min_3_similarity = similarity[2:]
+    last = len(corpora) - 1
+    p0 = 1 << p0
+    pn = None if pn is None else 1 << pn
+    if allowed is None:
+        allowed = [0xFFF for i in range(2 * len(corpora) + (pn is not None))]
+    corpora, adjacency = _prepare_search(p0, corpora, similarity, pn, allowed, overlap, strong)
+
+    pivots = [0 for i in range(len(corpora))]     # The pivot that begins each pcset
+    sets = [0 for i in range(len(corpora))]       # The complete pcsets
+    residuals = [0 for i in range(len(corpora))]  # The pcs of each pcset that are not allowed in its free part
+
+    def finish():
+        chain = []
+        for j in range(last):
+            chain.append(pivots[j])
+            chain.append(sets[j] & ~pivots[j] & ~pivots[j + 1])
+        chain.append(pivots[last])
+        chain.append(sets[last] & ~pivots[last])
+        if pn is not None:
+            chain[-1] &= ~pn
+            chain.append(pn)
+        return tuple(chain)
+
+    def place(i):
+        residual = _get_residual(sets[i] & ~pivots[i], i, last, allowed, pn, overlap)
+        if residual is None:
+            return False
+        residuals[i] = residual
+        return True
+
+    def extend(i):
+        for mask, options in adjacency[i - 1][sets[i - 1]]:
+            # Calculate the similarity of the last two sets with the current one (sim3)
+            sim3 = min_3_similarity
+            if i >= 2:
+                sim3 = ((sets[i - 2] | sets[i - 1]) & mask).bit_count() / mask.bit_count()
+            if not max_3_similarity >= sim3 >= min_3_similarity:
+                continue
+            sets[i] = mask
+
+            for pivot in options:
+                # We cannot use the same pc as an intersection point twice in a row.
+                if pivot & pivots[i - 1] or pivot & ~allowed[2 * i] or residuals[i - 1] & ~pivot:
+                    continue
+                pivots[i] = pivot
+                if place(i):
+                    if i < last:
+                        yield from extend(i + 1)
+                    else:
+                        yield finish()
+
+    pivots[0] = p0
+    for mask in corpora[0]:
+        sets[0] = mask
+        if place(0):
+            if last > 0:
+                yield from extend(1)
+            else:
+                yield finish()
+
+
+class Poset:
+    """
+    Represents a partially ordered set of pcs. A pc may occur more than once, so the order is defined over the
+    positions of a list of pcs. The linear extensions of the poset are the pcsegs that respect the order.
+    """
+    def __init__(self, elements=None, relations=None):
+        """
+        Creates a Poset
+        :param elements: A list of PitchClasses
+        :param relations: A list of (i, j) tuples, each meaning that element i comes before element j
+        """
+        self._elements = []
+        self._predecessors = []
+        self._full = 0     # The downset that contains every element
+        self._counts = {0: 1}  # The number of completions of each downset
+        if elements is not None:
+            self.load_poset(elements, relations)
+
+    def __len__(self):
+        return len(self._elements)
+
+    def __repr__(self):
+        return "<pctheory.poset.Poset object at " + str(id(self)) + ">: " + str(self._elements)
+
+    @property
+    def elements(self):
+        """
+        Gets the elements of the poset
+        :return: The elements
+        """
+        return self._elements
+
+    @property
+    def predecessors(self):
+        """
+        Gets the immediate predecessors of each element, as bitmasks over the element indices
+        :return: The predecessors
+        """
+        return self._predecessors
+
+    @staticmethod
+    def from_chain(chain: list):
+        """
+        Makes a Poset from a chain (or any poset in list form, such as those of generate_chains_weak). Each item of the
+        chain is either a pc or an unordered pcset, and everything in an item comes before everything in the next item.
+        :param chain: The chain
+        :return: The Poset
+        """
+        elements = []
+        relations = []
+        previous = []
+        for item in chain:
+            current = []
+            for pc in (sorted(item) if type(item) in (set, frozenset) else [item]):
+                current.append(len(elements))
+                elements.append(pc)
+            relations += [(i, j) for i in previous for j in current]
+            if len(current) > 0:
+                previous = current
+        return Poset(elements, relations)
+
+    def count_linear_extensions(self):
+        """
+        Counts the linear extensions of the poset. The count is made by dynamic programming over the downsets of the
+        poset (stored as bitmasks), so it is practical for posets with far more extensions than could be listed.
+        :return: The number of linear extensions
+        """
+        return self._count(0)
+
+    def get_linear_extensions(self):
+        """
+        Generates the linear extensions of the poset lazily, in lexicographic order of element index
+        :return: A generator of pcsegs
+        """
+        extension = []
+
+        def extend(downset):
+            if downset == self._full:
+                yield list(extension)
+            for i in self._get_available(downset):
+                extension.append(self._elements[i])
+                yield from extend(downset | 1 << i)
+                extension.pop()
+
+        if self._count(0) > 0:
+            yield from extend(0)
+
+    def load_poset(self, elements: list, relations=None):
+        """
+        Loads a poset
+        :param elements: A list of PitchClasses
+        :param relations: A list of (i, j) tuples, each meaning that element i comes before element j
+        """
+        predecessors = [0 for i in range(len(elements))]
+        for i, j in (relations if relations is not None else []):
+            if not (0 <= i < len(elements) and 0 <= j < len(elements)) or i == j:
+                raise ValueError(f"Invalid relation ({i}, {j}).")
+            predecessors[j] |= 1 << i
+
+        # Make sure that the relations are acyclic by removing minimal elements until none are left
+        remaining = (1 << len(elements)) - 1
+        while remaining:
+            minimal = [i for i in range(len(elements)) if remaining >> i & 1 and not predecessors[i] & remaining]
+            if len(minimal) == 0:
+                raise ValueError("The relations contain a cycle.")
+            for i in minimal:
+                remaining &= ~(1 << i)
+
+        self._elements = list(elements)
+        self._predecessors = predecessors
+        self._full = (1 << len(elements)) - 1
+        self._counts = {self._full: 1}
+
+    def sample_linear_extensions(self, n: int, seed=None):
+        """
+        Samples linear extensions of the poset uniformly at random. Each element is chosen with probability
+        proportional to the number of extensions that remain after choosing it, so every extension is equally likely.
+        :param n: The number of extensions to sample
+        :param seed: A seed for the random generator (if None, fresh entropy is used)
+        :return: A list of pcsegs
+        """
+        generator = random.Random(seed)
+        extensions = []
+        for k in range(n):
+            downset = 0
+            extension = []
+            while downset != self._full:
+                r = generator.randrange(self._count(downset))
+                for i in self._get_available(downset):
+                    r -= self._count(downset | 1 << i)
+                    if r < 0:
+                        break
+                extension.append(self._elements[i])
+                downset |= 1 << i
+            extensions.append(extension)
+        return extensions
+
+    def _count(self, downset: int):
+        """
+        Counts the ways to complete a linear extension that begins with a downset
+        :param downset: The downset, as a bitmask over the element indices
+        :return: The number of completions
+        """
+        if downset not in self._counts:
+            self._counts[downset] = sum(self._count(downset | 1 << i) for i in self._get_available(downset))
+        return self._counts[downset]
+
+    def _get_available(self, downset: int):
+        """
+        Gets the elements that can come next after a downset
+        :param downset: The downset, as a bitmask over the element indices
+        :return: A list of element indices
+        """
+        return [i for i in range(len(self._elements))
+                if not downset >> i & 1 and self._predecessors[i] & ~downset == 0]
@@ -23,6 +23,7 @@ along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 from enum import Enum
 from pctheory import pitch
+import numpy
 
 
 class OperatorType(Enum):
@@ -39,6 +40,147 @@ class OperatorType(Enum):
     TnM7 = 8
 
 
+class OrderOperator:
+    """
+    Represents an order operator as an array of order positions. Objects of this class are subscriptable.
+    [i] is the order position of the original pcseg that moves to order position i. Composing order operators only
+    composes their position arrays, so a chain of order operations touches the pcseg data once, when the composed
+    operator is applied. Operators are composed like TTOs: (a * b) performs b first, then a.
+    """
+    def __init__(self, positions=None):
+        """
+        Creates an OrderOperator
+        :param positions: The order positions (if None, the identity operator of length 12 is created)
+        """
+        self._positions = numpy.arange(12) if positions is None else numpy.array(positions, dtype=numpy.intp)
+        self._positions.flags.writeable = False
+
+    def __eq__(self, other):
+        return numpy.array_equal(self._positions, other.positions)
+
+    def __getitem__(self, item):
+        return int(self._positions[item])
+
+    def __hash__(self):
+        return hash(tuple(self._positions.tolist()))
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __mul__(self, other):
+        return OrderOperator(other.positions[self._positions])
+
+    def __ne__(self, other):
+        return not numpy.array_equal(self._positions, other.positions)
+
+    def __repr__(self):
+        return "<pctheory.transformations.OrderOperator object at " + str(id(self)) + ">: " + \
+               str(self._positions.tolist())
+
+    def __str__(self):
+        return str(self._positions.tolist())
+
+    @property
+    def is_permutation(self):
+        """
+        Whether or not the operator is a permutation of order positions. Order multiplication by a multiplier that is
+        not coprime to the length of the pcseg is not a permutation.
+        :return: A boolean
+        """
+        return len(numpy.unique(self._positions)) == len(self._positions)
+
+    @property
+    def positions(self):
+        """
+        Gets the order positions
+        :return: A read-only array of order positions
+        """
+        return self._positions
+
+    @staticmethod
+    def from_rows(row1: list, row2: list):
+        """
+        Creates the order operator that maps row1 onto row2 (the ORMAP of row2 with respect to row1)
+        :param row1: A row
+        :param row2: A row containing the same pcs as row1
+        :return: An OrderOperator
+        """
+        omap = {}
+        for i in range(len(row1)):
+            omap[row1[i].pc] = i
+        return OrderOperator([omap[pc.pc] for pc in row2])
+
+    @staticmethod
+    def multiplication(length: int, n: int):
+        """
+        Creates an order multiplication operator (see pcseg.multiply_order)
+        :param length: The length of the pcsegs to transform
+        :param n: The multiplier
+        :return: An OrderOperator
+        """
+        return OrderOperator((numpy.arange(length) * n) % length)
+
+    @staticmethod
+    def retrograde(length: int):
+        """
+        Creates a retrograde operator (see pcseg.retrograde)
+        :param length: The length of the pcsegs to transform
+        :return: An OrderOperator
+        """
+        return OrderOperator(numpy.arange(length - 1, -1, -1))
+
+    @staticmethod
+    def rotation(length: int, n: int):
+        """
+        Creates a rotation operator (see pcseg.rotate)
+        :param length: The length of the pcsegs to transform
+        :param n: The index of rotation
+        :return: An OrderOperator
+        """
+        return OrderOperator((numpy.arange(length) - n) % length)
+
+    def cycles(self):
+        """
+        Gets the cycles of the operator
+        :return: The cycles, as a list of lists of order positions
+        """
+        if not self.is_permutation:
+            raise ValueError("Only permutations have a cycle decomposition")
+        visited = numpy.zeros(len(self._positions), dtype=bool)
+        cycles = []
+        for i in range(len(self._positions)):
+            if not visited[i]:
+                cycle = [i]
+                visited[i] = True
+                j = int(self._positions[i])
+                while j != i:
+                    cycle.append(j)
+                    visited[j] = True
+                    j = int(self._positions[j])
+                cycles.append(cycle)
+        return cycles
+
+    def inverse(self):
+        """
+        Gets the inverse of the operator
+        :return: The inverse
+        """
+        if not self.is_permutation:
+            raise ValueError("Only permutations have an inverse")
+        return OrderOperator(numpy.argsort(self._positions))
+
+    def transform(self, item):
+        """
+        Transforms a pcseg, or a batch of pcsegs stored as an array with the order positions on the last axis
+        :param item: A pcseg or an array of pcsegs
+        :return: The transformed item
+        """
+        if type(item) == list:
+            return [pitch.PitchClass(item[i].pc) for i in self._positions]
+        else:
+            return numpy.asarray(item)[..., self._positions]
+
+
 class RO:
     """
     Represents a row operator (RO). Objects of this class are subscriptable.
@@ -384,6 +526,28 @@ def left_multiply_ttos(*args):
         return TTO(m % 12, n % 12)
 
 
+def left_multiply_order_operators(*args):
+    """
+    Left-multiplies a list of OrderOperators
+    :param args: A collection of OrderOperators (can be one argument as a list, or multiple OrderOperators separated
+    by commas. The highest index is evaluated first, and the lowest index is evaluated last.
+    :return: The result
+    """
+    operators = args
+
+    # If the user provided a list object
+    if len(args) == 1:
+        if type(args[0]) == list:
+            operators = args[0]
+
+    if len(operators) == 0:
+        return None
+    positions = operators[len(operators) - 1].positions
+    for i in range(len(operators) - 2, -1, -1):
+        positions = positions[operators[i].positions]
+    return OrderOperator(positions)
+
+
 def make_tto_list(*args):
     """
     Makes a TTO list
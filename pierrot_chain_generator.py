@@ -41,32 +41,31 @@ sc_lists = [
 
 # chains = poset.generate_chains_weak(pc[2], sc_lists[0][2], 0.25, 0.25, 0.75, 0.5, pc[6])
 # chains = poset.generate_chains_weak(pc[1], sc_lists[1][1], 0.4, 0.4, 0.8, 0.6, pc[7])
-chains = poset.generate_chains_weak(pc[5], sc_lists[2][1], 0.5, 0.5, 0.9, 0.5, pc[11])
-
 # Filter exclusively
-chains = poset.filter_poset_positions(chains,
-                                      [None,
-                                       None, # pcset.make_pcset(11, 9, 10, 3),
-                                       None, # pcset.make_pcset(6),
-                                       None, # pcset.make_pcset(8, 11, 3, 6),
-                                       None, # pcset.make_pcset(8),
-                                       None, # pcset.make_pcset(3, 4, 5, 7),
-                                       None, # pcset.make_pcset(4),
-                                       None, # pcset.make_pcset(4, 5, 6, 11),
-                                       None],
-                                       True)
+exclude_filter = [None,
+                  None, # pcset.make_pcset(11, 9, 10, 3),
+                  None, # pcset.make_pcset(6),
+                  None, # pcset.make_pcset(8, 11, 3, 6),
+                  None, # pcset.make_pcset(8),
+                  None, # pcset.make_pcset(3, 4, 5, 7),
+                  None, # pcset.make_pcset(4),
+                  None, # pcset.make_pcset(4, 5, 6, 11),
+                  None]
 
 # Filter inclusively
-chains = poset.filter_poset_positions(chains,
-                                      [None,
-                                       None, # pcset.make_pcset(0, 1, 4, 6, 7, 8, 10),
-                                       pcset.make_pcset(7),
-                                       None, # pcset.make_pcset(2, 4, 5, 6, 7, 10, 11),
-                                       pcset.make_pcset(4),
-                                       None, # pcset.make_pcset(0, 1, 2, 3, 4, 6, 9),
-                                       pcset.make_pcset(2),
-                                       None, # pcset.make_pcset(1, 3, 5, 6, 7, 10, 11),
-                                       None])
+include_filter = [None,
+                  None, # pcset.make_pcset(0, 1, 4, 6, 7, 8, 10),
+                  pcset.make_pcset(7),
+                  None, # pcset.make_pcset(2, 4, 5, 6, 7, 10, 11),
+                  pcset.make_pcset(4),
+                  None, # pcset.make_pcset(0, 1, 2, 3, 4, 6, 9),
+                  pcset.make_pcset(2),
+                  None, # pcset.make_pcset(1, 3, 5, 6, 7, 10, 11),
+                  None]
+
+# The filters are applied while the chains are generated
+chains = poset.generate_chains_weak(pc[5], sc_lists[2][1], 0.5, 0.5, 0.9, 0.5, pc[11],
+                                    include_filter=include_filter, exclude_filter=exclude_filter)
 
 # Print the chains
 print(f"{len(chains)} chains total")